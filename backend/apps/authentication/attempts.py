@@ -0,0 +1,48 @@
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _window():
+    window = settings.LOGIN_ATTEMPT_WINDOW
+    now = time.time()
+    return int(now // window), window - int(now % window)
+
+
+def _keys(ip_address, email, bucket):
+    keys = {f"login_attempts_account_{email}_{bucket}": settings.LOGIN_MAX_ATTEMPTS_PER_ACCOUNT}
+    if ip_address:
+        keys[f"login_attempts_ip_{ip_address}_{bucket}"] = settings.LOGIN_MAX_ATTEMPTS_PER_IP
+    return keys
+
+
+def login_retry_after(ip_address, email) -> Optional[int]:
+    """Seconds until another login may be tried, or None if it may now.
+
+    Failed attempts are counted per account and per IP in fixed windows of
+    LOGIN_ATTEMPT_WINDOW seconds.
+    """
+    bucket, remaining = _window()
+    keys = _keys(ip_address, email, bucket)
+    counts = cache.get_many(keys)
+    if any(counts.get(key, 0) >= limit for key, limit in keys.items()):
+        return remaining
+    return None
+
+
+def record_failed_login(ip_address, email):
+    bucket, remaining = _window()
+    for key in _keys(ip_address, email, bucket):
+        if not cache.add(key, 1, remaining):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Expired between add and incr
+                cache.add(key, 1, remaining)
+
+
+def clear_failed_logins(email):
+    bucket, _ = _window()
+    cache.delete(f"login_attempts_account_{email}_{bucket}")
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
 from django.db.models import Q
-from .utils import validate_country_restriction
+from .hashing import hash_dummy_password, verify_password
+from .user_cache import get_cached_user
+from .utils import get_client_ip, validate_country_restriction
 import logging
 
 logger = logging.getLogger("apps")
@@ -12,35 +15,30 @@ class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
             user = User.objects.get(Q(email=username) | Q(username=username))
-            if user.check_password(password):
-                ip_address = self.get_client_ip(request)
-                if ip_address:
-                    is_allowed, country_code = validate_country_restriction(
-                        user, ip_address
-                    )
-                    if not is_allowed:
-                        logger.warning(
-                            f"Access denied from country {country_code} for user {user.email}"
-                        )
-                        return None
-
-                    user.last_login_ip = ip_address
-                    user.save(update_fields=["last_login_ip"])
-
-                return user
         except User.DoesNotExist:
+            hash_dummy_password(password)
             return None
 
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+        if not verify_password(user, password):
             return None
 
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(",")[0]
-        else:
-            ip = request.META.get("REMOTE_ADDR")
-        return ip
+        ip_address = get_client_ip(request) if request is not None else None
+        if ip_address:
+            is_allowed, country_code = validate_country_restriction(user, ip_address)
+            if not is_allowed:
+                logger.warning(
+                    f"Access denied from country {country_code} for user {user.email}"
+                )
+                # Lets the login view answer 403 rather than 401
+                request.login_denied_country = country_code
+                # Stops authenticate() here instead of trying the next backend
+                raise PermissionDenied
+
+            if user.last_login_ip != ip_address:
+                user.last_login_ip = ip_address
+                user.save(update_fields=["last_login_ip"])
+
+        return user
+
+    def get_user(self, user_id):
+        return get_cached_user(user_id)
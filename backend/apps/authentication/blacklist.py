@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger("apps.authentication")
+
+# Sorted set of blacklisted JTIs scored by token expiry, and the channel that
+# tells every process about new entries
+BLACKLIST_KEY = "auth:blacklisted_jtis"
+BLACKLIST_CHANNEL = "auth:blacklist"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+_redis = None
+_lock = threading.Lock()
+# (pid, filter, pub/sub thread) of this process; None until first use or
+# after the subscription dropped
+_state = None
+# Set after Redis errors, when the set may be missing entries
+_reseed = False
+# pid of the process whose thread is building the filter; other threads
+# check the database meanwhile instead of waiting on Redis
+_building = None
+# Bumped by reset_blacklist_filter so a build started before it is discarded
+_generation = 0
+# time.monotonic() before which no rebuild is attempted after a failure
+_retry_at = 0.0
+
+
+def _client() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(
+            settings.JWT_BLACKLIST_REDIS_URL,
+            socket_timeout=settings.JWT_BLACKLIST_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.JWT_BLACKLIST_REDIS_TIMEOUT
+        )
+    return _redis
+
+
+def _on_message(message):
+    with _lock:
+        if _state is not None:
+            _state[1].add(message["data"].decode())
+
+
+def _on_subscription_error(error, pubsub, thread):
+    # Updates may have been missed; rebuild on the next check
+    global _state, _reseed
+    logger.warning(f"Token blacklist subscription lost: {str(error)}")
+    thread.stop()
+    with _lock:
+        if _state is not None and _state[2] is thread:
+            _state = None
+            _reseed = True
+
+
+def _build(reseed):
+    """Reads the blacklist from Redis (and the database when ``reseed`` or
+    Redis is empty). Runs without ``_lock``; returns the filter and the
+    subscription whose listener thread is not started yet."""
+    client = _client()
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{BLACKLIST_CHANNEL: _on_message})
+    try:
+        now = time.time()
+        client.zremrangebyscore(BLACKLIST_KEY, "-inf", now)
+        jtis = {jti.decode() for jti in client.zrangebyscore(BLACKLIST_KEY, now, "+inf")}
+        if reseed or not jtis:
+            jtis.update(seed_blacklist())
+    except Exception:
+        pubsub.close()
+        raise
+
+    bloom = BloomFilter(max(settings.JWT_BLACKLIST_BLOOM_CAPACITY, 2 * len(jtis)),
+                        settings.JWT_BLACKLIST_BLOOM_ERROR_RATE)
+    for jti in jtis:
+        bloom.add(jti)
+    return bloom, pubsub
+
+
+def seed_blacklist():
+    """Copies unexpired blacklisted JTIs from the database into Redis."""
+    rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list(
+        "token__jti", "token__expires_at"
+    )
+    entries = {jti: expires_at.timestamp() for jti, expires_at in rows}
+    if entries:
+        _client().zadd(BLACKLIST_KEY, entries)
+    return list(entries)
+
+
+def might_be_blacklisted(jti):
+    """False only if ``jti`` is certainly not blacklisted.
+
+    Without Redis there is no way to hear about other processes'
+    blacklists, so every token has to be checked in the database.
+    """
+    global _state, _reseed, _building, _retry_at
+    if not settings.JWT_BLACKLIST_REDIS_URL:
+        return True
+    pid = os.getpid()
+    with _lock:
+        # Rebuilt in each worker after fork
+        if _state is not None and _state[0] == pid:
+            return jti in _state[1]
+        if _building == pid or time.monotonic() < _retry_at:
+            return True
+        _building = pid
+        generation, reseed = _generation, _reseed
+
+    try:
+        bloom, pubsub = _build(reseed)
+    except Exception as e:
+        logger.warning(f"Token blacklist filter unavailable: {str(e)}")
+        with _lock:
+            _building = None
+            _retry_at = time.monotonic() + settings.JWT_BLACKLIST_RETRY_SECONDS
+        return True
+
+    with _lock:
+        _building = None
+        if generation != _generation:
+            pubsub.close()
+            return True
+        # Subscribed before reading the set, so nothing published meanwhile
+        # is lost; the listener waits on _lock until _state is set
+        thread = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=_on_subscription_error)
+        _state = (pid, bloom, thread)
+        if reseed:
+            _reseed = False
+        return jti in bloom
+
+
+def add_to_blacklist(jti, exp):
+    global _reseed
+    if not settings.JWT_BLACKLIST_REDIS_URL:
+        return
+    with _lock:
+        if _state is not None:
+            _state[1].add(jti)
+    try:
+        pipe = _client().pipeline(transaction=False)
+        pipe.zadd(BLACKLIST_KEY, {jti: exp})
+        pipe.publish(BLACKLIST_CHANNEL, jti)
+        pipe.execute()
+    except Exception as e:
+        # The database row is still written; the next rebuild copies it back
+        # into Redis
+        logger.error(f"Error publishing blacklisted token {jti}: {str(e)}")
+        reset_blacklist_filter()
+        _reseed = True
+
+
+def reset_blacklist_filter():
+    global _state, _generation, _retry_at
+    with _lock:
+        if _state is not None and _state[0] == os.getpid():
+            _state[2].stop()
+        _state = None
+        _generation += 1
+        _retry_at = 0.0
@@ -0,0 +1,39 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _hasher_pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+        return _executor
+
+
+def verify_password(user, raw_password) -> bool:
+    """``user.check_password`` with the hash computed on a bounded pool.
+
+    PBKDF2 releases the GIL, so logins hash in parallel, but never more of
+    them at once than there are pool threads; the rest queue instead of
+    competing for CPU. A hash upgrade is saved on the calling thread.
+    """
+    upgrades = []
+    verified = _hasher_pool().submit(check_password, raw_password, user.password, upgrades.append).result()
+    if verified and upgrades:
+        user.set_password(raw_password)
+        user.save(update_fields=["password"])
+    return verified
+
+
+def hash_dummy_password(raw_password):
+    # Same cost as a real check, so unknown accounts take as long to reject
+    _hasher_pool().submit(make_password, raw_password).result()
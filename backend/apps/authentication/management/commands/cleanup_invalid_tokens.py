@@ -8,23 +8,23 @@ class Command(BaseCommand):
     help = 'Cleans up invalid token records that reference non-existent users'
 
     def handle(self, *args, **options):
-        # Get all tokens
-        tokens = OutstandingToken.objects.all()
-        cleaned = 0
+        # Tokens whose user is missing, resolved in a single query
+        invalid_tokens = OutstandingToken.objects.exclude(
+            user_id__in=User.objects.values('id')
+        )
 
-        for token in tokens:
-            # Check if the user exists
-            if not User.objects.filter(id=token.user_id).exists():
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'Removing token {token.id} with invalid user_id {token.user_id}'
-                    )
+        for token_id, user_id in invalid_tokens.values_list('id', 'user_id').iterator():
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Removing token {token_id} with invalid user_id {user_id}'
                 )
-                token.delete()
-                cleaned += 1
+            )
+
+        _, deleted = invalid_tokens.delete()
+        cleaned = deleted.get(OutstandingToken._meta.label, 0)
 
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully cleaned up {cleaned} invalid token records'
             )
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from apps.authentication.models import UserAllowedCountry, parse_country_codes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-country rows from User.allowed_countries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = []
+        normalized = []
+        users = User.objects.exclude(allowed_countries='').only('id', 'allowed_countries')
+        for user in users.iterator(chunk_size=options['batch_size']):
+            codes = parse_country_codes(user.allowed_countries)
+            rows.extend(UserAllowedCountry(user_id=user.id, country_code=code) for code in codes)
+            value = ','.join(sorted(codes))
+            if value != user.allowed_countries:
+                user.allowed_countries = value
+                normalized.append(user)
+
+        with transaction.atomic():
+            UserAllowedCountry.objects.all().delete()
+            UserAllowedCountry.objects.bulk_create(rows, batch_size=options['batch_size'])
+            User.objects.bulk_update(normalized, ['allowed_countries'], batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Synced {len(rows)} allowed country rows, normalized {len(normalized)} users'
+            )
+        )
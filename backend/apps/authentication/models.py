@@ -1,22 +1,86 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from functools import lru_cache
+
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q
+
+
+@lru_cache(maxsize=1024)
+def parse_country_codes(value):
+    """``"us, DE,us"`` -> ``frozenset({"US", "DE"})``; cached per string."""
+    return frozenset(code.strip().upper() for code in value.split(",") if code.strip())
+
+
+class CustomUserManager(UserManager):
+    def allowing_country(self, country_code):
+        """Users who may log in from ``country_code`` (unrestricted users included)."""
+        allowed = UserAllowedCountry.objects.filter(
+            user=OuterRef("pk"), country_code=country_code.upper()
+        )
+        return self.filter(Q(allowed_countries="") | Exists(allowed))
 
 
 class User(AbstractUser):
     email = models.EmailField(unique=True, blank=False, null=False)
     facebook_id = models.CharField(max_length=150, blank=True, null=True, unique=True)
+    # Comma-separated ISO 3166-1 alpha-2 codes, empty for no restriction;
+    # mirrored row per code in UserAllowedCountry for querying
     allowed_countries = models.CharField(max_length=255, blank=True)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
 
+    objects = CustomUserManager()
+
     class Meta:
         db_table = "custom_user"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._saved_allowed_countries = user.__dict__.get("allowed_countries")
+        return user
+
     def save(self, *args, **kwargs):
         if self.email:
             self.email = self.email.lower()
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if "allowed_countries" in self.get_deferred_fields() or (
+            update_fields is not None and "allowed_countries" not in update_fields
+        ):
+            super().save(*args, **kwargs)
+            return
+
+        self.allowed_countries = ",".join(sorted(parse_country_codes(self.allowed_countries)))
+        if self.allowed_countries == getattr(self, "_saved_allowed_countries", ""):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.country_rows.all().delete()
+            UserAllowedCountry.objects.bulk_create([
+                UserAllowedCountry(user=self, country_code=code)
+                for code in parse_country_codes(self.allowed_countries)
+            ])
+        self._saved_allowed_countries = self.allowed_countries
 
     def is_country_allowed(self, country_code):
-        if not self.allowed_countries:
-            return True
-        return country_code in self.allowed_countries.split(",")
+        allowed = parse_country_codes(self.allowed_countries)
+        return not allowed or country_code.upper() in allowed
+
+
+class UserAllowedCountry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="country_rows", db_index=False)
+    country_code = models.CharField(max_length=2)
+
+    class Meta:
+        db_table = "custom_user_allowed_country"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "country_code"], name="user_allowed_country_unique")
+        ]
+        indexes = [
+            models.Index(fields=["country_code"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.country_code}"
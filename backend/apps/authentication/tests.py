@@ -0,0 +1,393 @@
+from io import StringIO
+from unittest.mock import patch, MagicMock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import blacklist
+from .authentication import CachedJWTAuthentication
+from .backends import EmailBackend
+from .blacklist import BloomFilter, reset_blacklist_filter
+from .hashing import verify_password
+from .models import UserAllowedCountry
+from .tokens import RefreshToken
+from .user_cache import local_users
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', email='cached@test.com', password='pass')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+        self.addCleanup(local_users.clear)
+
+    def authenticate(self, token=None):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token or self.refresh.access_token}'
+        )
+        return self.authentication.authenticate(request)
+
+    def test_repeat_requests_skip_user_query(self):
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        with self.assertNumQueries(0):
+            again, _ = self.authenticate()
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(again, self.user)
+        self.assertIsNot(again, user)
+
+    def test_shared_cache_serves_other_processes(self):
+        self.authenticate()
+        local_users.clear()
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.email, 'cached@test.com')
+
+    def test_password_hash_is_not_cached(self):
+        user, _ = self.authenticate()
+        version = cache.get(f'auth_user_version_{self.user.pk}')
+
+        cached = cache.get(f'auth_user_{self.user.pk}_{version}')
+
+        self.assertEqual(cached['email'], 'cached@test.com')
+        self.assertNotIn('password', cached)
+        self.assertNotIn('password', user.__dict__)
+        # Still there for the session hash, loaded on access
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('pass'))
+
+    def test_save_invalidates_cached_user(self):
+        self.authenticate()
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(AUTH_USER_LOCAL_SIZE=1)
+    def test_local_cache_is_bounded(self):
+        other = User.objects.create_user(username='other', email='other@test.com', password='pass')
+        self.authenticate()
+        self.authenticate(RefreshToken.for_user(other).access_token)
+
+        self.assertIsNone(local_users.get(self.user.pk))
+        self.assertEqual(local_users.get(other.pk), other)
+
+    def test_email_backend_uses_cache(self):
+        EmailBackend().get_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(EmailBackend().get_user(self.user.pk), self.user)
+        self.assertIsNone(EmailBackend().get_user(self.user.pk + 1000))
+
+    def test_logout_invalidates_cached_user(self):
+        self.authenticate()
+        version_key = f'auth_user_version_{self.user.pk}'
+        version = cache.get(version_key)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+        response = client.post(reverse('authentication:logout'), {'refresh': str(self.refresh)}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(cache.get(version_key), version)
+        self.assertIsNone(local_users.get(self.user.pk))
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(JWT_BLACKLIST_REDIS_URL='redis://localhost:6379/3')
+class BlacklistFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='refresh', email='refresh@test.com', password='pass')
+        self.redis = MagicMock()
+        self.redis.zrangebyscore.return_value = []
+        self.client_patcher = patch('apps.authentication.blacklist._client', return_value=self.redis)
+        self.client_patcher.start()
+        self.addCleanup(self.client_patcher.stop)
+        self.addCleanup(reset_blacklist_filter)
+        self.addCleanup(local_users.clear)
+
+    def test_unknown_token_skips_blacklist_query(self):
+        revoked = RefreshToken.for_user(self.user)
+        revoked.blacklist()
+        reset_blacklist_filter()
+        token = str(RefreshToken.for_user(self.user))
+
+        # First check builds the filter, seeding Redis from the database
+        RefreshToken(token)
+        self.redis.zadd.assert_called_with(
+            blacklist.BLACKLIST_KEY, {revoked['jti']: revoked['exp']}
+        )
+        with self.assertNumQueries(0):
+            RefreshToken(token)
+        with self.assertRaises(TokenError):
+            RefreshToken(str(revoked))
+
+    def test_logout_publishes_jti(self):
+        refresh = RefreshToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        client.post(reverse('authentication:logout'), {'refresh': str(refresh)}, format='json')
+
+        pipe = self.redis.pipeline.return_value
+        pipe.zadd.assert_called_once_with(blacklist.BLACKLIST_KEY, {refresh['jti']: refresh['exp']})
+        pipe.publish.assert_called_once_with(blacklist.BLACKLIST_CHANNEL, refresh['jti'])
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_jtis_published_by_other_processes_are_checked(self):
+        refresh = RefreshToken.for_user(self.user)
+        RefreshToken(str(refresh))
+        # Another process blacklists the token and publishes its JTI
+        with override_settings(JWT_BLACKLIST_REDIS_URL=None):
+            RefreshToken(str(refresh)).blacklist()
+        blacklist._on_message({'data': refresh['jti'].encode()})
+
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_rotated_token_cannot_be_reused(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        url = reverse('authentication:token_refresh')
+
+        first = self.client.post(url, {'refresh': refresh})
+        reused = self.client.post(url, {'refresh': refresh})
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', first.json())
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_redis_errors_fall_back_to_database(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        self.redis.pubsub.side_effect = ConnectionError('redis down')
+
+        with self.assertNumQueries(1), self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_blacklist_rows_from_anywhere_reach_filter(self):
+        refresh = RefreshToken.for_user(self.user)
+        RefreshToken(str(refresh))
+
+        # e.g. the admin, which bypasses RefreshToken.blacklist
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+
+        self.redis.pipeline.return_value.publish.assert_called_once_with(blacklist.BLACKLIST_CHANNEL, refresh['jti'])
+        with self.assertRaises(TokenError):
+            RefreshToken(str(refresh))
+
+    def test_failed_build_backs_off(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.redis.pubsub.side_effect = ConnectionError('redis down')
+
+        RefreshToken(token)
+        with self.assertNumQueries(1):
+            RefreshToken(token)
+
+        self.redis.pubsub.assert_called_once()
+
+    def test_client_has_socket_timeouts(self):
+        self.client_patcher.stop()
+        with patch.object(blacklist, '_redis', None), patch('redis.Redis.from_url') as from_url:
+            blacklist._client()
+
+        self.assertEqual(from_url.call_args.kwargs['socket_timeout'], 0.5)
+        self.assertEqual(from_url.call_args.kwargs['socket_connect_timeout'], 0.5)
+
+    @override_settings(JWT_BLACKLIST_REDIS_URL=None)
+    def test_without_redis_every_check_hits_database(self):
+        token = str(RefreshToken.for_user(self.user))
+
+        with self.assertNumQueries(1):
+            RefreshToken(token)
+        self.redis.pubsub.assert_not_called()
+
+
+@patch('apps.authentication.utils.requests.get')
+class LoginViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='login', email='login@test.com', password='pass')
+        self.url = reverse('authentication:login')
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def login(self, password='pass', email='login@test.com', ip='203.0.113.7'):
+        return self.client.post(self.url, {'email': email, 'password': password}, REMOTE_ADDR=ip)
+
+    def geoip(self, mock_get, country_code='US'):
+        mock_get.return_value = MagicMock(status_code=200, json=MagicMock(return_value={'country_code': country_code}))
+
+    def test_one_lookup_and_narrow_write(self, mock_get):
+        self.geoip(mock_get)
+
+        # User, UPDATE of last_login_ip only, outstanding refresh token
+        with self.assertNumQueries(3):
+            response = self.login()
+        with self.assertNumQueries(2):
+            self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.json()['data'])
+        mock_get.assert_called_once()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login_ip, '203.0.113.7')
+
+    def test_disallowed_country(self, mock_get):
+        self.geoip(mock_get, 'RU')
+        self.user.allowed_countries = 'US,DE'
+        self.user.save()
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()['error'], 'Access not allowed from RU')
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login_ip)
+
+    def test_disallowed_country_by_username(self, mock_get):
+        self.geoip(mock_get, 'RU')
+        self.user.allowed_countries = 'US,DE'
+        self.user.save()
+
+        with patch('apps.authentication.backends.verify_password', wraps=verify_password) as mock_verify:
+            response = self.login(email='login')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json()['error'], 'Access not allowed from RU')
+        # No other backend gets to check the password again
+        mock_verify.assert_called_once()
+
+    @override_settings(LOGIN_MAX_ATTEMPTS_PER_ACCOUNT=2)
+    def test_account_attempts_are_limited(self, mock_get):
+        self.geoip(mock_get)
+        self.login(password='wrong')
+        self.login(password='wrong', ip='198.51.100.1')
+
+        with patch('apps.authentication.backends.verify_password') as mock_verify:
+            response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        mock_verify.assert_not_called()
+
+    @override_settings(LOGIN_MAX_ATTEMPTS_PER_IP=2)
+    def test_ip_attempts_are_limited(self, mock_get):
+        self.geoip(mock_get)
+        self.login(email='nobody@test.com')
+        self.login(email='else@test.com')
+
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(ip='198.51.100.1').status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_MAX_ATTEMPTS_PER_IP=2)
+    def test_forwarded_for_cannot_dodge_ip_limit(self, mock_get):
+        self.geoip(mock_get)
+        for spoofed in ('192.0.2.1', '192.0.2.2'):
+            self.client.post(self.url, {'email': 'nobody@test.com', 'password': 'pass'},
+                             REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR=spoofed)
+
+        response = self.client.post(self.url, {'email': 'login@test.com', 'password': 'pass'},
+                                    REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR='192.0.2.3')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_ip_from_trusted_proxy(self, mock_get):
+        self.geoip(mock_get)
+
+        self.client.post(self.url, {'email': 'login@test.com', 'password': 'pass'},
+                         REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='192.0.2.1, 198.51.100.9')
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login_ip, '198.51.100.9')
+
+    @override_settings(LOGIN_MAX_ATTEMPTS_PER_ACCOUNT=2)
+    def test_success_resets_account_attempts(self, mock_get):
+        self.geoip(mock_get)
+        self.login(password='wrong')
+        self.login()
+        self.login(password='wrong')
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+
+class AllowedCountriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='countries', email='countries@test.com', password='pass', allowed_countries='us, de,US'
+        )
+
+    def country_rows(self, user):
+        return set(UserAllowedCountry.objects.filter(user=user).values_list('country_code', flat=True))
+
+    def test_codes_are_normalized_and_mirrored(self):
+        self.assertEqual(self.user.allowed_countries, 'DE,US')
+        self.assertEqual(self.country_rows(self.user), {'DE', 'US'})
+        self.assertTrue(self.user.is_country_allowed('de'))
+        self.assertFalse(self.user.is_country_allowed('FR'))
+
+    def test_rows_follow_changes(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.allowed_countries = 'FR'
+        user.save()
+        self.assertEqual(self.country_rows(user), {'FR'})
+
+        user.allowed_countries = ''
+        user.save()
+        self.assertEqual(self.country_rows(user), set())
+        self.assertTrue(user.is_country_allowed('BR'))
+
+    def test_unrelated_saves_skip_sync(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login_ip'])
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_allowing_country(self):
+        unrestricted = User.objects.create_user(username='free', email='free@test.com', password='pass')
+        User.objects.create_user(username='fr', email='fr@test.com', password='pass', allowed_countries='FR')
+
+        self.assertEqual(set(User.objects.allowing_country('us')), {self.user, unrestricted})
+
+    def test_sync_command_backfills_rows(self):
+        User.objects.filter(pk=self.user.pk).update(allowed_countries='gb,it')
+        UserAllowedCountry.objects.all().delete()
+
+        out = StringIO()
+        call_command('sync_allowed_countries', stdout=out)
+
+        self.assertEqual(self.country_rows(self.user), {'GB', 'IT'})
+        self.assertEqual(User.objects.get(pk=self.user.pk).allowed_countries, 'GB,IT')
+        self.assertIn('Synced 2 allowed country rows, normalized 1 users', out.getvalue())
@@ -0,0 +1,19 @@
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .blacklist import might_be_blacklisted
+
+
+class RefreshToken(tokens.RefreshToken):
+    """Refresh token whose blacklist check skips the database when the
+    Bloom filter says the JTI was never blacklisted. New blacklist rows
+    reach the filter through the ``BlacklistedToken`` post_save signal."""
+
+    def check_blacklist(self):
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
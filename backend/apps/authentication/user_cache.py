@@ -0,0 +1,108 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+USER_VERSION_KEY = "auth_user_version_{}"
+USER_KEY = "auth_user_{}_{}"
+# Never copied into the shared cache; loaded from the database on access
+UNCACHED_FIELDS = {"password"}
+
+
+class LocalUserCache:
+    """Per-process LRU of users with a short TTL.
+
+    Entries are only evicted locally on save/logout in this process, so the
+    TTL bounds how long other processes may serve a stale user.
+    """
+
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = (time.monotonic() + settings.AUTH_USER_LOCAL_TTL, user)
+            self._users.move_to_end(user_id)
+            while len(self._users) > settings.AUTH_USER_LOCAL_SIZE:
+                self._users.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+local_users = LocalUserCache()
+
+
+def get_user_version(user_id) -> str:
+    key = USER_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _cached_fields():
+    return [field for field in get_user_model()._meta.concrete_fields if field.name not in UNCACHED_FIELDS]
+
+
+def _user_from_values(values):
+    # Same path as a queryset row, so the uncached fields stay deferred
+    fields = _cached_fields()
+    return get_user_model().from_db(
+        DEFAULT_DB_ALIAS, [field.attname for field in fields], [values[field.attname] for field in fields]
+    )
+
+
+def get_cached_user(user_id):
+    """Returns the user with ``user_id``, or None if there is none.
+
+    Looks in the local LRU, then in the shared cache under the user's
+    current version, and only then in the database. The shared cache holds
+    the field values minus UNCACHED_FIELDS, never a pickled model.
+    """
+    user = local_users.get(user_id)
+    if user is None:
+        key = USER_KEY.format(user_id, get_user_version(user_id))
+        values = cache.get(key)
+        if values is None:
+            values = get_user_model().objects.filter(pk=user_id).values(
+                *(field.attname for field in _cached_fields())
+            ).first()
+            if values is None:
+                return None
+            cache.set(key, values, settings.AUTH_USER_CACHE_TTL)
+        user = _user_from_values(values)
+        local_users.set(user_id, user)
+    # Callers may modify request.user; keep the cached instance pristine
+    return copy.copy(user)
+
+
+def invalidate_user(user_id):
+    # Users are cached per version, so bumping it orphans the shared entry
+    cache.set(USER_VERSION_KEY.format(user_id), uuid.uuid4().hex, None)
+    local_users.discard(user_id)
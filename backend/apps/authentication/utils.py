@@ -1,16 +1,46 @@
 import requests
 from django.conf import settings
+from django.core.cache import cache
 import logging
 
 logger = logging.getLogger("apps")
 
+GEOIP_CACHE_KEY = "geoip_country_{}"
+
+
+def get_client_ip(request):
+    """The address that reached the outermost trusted proxy.
+
+    X-Forwarded-For hops left of the ones our TRUSTED_PROXY_COUNT proxies
+    appended are whatever the client sent, so only REMOTE_ADDR (no proxies)
+    or the Nth hop from the right is used.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get("REMOTE_ADDR")
+
 
 def get_country_from_ip(ip_address):
+    # Cached per IP, including "unknown" (""), so a login does at most one
+    # lookup and repeat logins from the same address none
+    cache_key = GEOIP_CACHE_KEY.format(ip_address)
+    country_code = cache.get(cache_key)
+    if country_code is not None:
+        return country_code or None
+
     try:
-        response = requests.get(settings.IP_API_URL.format(ip_address))
+        response = requests.get(
+            settings.IP_API_URL.format(ip_address), timeout=settings.IP_API_TIMEOUT
+        )
         if response.status_code == 200:
             data = response.json()
-            return data.get("country_code")
+            country_code = data.get("country_code")
+            cache.set(cache_key, country_code or "", settings.GEOIP_CACHE_TTL)
+            return country_code
         return None
     except Exception as e:
         logger.error(f"Error getting country from IP: {str(e)}")
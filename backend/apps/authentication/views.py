@@ -3,23 +3,20 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model, authenticate
 from django.conf import settings
 from django.db import IntegrityError
 import logging
 
+from .attempts import clear_failed_logins, login_retry_after, record_failed_login
+from .tokens import RefreshToken
+from .user_cache import invalidate_user
+from .utils import get_client_ip
+
 logger = logging.getLogger("apps.authentication")
 User = get_user_model()
 
 
-def get_client_ip(request):
-    x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-    if x_forwarded_for:
-        return x_forwarded_for.split(",")[0]
-    return request.META.get("REMOTE_ADDR")
-
-
 class RegistrationView(APIView):
     permission_classes = [AllowAny]
 
@@ -69,31 +66,34 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # The backend checks the password, resolves the country and stores
+        # last_login_ip; failures are counted here before any hashing
+        client_ip = get_client_ip(request)
+        retry_after = login_retry_after(client_ip, email)
+        if retry_after:
+            return Response(
+                {"success": False, "error": "Too many login attempts, try again later"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)},
+            )
+
         user = authenticate(request, username=email, password=password)
         if not user:
+            country_code = getattr(request, "login_denied_country", None)
+            if country_code:
+                return Response(
+                    {
+                        "success": False,
+                        "error": f"Access not allowed from {country_code}",
+                    },
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            record_failed_login(client_ip, email)
             return Response(
                 {"success": False, "error": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
-
-        client_ip = get_client_ip(request)
-        user.last_login_ip = client_ip
-        user.save()
-
-        try:
-            response = requests.get(settings.IP_API_URL.format(client_ip))
-            if response.status_code == 200:
-                country_code = response.json().get("country_code")
-                if country_code and not user.is_country_allowed(country_code):
-                    return Response(
-                        {
-                            "success": False,
-                            "error": f"Access not allowed from {country_code}",
-                        },
-                        status=status.HTTP_403_FORBIDDEN,
-                    )
-        except Exception as e:
-            logger.error(f"IP lookup error: {str(e)}")
+        clear_failed_logins(email)
 
         refresh = RefreshToken.for_user(user)
         return Response(
@@ -202,6 +202,7 @@ class LogoutView(APIView):
 
             token = RefreshToken(refresh_token)
             token.blacklist()
+            invalidate_user(request.user.pk)
             return Response(
                 {"success": True, "data": {"message": "Successfully logged out"}},
                 status=status.HTTP_200_OK,
@@ -0,0 +1,68 @@
+"""AIMD batch sizing for the message queue, per sending account.
+
+Every SMTPServer and WhatsAppAccount carries the ``batch_size`` the queue
+processor claims for it, kept between its own ``min_batch_size`` and
+``max_batch_size``. A healthy batch (error rate within
+BATCH_ERROR_RATE_THRESHOLD, per-message latency within
+BATCH_LATENCY_TARGET_MS, no throttling) grows it by BATCH_SIZE_INCREASE;
+anything else multiplies it by BATCH_SIZE_DECREASE_FACTOR.
+"""
+from typing import Union
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+
+from .models import SMTPServer, WhatsAppAccount
+
+# Provider responses that mean "slow down" rather than "bad message"
+THROTTLE_STATUS_CODES = {429}
+
+
+def next_batch_size(current: int, minimum: int, maximum: int, healthy: bool) -> int:
+    if healthy:
+        size = current + settings.BATCH_SIZE_INCREASE
+    else:
+        size = int(current * settings.BATCH_SIZE_DECREASE_FACTOR)
+    return max(minimum, min(maximum, size))
+
+
+def is_healthy(total: int, failed: int, seconds: float, throttled: bool = False) -> bool:
+    if throttled:
+        return False
+    if not total:
+        return True
+    return (
+        failed / total <= settings.BATCH_ERROR_RATE_THRESHOLD
+        and seconds * 1000 / total <= settings.BATCH_LATENCY_TARGET_MS
+    )
+
+
+def adapt_batch_size(account: Union[SMTPServer, WhatsAppAccount], total: int, failed: int,
+                     seconds: float, throttled: bool = False) -> bool:
+    """Sets ``account.batch_size`` for its next batch; True if it changed."""
+    size = next_batch_size(
+        account.batch_size,
+        account.min_batch_size,
+        account.max_batch_size,
+        is_healthy(total, failed, seconds, throttled)
+    )
+    changed = size != account.batch_size
+    account.batch_size = size
+    return changed
+
+
+def save_batch_size(account: Union[SMTPServer, WhatsAppAccount], sent: int = 0):
+    """Stores ``account.batch_size`` and adds ``sent`` to today's count in
+    one UPDATE, clamped to the bounds currently in the database.
+
+    ``account`` was loaded when the batch was claimed; a full save() would
+    write back bounds an admin changed since and counters other workers
+    incremented.
+    """
+    updates = {
+        'batch_size': Greatest(F('min_batch_size'), Least(F('max_batch_size'), Value(account.batch_size)))
+    }
+    if sent:
+        updates['messages_sent_today'] = F('messages_sent_today') + sent
+    type(account).objects.filter(id=account.id).update(**updates)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from django.conf import settings
+
+from .html_meta import extract_meta, meta_executor
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8192
+HEAD_END = b'</head'
+USER_AGENT = 'message-sender-profile-verifier/1.0'
+
+
+def crawl_domain(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class ProfileCrawler:
+    """Fetches profile pages with a global and a per-domain concurrency cap.
+
+    Only the document head is downloaded: the body is streamed until
+    ``</head>`` (or ``max_bytes``) and the connection is dropped there.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        per_domain: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        offload_bytes: Optional[int] = None
+    ):
+        self.concurrency = concurrency or settings.PROFILE_CRAWLER_CONCURRENCY
+        self.per_domain = per_domain or settings.PROFILE_CRAWLER_PER_DOMAIN
+        self.connect_timeout = connect_timeout or settings.PROFILE_CRAWLER_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or settings.PROFILE_CRAWLER_READ_TIMEOUT
+        self.max_bytes = max_bytes or settings.PROFILE_CRAWLER_MAX_BYTES
+        self.offload_bytes = offload_bytes or settings.PROFILE_META_OFFLOAD_BYTES
+        self._global = None
+        self._domains = {}
+        self._validators = {}
+
+    def _domain_semaphore(self, url: str) -> asyncio.Semaphore:
+        domain = crawl_domain(url)
+        if domain not in self._domains:
+            self._domains[domain] = asyncio.Semaphore(self.per_domain)
+        return self._domains[domain]
+
+    async def _read_head(self, response: aiohttp.ClientResponse) -> bytes:
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            # Only rescan the new chunk plus enough overlap for a split tag
+            start = max(0, len(buffer) - len(HEAD_END))
+            buffer.extend(chunk)
+            end = bytes(buffer[start:]).lower().find(HEAD_END)
+            if end != -1:
+                return bytes(buffer[:start + end])
+            if len(buffer) >= self.max_bytes:
+                return bytes(buffer[:self.max_bytes])
+        return bytes(buffer)
+
+    async def _extract_meta(self, raw: bytes, charset: Optional[str]) -> Dict[str, Any]:
+        if len(raw) < self.offload_bytes:
+            return extract_meta(raw, charset)
+        # Large heads (inline JSON blobs are common) are parsed off the loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(meta_executor(), extract_meta, raw, charset)
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        validators = self._validators.get(url) or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+        # Domain first: urls queued behind a busy host must not hold global slots
+        async with self._domain_semaphore(url), self._global:
+            try:
+                async with session.get(url, headers=self._conditional_headers(url)) as response:
+                    if response.status == 304:
+                        return {
+                            "exists": True,
+                            "not_modified": True,
+                            "status_code": response.status
+                        }
+                    if response.status != 200:
+                        return {
+                            "exists": False,
+                            "status_code": response.status
+                        }
+
+                    raw = await self._read_head(response)
+                    return {
+                        "exists": True,
+                        **(await self._extract_meta(raw, response.charset)),
+                        "status_code": response.status,
+                        "etag": response.headers.get('ETag', ''),
+                        "last_modified": response.headers.get('Last-Modified', '')
+                    }
+            except asyncio.TimeoutError:
+                return {
+                    "exists": False,
+                    "error": "timeout"
+                }
+            except Exception as e:
+                return {
+                    "exists": False,
+                    "error": str(e)
+                }
+
+    async def crawl(
+        self,
+        urls: List[str],
+        validators: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> List[Dict[str, Any]]:
+        # validators maps url -> {"etag", "last_modified"} from an earlier
+        # fetch; those urls are requested conditionally and may come back
+        # as {"not_modified": True} without being downloaded or parsed.
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._domains = {}
+        self._validators = validators or {}
+
+        # total bounds servers that trickle bytes just under the read timeout
+        timeout = aiohttp.ClientTimeout(
+            total=self.connect_timeout + self.read_timeout,
+            sock_connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_domain)
+        headers = {'User-Agent': USER_AGENT, 'Accept': 'text/html'}
+
+        unique_urls = list(dict.fromkeys(urls))
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+            results = await asyncio.gather(*(self.fetch(session, url) for url in unique_urls))
+
+        by_url = dict(zip(unique_urls, results))
+        return [by_url[url] for url in urls]
+
+
+def crawl_profiles(
+    urls: List[str],
+    validators: Optional[Dict[str, Dict[str, str]]] = None,
+    **options
+) -> List[Dict[str, Any]]:
+    # asyncio.run gives every call its own loop; Celery worker threads have none
+    return asyncio.run(ProfileCrawler(**options).crawl(urls, validators))
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+from .models import Communication
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'communications:events'
+
+
+def user_channel(user_id: int) -> str:
+    return f'{CHANNEL_PREFIX}:{user_id}'
+
+
+_redis = None
+
+# Fallback when EVENTS_REDIS_URL is unset: subscribers of this process only
+_local_subscribers = {}
+_local_lock = threading.Lock()
+
+
+def _client() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+    return _redis
+
+
+def _publish_local(user_id: int, payload: str):
+    with _local_lock:
+        subscribers = list(_local_subscribers.get(user_id, ()))
+    for loop, queue in subscribers:
+        loop.call_soon_threadsafe(queue.put_nowait, payload)
+
+
+def publish_status(messages: Iterable[Communication], status: str, errors: Optional[Dict[int, str]] = None):
+    """Publishes one status event per message, batched into one message per user."""
+    events = {}
+    for message in messages:
+        event = {"id": message.id, "type": message.type, "status": status}
+        if errors and message.id in errors:
+            event["error"] = errors[message.id]
+        events.setdefault(message.user_id, []).append(event)
+    if not events:
+        return
+
+    # Live updates are best effort; never fail a send because of them
+    try:
+        if settings.EVENTS_REDIS_URL:
+            pipe = _client().pipeline(transaction=False)
+            for user_id, items in events.items():
+                pipe.publish(user_channel(user_id), json.dumps(items))
+            pipe.execute()
+        else:
+            for user_id, items in events.items():
+                _publish_local(user_id, json.dumps(items))
+    except Exception as e:
+        logger.warning(f"Error publishing status events: {str(e)}")
+
+
+async def _subscribe_redis(user_id: int, heartbeat: float) -> AsyncIterator[Optional[List[dict]]]:
+    client = aioredis.Redis.from_url(settings.EVENTS_REDIS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(user_channel(user_id))
+        while True:
+            message = await pubsub.get_message(timeout=heartbeat)
+            yield json.loads(message['data']) if message else None
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def _subscribe_local(user_id: int, heartbeat: float) -> AsyncIterator[Optional[List[dict]]]:
+    entry = (asyncio.get_running_loop(), asyncio.Queue())
+    with _local_lock:
+        _local_subscribers.setdefault(user_id, set()).add(entry)
+    try:
+        while True:
+            try:
+                yield json.loads(await asyncio.wait_for(entry[1].get(), heartbeat))
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        with _local_lock:
+            subscribers = _local_subscribers.get(user_id, set())
+            subscribers.discard(entry)
+            if not subscribers:
+                _local_subscribers.pop(user_id, None)
+
+
+def subscribe(user_id: int, heartbeat: float) -> AsyncIterator[Optional[List[dict]]]:
+    """Yields lists of status events for ``user_id``, or None after
+    ``heartbeat`` seconds without any."""
+    if settings.EVENTS_REDIS_URL:
+        return _subscribe_redis(user_id, heartbeat)
+    return _subscribe_local(user_id, heartbeat)
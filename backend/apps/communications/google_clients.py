@@ -0,0 +1,105 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from celery.signals import worker_process_init
+from django.conf import settings
+from googleapiclient.discovery import build
+from googleapiclient.errors import UnknownApiNameOrVersion
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+# Refresh the access token this long before it expires so no task pays for
+# a 401 round trip followed by a refresh in the middle of its first call.
+REFRESH_MARGIN = timedelta(minutes=5)
+WARM_SERVICES = [('places', 'v1'), ('people', 'v1')]
+
+_services = {}
+_credentials = None
+_lock = threading.RLock()
+
+
+def _needs_refresh(credentials: Credentials) -> bool:
+    if not credentials.token:
+        return True
+    if credentials.expiry is None:
+        return False
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return credentials.expiry - now <= REFRESH_MARGIN
+
+
+def get_credentials() -> Credentials:
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = Credentials.from_authorized_user_info(
+                settings.GOOGLE_CREDENTIALS
+            )
+        if _needs_refresh(_credentials) and _credentials.refresh_token:
+            _credentials.refresh(Request())
+        return _credentials
+
+
+def _build(name: str, version: str, credentials: Credentials):
+    try:
+        # Discovery documents bundled with googleapiclient: no HTTP fetch
+        return build(
+            name,
+            version,
+            credentials=credentials,
+            static_discovery=True,
+            cache_discovery=False
+        )
+    except UnknownApiNameOrVersion:
+        logger.info(f"No bundled discovery document for {name} {version}, fetching it")
+        return build(
+            name,
+            version,
+            credentials=credentials,
+            static_discovery=False,
+            cache_discovery=False
+        )
+
+
+def get_service(name: str, version: str):
+    # One client per API per worker process. The client shares the memoized
+    # credentials, so refreshing them here keeps every client's token fresh.
+    key = (name, version)
+    with _lock:
+        credentials = get_credentials()
+        service = _services.get(key)
+        if service is None:
+            service = _build(name, version, credentials)
+            _services[key] = service
+        return service
+
+
+def get_people_service():
+    return get_service('people', 'v1')
+
+
+def get_places_service():
+    return get_service('places', 'v1')
+
+
+def reset_services():
+    global _credentials
+    with _lock:
+        _services.clear()
+        _credentials = None
+
+
+@worker_process_init.connect
+def warm_google_clients(**kwargs):
+    # Forked worker children must not reuse the parent's HTTP connections
+    reset_services()
+    if not getattr(settings, 'GOOGLE_CREDENTIALS', None):
+        return
+    try:
+        for name, version in WARM_SERVICES:
+            get_service(name, version)
+    except Exception as e:
+        logger.warning(f"Could not warm Google API clients: {str(e)}")
@@ -0,0 +1,147 @@
+import codecs
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+FEED_SIZE = 16384
+
+_executor = None
+
+
+class MetaCollector:
+    """Collects <title>, the meta description and og:* tags from parser
+    events, and flags ``done`` at the end of <head> so feeding can stop."""
+
+    def __init__(self):
+        self.done = False
+        self.in_title = False
+        self.title = []
+        self.description = None
+        self.opengraph = {}
+
+    def on_start(self, tag: str, attrs: Dict[str, str]):
+        if self.done:
+            return
+        tag = tag.lower()
+        if tag == 'title':
+            self.in_title = True
+        elif tag == 'meta':
+            name = (attrs.get('property') or attrs.get('name') or '').strip().lower()
+            content = attrs.get('content') or ''
+            if name == 'description' and self.description is None:
+                self.description = content
+            elif name.startswith('og:'):
+                self.opengraph.setdefault(name[3:], content)
+        elif tag == 'body':
+            self.done = True
+
+    def on_end(self, tag: str):
+        tag = tag.lower()
+        if tag == 'title':
+            self.in_title = False
+        elif tag == 'head':
+            self.done = True
+
+    def on_data(self, data: str):
+        if self.in_title and not self.done:
+            self.title.append(data)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "title": ' '.join(''.join(self.title).split()),
+            "description": self.description or "",
+            "opengraph": self.opengraph
+        }
+
+
+class _HTMLParserFeeder(HTMLParser):
+    def __init__(self, collector: MetaCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.on_start(tag, {key: value for key, value in attrs if value is not None})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.collector.on_end(tag)
+
+    def handle_data(self, data):
+        self.collector.on_data(data)
+
+
+class _LxmlTarget:
+    def __init__(self, collector: MetaCollector):
+        self.collector = collector
+
+    def start(self, tag, attrib):
+        self.collector.on_start(tag, dict(attrib))
+
+    def end(self, tag):
+        self.collector.on_end(tag)
+
+    def data(self, data):
+        self.collector.on_data(data)
+
+    def close(self):
+        pass
+
+
+def _charset(charset: Optional[str]) -> str:
+    try:
+        return codecs.lookup(charset or 'utf-8').name
+    except LookupError:
+        return 'utf-8'
+
+
+def extract_meta(raw: bytes, charset: Optional[str] = None, use_lxml: Optional[bool] = None) -> Dict[str, Any]:
+    # Feeds the document in slices and stops as soon as </head> or <body>
+    # has been seen, so the body of a large page is never parsed.
+    collector = MetaCollector()
+    encoding = _charset(charset)
+    if use_lxml is None:
+        use_lxml = etree is not None
+
+    if use_lxml:
+        parser = etree.HTMLParser(target=_LxmlTarget(collector), encoding=encoding)
+        for offset in range(0, len(raw), FEED_SIZE):
+            parser.feed(raw[offset:offset + FEED_SIZE])
+            if collector.done:
+                break
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        return collector.result()
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    parser = _HTMLParserFeeder(collector)
+    for offset in range(0, len(raw), FEED_SIZE):
+        parser.feed(decoder.decode(raw[offset:offset + FEED_SIZE]))
+        if collector.done:
+            break
+    else:
+        parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return collector.result()
+
+
+def meta_executor() -> Optional[ProcessPoolExecutor]:
+    # Celery's prefork children are daemonic and cannot start processes;
+    # callers fall back to the default thread pool there.
+    global _executor
+    if multiprocessing.current_process().daemon:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PROFILE_META_WORKERS)
+    return _executor
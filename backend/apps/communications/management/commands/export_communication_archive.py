@@ -0,0 +1,143 @@
+import gzip
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils import timezone
+
+from apps.communications.models import ArchivedCommunication
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FIELDS = [
+    'id', 'user_id', 'business_id', 'smtp_server_id', 'whatsapp_account_id',
+    'type', 'status', 'recipient', 'subject', 'error_message',
+    'whatsapp_message_id', 'created_at', 'updated_at', 'sent_at', 'archived_at'
+]
+
+
+def _row(archived: ArchivedCommunication) -> dict:
+    row = {field: getattr(archived, field) for field in EXPORT_FIELDS}
+    row['content'] = archived.content
+    return row
+
+
+def _parse_moment(value: str) -> datetime:
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid date: {value}')
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class JSONLinesWriter:
+    def __init__(self, path):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, default=str))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        timestamp = pyarrow.timestamp('us', tz='UTC')
+        self.schema = pyarrow.schema([
+            ('id', pyarrow.int64()),
+            ('user_id', pyarrow.int64()),
+            ('business_id', pyarrow.int64()),
+            ('smtp_server_id', pyarrow.int64()),
+            ('whatsapp_account_id', pyarrow.int64()),
+            ('type', pyarrow.string()),
+            ('status', pyarrow.string()),
+            ('recipient', pyarrow.string()),
+            ('subject', pyarrow.string()),
+            ('error_message', pyarrow.string()),
+            ('whatsapp_message_id', pyarrow.string()),
+            ('created_at', timestamp),
+            ('updated_at', timestamp),
+            ('sent_at', timestamp),
+            ('archived_at', timestamp),
+            ('content', pyarrow.string()),
+        ])
+        self.writer = parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        # One row group per chunk keeps memory bounded by --chunk-size
+        self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Streams archived communications to a gzipped JSON Lines or Parquet file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Target file (.jsonl.gz or .parquet)')
+        parser.add_argument('--format', choices=['jsonl', 'parquet'],
+                            help='Defaults to parquet for .parquet files, jsonl otherwise')
+        parser.add_argument('--before', help='Only rows created before this date/datetime')
+        parser.add_argument('--after', help='Only rows created at or after this date/datetime')
+        parser.add_argument('--user', type=int, help='Only rows of this user id')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--delete', action='store_true',
+                            help='Delete the exported rows from the archive table afterwards')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        export_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'jsonl')
+        if export_format == 'parquet' and pyarrow is None:
+            raise CommandError('Parquet export requires pyarrow; install it or use --format jsonl')
+
+        queryset = ArchivedCommunication.objects.all()
+        if options['before']:
+            queryset = queryset.filter(created_at__lt=_parse_moment(options['before']))
+        if options['after']:
+            queryset = queryset.filter(created_at__gte=_parse_moment(options['after']))
+        if options['user']:
+            queryset = queryset.filter(user_id=options['user'])
+
+        chunk_size = options['chunk_size']
+        writer = ParquetWriter(output) if export_format == 'parquet' else JSONLinesWriter(output)
+        exported_ids = []
+        rows = []
+        try:
+            for archived in queryset.order_by('id').iterator(chunk_size=chunk_size):
+                rows.append(_row(archived))
+                exported_ids.append(archived.id)
+                if len(rows) >= chunk_size:
+                    writer.write(rows)
+                    rows = []
+            if rows:
+                writer.write(rows)
+        finally:
+            writer.close()
+
+        deleted = 0
+        if options['delete']:
+            for start in range(0, len(exported_ids), chunk_size):
+                count, _ = ArchivedCommunication.objects.filter(
+                    id__in=exported_ids[start:start + chunk_size]
+                ).delete()
+                deleted += count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Exported {len(exported_ids)} archived communications to {output}'
+                + (f' and deleted {deleted} from the archive table' if options['delete'] else '')
+            )
+        )
@@ -0,0 +1,224 @@
+# Generated by Django 5.1.5 on 2026-10-19 12:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Business',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('address', models.TextField()),
+                ('phone_number', models.CharField(max_length=50)),
+                ('website', models.URLField(blank=True, max_length=500, null=True)),
+                ('category', models.CharField(max_length=100)),
+                ('google_maps_link', models.URLField(max_length=500)),
+                ('google_place_id', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'businesses',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileVerificationCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_url', models.URLField(max_length=500, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('result', models.JSONField(default=dict)),
+                ('checked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SMTPServer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.IntegerField()),
+                ('username', models.CharField(max_length=255)),
+                ('password', models.CharField(max_length=255)),
+                ('use_tls', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('daily_limit', models.IntegerField(default=2000)),
+                ('messages_sent_today', models.IntegerField(default=0)),
+                ('last_reset_date', models.DateField(auto_now_add=True)),
+                ('batch_size', models.IntegerField(default=50)),
+                ('min_batch_size', models.IntegerField(default=10)),
+                ('max_batch_size', models.IntegerField(default=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SocialAPIConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('facebook', 'Facebook'), ('twitter', 'Twitter'), ('linkedin', 'LinkedIn')], max_length=50, unique=True)),
+                ('api_key', models.CharField(max_length=500)),
+                ('api_secret', models.CharField(max_length=500)),
+                ('access_token', models.CharField(blank=True, max_length=500, null=True)),
+                ('token_secret', models.CharField(blank=True, max_length=500, null=True)),
+                ('daily_request_limit', models.IntegerField(default=1000)),
+                ('requests_made_today', models.IntegerField(default=0)),
+                ('last_reset_date', models.DateField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WhatsAppAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('phone_number_id', models.CharField(max_length=255)),
+                ('access_token', models.CharField(max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+                ('daily_limit', models.IntegerField(default=1000)),
+                ('messages_sent_today', models.IntegerField(default=0)),
+                ('last_reset_date', models.DateField(auto_now_add=True)),
+                ('batch_size', models.IntegerField(default=50)),
+                ('min_batch_size', models.IntegerField(default=10)),
+                ('max_batch_size', models.IntegerField(default=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Communication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('email', 'Email'), ('whatsapp', 'WhatsApp')], db_index=True, default='email', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued'), ('processing', 'Processing'), ('sent', 'Sent'), ('failed', 'Failed'), ('conflict', 'Archive conflict')], db_index=True, default='pending', max_length=10)),
+                ('recipient', models.CharField(db_index=True, max_length=255)),
+                ('content', models.TextField()),
+                ('subject', models.CharField(blank=True, max_length=255, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('whatsapp_message_id', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sent_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('business', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='communications', to='communications.business')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='communications', to=settings.AUTH_USER_MODEL)),
+                ('smtp_server', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='communications.smtpserver')),
+                ('whatsapp_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='communications.whatsappaccount')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GoogleContactLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource_name', models.CharField(max_length=255)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('synced_at', models.DateTimeField()),
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='google_contact', to='communications.business')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedCommunication',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('business_id', models.BigIntegerField(blank=True, null=True)),
+                ('smtp_server_id', models.BigIntegerField(blank=True, null=True)),
+                ('whatsapp_account_id', models.BigIntegerField(blank=True, null=True)),
+                ('type', models.CharField(choices=[('email', 'Email'), ('whatsapp', 'WhatsApp')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued'), ('processing', 'Processing'), ('sent', 'Sent'), ('failed', 'Failed'), ('conflict', 'Archive conflict')], max_length=10)),
+                ('recipient', models.CharField(max_length=255)),
+                ('compressed_content', models.BinaryField()),
+                ('subject', models.CharField(blank=True, max_length=255, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('whatsapp_message_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_communications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='communicati_user_id_19e6d9_idx'), models.Index(fields=['created_at'], name='communicati_created_3dea07_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CommunicationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('email', 'Email'), ('whatsapp', 'WhatsApp')], max_length=10)),
+                ('account_id', models.BigIntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='communication_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='communicati_day_6e400d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'type', 'account_id'), name='communication_stats_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SocialMediaProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('facebook', 'Facebook'), ('twitter', 'Twitter'), ('linkedin', 'LinkedIn')], max_length=50)),
+                ('profile_url', models.URLField(max_length=500)),
+                ('profile_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('verified', models.BooleanField(default=False)),
+                ('verification_date', models.DateTimeField(blank=True, null=True)),
+                ('profile_data', models.JSONField(default=dict)),
+                ('engagement_metrics', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='social_profiles', to='communications.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['updated_at'], name='communicati_updated_f5d21e_idx')],
+                'unique_together': {('business', 'platform', 'profile_url')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MessageQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('priority', models.IntegerField(default=0)),
+                ('scheduled_time', models.DateTimeField(db_index=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('locked_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('communication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='communications.communication')),
+                ('smtp_server', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='communications.smtpserver')),
+                ('whatsapp_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='communications.whatsappaccount')),
+            ],
+            options={
+                'ordering': ['priority', 'scheduled_time'],
+                'indexes': [models.Index(fields=['status', 'priority', 'scheduled_time'], name='messagequeue_ready_idx'), models.Index(fields=['locked_at', 'attempts'], name='communicati_locked__2e9348_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='communication',
+            index=models.Index(fields=['type', 'status', 'created_at'], name='communicati_type_b2d34c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communication',
+            index=models.Index(fields=['user', 'type', 'status'], name='communicati_user_id_703beb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communication',
+            index=models.Index(fields=['status', 'created_at'], name='communicati_status_503ef0_idx'),
+        ),
+    ]
@@ -0,0 +1,121 @@
+"""Shared MIME rendering for bulk email batches.
+
+A campaign queues thousands of communications with the same subject and
+body. ``MimeTemplate`` renders that content to MIME once; each
+``TemplatedEmail`` then only serializes its own To, Date and Message-ID
+headers in front of the shared, already encoded payload bytes.
+"""
+from email.utils import formatdate
+from typing import Dict, List, Sequence, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.mail.message import DNS_NAME, forbid_multi_line_headers, make_msgid
+from django.utils.encoding import force_str
+
+from .models import Communication
+
+CRLF = b'\r\n'
+UNDISCLOSED_RECIPIENTS = 'undisclosed-recipients:;'
+PER_MESSAGE_HEADERS = ('To', 'Date', 'Message-ID')
+
+
+class PreparedMessage:
+    """Stands in for the ``SafeMIMEText`` returned by ``EmailMessage.message()``:
+    the mail backends only serialize it."""
+
+    def __init__(self, headers: bytes, payload: bytes, charset):
+        self.headers = headers
+        self.payload = payload
+        self.charset = charset
+
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        raw = self.headers + CRLF + self.payload
+        if linesep != '\r\n':
+            raw = raw.replace(CRLF, linesep.encode())
+        return raw
+
+    def as_string(self, unixfrom=False, linesep='\n'):
+        return self.as_bytes(unixfrom, linesep).decode('utf-8', 'replace')
+
+    def get_charset(self):
+        return self.charset
+
+
+class MimeTemplate:
+    def __init__(self, subject: str, body: str, from_email: str):
+        self.subject = subject
+        self.body = body
+        self.from_email = from_email
+        self.encoding = settings.DEFAULT_CHARSET
+
+        message = EmailMessage(subject=subject, body=body, from_email=from_email).message()
+        for name in PER_MESSAGE_HEADERS:
+            del message[name]
+        self.charset = message.get_charset()
+        headers, _, self.payload = message.as_bytes(linesep='\r\n').partition(CRLF + CRLF)
+        self.headers = headers + CRLF
+        # Everything in a batch goes out within seconds of rendering
+        self.date = f"Date: {formatdate(localtime=settings.EMAIL_USE_LOCALTIME)}\r\n".encode()
+
+    def render(self, to: Sequence[str]) -> PreparedMessage:
+        if to:
+            _, value = forbid_multi_line_headers('To', ', '.join(force_str(v) for v in to), self.encoding)
+        else:
+            value = UNDISCLOSED_RECIPIENTS
+        headers = b''.join((
+            self.headers,
+            f"To: {value}\r\n".encode(),
+            self.date,
+            f"Message-ID: {make_msgid(domain=DNS_NAME)}\r\n".encode(),
+        ))
+        return PreparedMessage(headers, self.payload, self.charset)
+
+
+class TemplatedEmail(EmailMessage):
+    """EmailMessage whose ``message()`` reuses a ``MimeTemplate``."""
+
+    def __init__(self, template: MimeTemplate, to=None, bcc=None, connection=None):
+        super().__init__(
+            subject=template.subject,
+            body=template.body,
+            from_email=template.from_email,
+            to=to,
+            bcc=bcc,
+            connection=connection,
+        )
+        self.template = template
+
+    def message(self):
+        return self.template.render(self.to)
+
+
+def build_batch_emails(messages: List[Communication], connection=None,
+                       group_size: int = None) -> List[EmailMessage]:
+    """One email per recipient, rendering each distinct subject/body once.
+
+    With ``group_size`` > 1 (default ``EMAIL_BCC_GROUP_SIZE``), recipients of
+    the same content share one message: envelope-only recipients (BCC), sent
+    as a single SMTP transaction with one RCPT per recipient.
+    """
+    if group_size is None:
+        group_size = settings.EMAIL_BCC_GROUP_SIZE
+
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for message in messages:
+        groups.setdefault((message.subject, message.content), []).append(message.recipient)
+
+    emails = []
+    for (subject, body), recipients in groups.items():
+        template = MimeTemplate(subject, body, settings.DEFAULT_FROM_EMAIL)
+        if group_size > 1:
+            emails.extend(
+                TemplatedEmail(template, bcc=recipients[start:start + group_size], connection=connection)
+                for start in range(0, len(recipients), group_size)
+            )
+        else:
+            emails.extend(
+                TemplatedEmail(template, to=[recipient], connection=connection)
+                for recipient in recipients
+            )
+    return emails
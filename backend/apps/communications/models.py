@@ -1,3 +1,4 @@
+import zlib
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -44,6 +45,9 @@ class SocialMediaProfile(models.Model):
     class Meta:
         app_label = 'communications'
         unique_together = ['business', 'platform', 'profile_url']
+        indexes = [
+            models.Index(fields=['updated_at'])
+        ]
 
     def __str__(self):
         return f"{self.business.name} - {self.platform}"
@@ -52,6 +56,35 @@ class SocialMediaProfile(models.Model):
         return self.engagement_metrics.get(self.platform, {})
 
 
+class GoogleContactLink(models.Model):
+    business = models.OneToOneField(Business, on_delete=models.CASCADE, related_name='google_contact')
+    resource_name = models.CharField(max_length=255)
+    etag = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'communications'
+
+    def __str__(self):
+        return f"{self.business_id} - {self.resource_name}"
+
+
+class ProfileVerificationCache(models.Model):
+    profile_url = models.URLField(max_length=500, unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    status_code = models.IntegerField(null=True, blank=True)
+    result = models.JSONField(default=dict)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'communications'
+
+    def __str__(self):
+        return self.profile_url
+
+
 class SocialAPIConfig(models.Model):
     platform = models.CharField(max_length=50, choices=SocialMediaProfile.PLATFORM_CHOICES, unique=True)
     api_key = models.CharField(max_length=500)
@@ -84,6 +117,10 @@ class SMTPServer(models.Model):
     daily_limit = models.IntegerField(default=2000)
     messages_sent_today = models.IntegerField(default=0)
     last_reset_date = models.DateField(auto_now_add=True)
+    # Queue batch size, adapted after every batch (apps.communications.adaptive)
+    batch_size = models.IntegerField(default=50)
+    min_batch_size = models.IntegerField(default=10)
+    max_batch_size = models.IntegerField(default=200)
 
     def __str__(self):
         return self.name
@@ -104,6 +141,10 @@ class WhatsAppAccount(models.Model):
     daily_limit = models.IntegerField(default=1000)
     messages_sent_today = models.IntegerField(default=0)
     last_reset_date = models.DateField(auto_now_add=True)
+    # Queue batch size, adapted after every batch (apps.communications.adaptive)
+    batch_size = models.IntegerField(default=50)
+    min_batch_size = models.IntegerField(default=10)
+    max_batch_size = models.IntegerField(default=200)
 
     def __str__(self):
         return self.name
@@ -117,8 +158,20 @@ class WhatsAppAccount(models.Model):
 
 
 class MessageQueue(models.Model):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    FAILED = "failed"
+
+    # Sent items are deleted, so the table only ever holds pending work
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (PROCESSING, "Processing"),
+        (FAILED, "Failed"),
+    ]
+
     communication = models.OneToOneField('Communication', on_delete=models.CASCADE)
-    priority = models.IntegerField(default=0, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.IntegerField(default=0)
     scheduled_time = models.DateTimeField(db_index=True)
     attempts = models.IntegerField(default=0)
     max_attempts = models.IntegerField(default=3)
@@ -131,10 +184,16 @@ class MessageQueue(models.Model):
         app_label = 'communications'
         ordering = ['priority', 'scheduled_time']
         indexes = [
-            models.Index(fields=['priority', 'scheduled_time', 'attempts']),
+            # Serves the claim in process_message_queue: equality on status,
+            # rows already in drain order so the LIMIT stops the scan early.
+            # Not a partial index - SQLite ignores those for bound parameters.
+            models.Index(
+                fields=['status', 'priority', 'scheduled_time'],
+                name='messagequeue_ready_idx'
+            ),
             models.Index(fields=['locked_at', 'attempts']),
         ]
-        
+
     def __str__(self):
         return f"Queue item for {self.communication}"
 
@@ -169,6 +228,8 @@ class Communication(models.Model):
         ("processing", "Processing"),
         ("sent", "Sent"),
         ("failed", "Failed"),
+        # Finished, but its id is taken by a different archived row
+        ("conflict", "Archive conflict"),
     ]
 
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, default=EMAIL, db_index=True)
@@ -197,4 +258,99 @@ class Communication(models.Model):
     def __str__(self):
         if self.type == self.EMAIL:
             return f"Email to {self.recipient} ({self.status})"
-        return f"WhatsApp to {self.recipient} ({self.status})"
\ No newline at end of file
+        return f"WhatsApp to {self.recipient} ({self.status})"
+
+
+class ArchivedCommunication(models.Model):
+    # Same primary key as the Communication row it was moved from
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_communications',
+        db_index=False
+    )
+    business_id = models.BigIntegerField(null=True, blank=True)
+    smtp_server_id = models.BigIntegerField(null=True, blank=True)
+    whatsapp_account_id = models.BigIntegerField(null=True, blank=True)
+
+    type = models.CharField(max_length=10, choices=Communication.TYPE_CHOICES)
+    status = models.CharField(max_length=10, choices=Communication.STATUS_CHOICES)
+    recipient = models.CharField(max_length=255)
+    compressed_content = models.BinaryField()
+    subject = models.CharField(max_length=255, blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    whatsapp_message_id = models.CharField(max_length=100, blank=True, null=True)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'communications'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.type} to {self.recipient} ({self.status})"
+
+    @property
+    def content(self) -> str:
+        return zlib.decompress(bytes(self.compressed_content)).decode('utf-8')
+
+    @classmethod
+    def from_communication(cls, communication: Communication) -> 'ArchivedCommunication':
+        return cls(
+            id=communication.id,
+            user_id=communication.user_id,
+            business_id=communication.business_id,
+            smtp_server_id=communication.smtp_server_id,
+            whatsapp_account_id=communication.whatsapp_account_id,
+            type=communication.type,
+            status=communication.status,
+            recipient=communication.recipient,
+            compressed_content=zlib.compress(communication.content.encode('utf-8'), 6),
+            subject=communication.subject,
+            error_message=communication.error_message,
+            whatsapp_message_id=communication.whatsapp_message_id,
+            created_at=communication.created_at,
+            updated_at=communication.updated_at,
+            sent_at=communication.sent_at
+        )
+
+
+class CommunicationDailyStats(models.Model):
+    # Incremented by the batch processors (see apps.communications.stats),
+    # never recomputed from Communication on read
+    day = models.DateField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='communication_stats',
+        db_index=False
+    )
+    type = models.CharField(max_length=10, choices=Communication.TYPE_CHOICES)
+    # SMTPServer or WhatsAppAccount id depending on type, 0 when none was used
+    account_id = models.BigIntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'communications'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'type', 'account_id'],
+                name='communication_stats_bucket'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.type} stats for {self.user_id} on {self.day}"
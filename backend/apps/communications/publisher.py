@@ -0,0 +1,32 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from celery.result import AsyncResult
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _publisher_pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_PUBLISH_WORKERS,
+                thread_name_prefix='celery-publish'
+            )
+        return _executor
+
+
+async def apply_task(task, **kwargs) -> AsyncResult:
+    """``task.apply_async(kwargs=kwargs)`` for async views.
+
+    Celery has no asyncio publisher, so the publish runs on a small pool of
+    threads; each borrows a connection from Celery's broker pool, which is
+    why the pool size should match ``broker_pool_limit``. Unlike
+    sync_to_async, publishes from concurrent requests overlap.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_publisher_pool(), lambda: task.apply_async(kwargs=kwargs))
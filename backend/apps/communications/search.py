@@ -0,0 +1,150 @@
+import logging
+from django.db import connections
+from django.db.models import Q, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Business
+
+logger = logging.getLogger(__name__)
+
+BUSINESS_TABLE = Business._meta.db_table
+FTS_TABLE = f'{BUSINESS_TABLE}_fts'
+TRIGRAM_INDEX = f'{BUSINESS_TABLE}_search_trgm'
+TSVECTOR_INDEX = f'{BUSINESS_TABLE}_search_tsv'
+MIN_TRIGRAM_LENGTH = 3
+
+# Postgres: both indexes are built on this exact expression so the planner
+# can use them for the filters below.
+PG_DOCUMENT = (
+    f"(coalesce({BUSINESS_TABLE}.name, '') || ' ' || "
+    f"coalesce({BUSINESS_TABLE}.category, '') || ' ' || "
+    f"coalesce({BUSINESS_TABLE}.address, ''))"
+)
+
+
+def _sqlite_fts_available(connection) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def _install_sqlite_index(connection):
+    if _sqlite_fts_available(connection):
+        return
+
+    with connection.cursor() as cursor:
+        # External-content FTS5 table over the business columns, kept in sync
+        # by triggers so bulk upserts are indexed too.
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"name, category, address, "
+            f"content='{BUSINESS_TABLE}', content_rowid='id', tokenize='trigram')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {BUSINESS_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, name, category, address) "
+            f"VALUES (new.id, new.name, new.category, new.address); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {BUSINESS_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, address) "
+            f"VALUES ('delete', old.id, old.name, old.category, old.address); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {BUSINESS_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, address) "
+            f"VALUES ('delete', old.id, old.name, old.category, old.address); "
+            f"INSERT INTO {FTS_TABLE}(rowid, name, category, address) "
+            f"VALUES (new.id, new.name, new.category, new.address); END"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _install_postgres_index(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON {BUSINESS_TABLE} "
+            f"USING gin ({PG_DOCUMENT} gin_trgm_ops)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TSVECTOR_INDEX} ON {BUSINESS_TABLE} "
+            f"USING gin (to_tsvector('simple', {PG_DOCUMENT}))"
+        )
+
+
+def install_search_index(using='default', **kwargs):
+    connection = connections[using]
+    try:
+        if connection.vendor == 'sqlite':
+            _install_sqlite_index(connection)
+        elif connection.vendor == 'postgresql':
+            _install_postgres_index(connection)
+    except Exception as e:
+        # Search falls back to plain substring matching without the index
+        logger.warning(f"Could not install business search index: {str(e)}")
+
+
+def _fts_match_expression(terms):
+    return ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+# Annotates search_rank (higher is better) and orders by it. Terms shorter
+# than a trigram, or backends without an index, fall back to icontains.
+def search_businesses(queryset, query: str):
+    terms = query.split()
+    connection = connections[queryset.db]
+
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == 'postgresql':
+        text = ' '.join(terms)
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f"ts_rank(to_tsvector('simple', {PG_DOCUMENT}), websearch_to_tsquery('simple', %s)) "
+                f"+ word_similarity(%s, {PG_DOCUMENT})",
+                [text, text],
+                output_field=FloatField()
+            )
+        ).filter(
+            id__in=RawSQL(
+                f"SELECT id FROM {BUSINESS_TABLE} WHERE "
+                f"to_tsvector('simple', {PG_DOCUMENT}) @@ websearch_to_tsquery('simple', %s) "
+                f"OR %s <%% {PG_DOCUMENT}",
+                [text, text]
+            )
+        ).order_by('-search_rank', 'id')
+
+    trigram_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_LENGTH]
+    if (
+        connection.vendor == 'sqlite'
+        and len(trigram_terms) == len(terms)
+        and _sqlite_fts_available(connection)
+    ):
+        match = _fts_match_expression(trigram_terms)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            # bm25() is lower-is-better, negate it so ranks sort the same way on every backend
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {BUSINESS_TABLE}.id",
+                [match],
+                output_field=FloatField()
+            )
+        ).order_by('-search_rank', 'id')
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(name__icontains=term)
+            | Q(category__icontains=term)
+            | Q(address__icontains=term)
+        )
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    ).order_by('name', 'id')
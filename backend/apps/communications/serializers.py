@@ -104,6 +104,26 @@ class BusinessSerializer(serializers.ModelSerializer):
         return value
 
 
+class BusinessSearchResultSerializer(BusinessSerializer):
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+
+    class Meta(BusinessSerializer.Meta):
+        fields = BusinessSerializer.Meta.fields + ['rank']
+
+
+def validate_batch_bounds(instance, data):
+    minimum = data.get('min_batch_size', getattr(instance, 'min_batch_size', 10))
+    maximum = data.get('max_batch_size', getattr(instance, 'max_batch_size', 200))
+    if minimum < 1:
+        raise serializers.ValidationError({'min_batch_size': "Minimum batch size must be at least 1"})
+    if maximum < minimum:
+        raise serializers.ValidationError({'max_batch_size': "Maximum batch size cannot be below the minimum"})
+    if 'batch_size' not in data:
+        # Keep the adaptive size (the model default on create) inside the bounds
+        data['batch_size'] = max(minimum, min(maximum, getattr(instance, 'batch_size', 50)))
+    return data
+
+
 class SMTPServerSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, style={'input_type': 'password'})
     
@@ -112,9 +132,9 @@ class SMTPServerSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'host', 'port', 'username', 'password',
             'use_tls', 'is_active', 'daily_limit', 'messages_sent_today',
-            'last_reset_date'
+            'last_reset_date', 'batch_size', 'min_batch_size', 'max_batch_size'
         ]
-        read_only_fields = ['messages_sent_today', 'last_reset_date']
+        read_only_fields = ['messages_sent_today', 'last_reset_date', 'batch_size']
 
     def validate_port(self, value):
         if not (0 <= value <= 65535):
@@ -126,6 +146,9 @@ class SMTPServerSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Daily limit cannot be negative")
         return value
 
+    def validate(self, data):
+        return validate_batch_bounds(self.instance, data)
+
 
 class WhatsAppAccountSerializer(serializers.ModelSerializer):
     access_token = serializers.CharField(write_only=True, style={'input_type': 'password'})
@@ -135,15 +158,18 @@ class WhatsAppAccountSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'phone_number_id', 'access_token',
             'is_active', 'daily_limit', 'messages_sent_today',
-            'last_reset_date'
+            'last_reset_date', 'batch_size', 'min_batch_size', 'max_batch_size'
         ]
-        read_only_fields = ['messages_sent_today', 'last_reset_date']
+        read_only_fields = ['messages_sent_today', 'last_reset_date', 'batch_size']
 
     def validate_daily_limit(self, value):
         if value < 0:
             raise serializers.ValidationError("Daily limit cannot be negative")
         return value
 
+    def validate(self, data):
+        return validate_batch_bounds(self.instance, data)
+
 
 class SocialAPIConfigSerializer(serializers.ModelSerializer):
     api_key = serializers.CharField(write_only=True, style={'input_type': 'password'})
@@ -215,11 +241,11 @@ class MessageQueueSerializer(serializers.ModelSerializer):
     class Meta:
         model = MessageQueue
         fields = [
-            'id', 'communication', 'communication_details',
+            'id', 'communication', 'communication_details', 'status',
             'priority', 'scheduled_time', 'attempts', 'max_attempts',
             'smtp_server', 'whatsapp_account', 'locked_at', 'locked_by'
         ]
-        read_only_fields = ['locked_at', 'locked_by', 'attempts']
+        read_only_fields = ['status', 'locked_at', 'locked_by', 'attempts']
 
     def validate_max_attempts(self, value):
         if value < 1:
@@ -234,4 +260,27 @@ class MessageQueueSerializer(serializers.ModelSerializer):
     def validate_scheduled_time(self, value):
         if value < timezone.now():
             raise serializers.ValidationError("Scheduled time cannot be in the past")
-        return value
\ No newline at end of file
+        return value
+
+
+class MessageQueueListSerializer(serializers.ModelSerializer):
+    """Slim queue row for the admin listing; load rows with
+    ``.select_related('communication').only(*MessageQueueListSerializer.columns)``."""
+    type = serializers.CharField(source='communication.type', read_only=True)
+    recipient = serializers.CharField(source='communication.recipient', read_only=True)
+    user = serializers.IntegerField(source='communication.user_id', read_only=True)
+
+    columns = [
+        'id', 'communication_id', 'status', 'priority', 'scheduled_time', 'attempts',
+        'max_attempts', 'smtp_server_id', 'whatsapp_account_id', 'locked_at', 'locked_by',
+        'communication__type', 'communication__recipient', 'communication__user_id'
+    ]
+
+    class Meta:
+        model = MessageQueue
+        fields = [
+            'id', 'communication', 'type', 'recipient', 'user', 'status',
+            'priority', 'scheduled_time', 'attempts', 'max_attempts',
+            'smtp_server', 'whatsapp_account', 'locked_at', 'locked_by'
+        ]
+        read_only_fields = fields
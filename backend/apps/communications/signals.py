@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Business, SocialMediaProfile
+from .utils import invalidate_business_list_cache
+
+
+@receiver([post_save, post_delete], sender=Business)
+@receiver([post_save, post_delete], sender=SocialMediaProfile)
+def invalidate_business_list(sender, **kwargs):
+    invalidate_business_list_cache()
@@ -0,0 +1,137 @@
+from collections import Counter
+from datetime import date, timedelta
+from typing import Iterable, Optional, Dict, Any
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Communication, CommunicationDailyStats, MessageQueue, SMTPServer, WhatsAppAccount
+
+STATS_FIELDS = ('sent', 'failed')
+
+
+def _upsert_sql() -> str:
+    qn = connection.ops.quote_name
+    table = qn(CommunicationDailyStats._meta.db_table)
+    # ON CONFLICT ... DO UPDATE works the same on SQLite (3.24+) and Postgres,
+    # so concurrent workers add to a bucket without reading it first
+    return (
+        f"INSERT INTO {table} (day, user_id, type, account_id, sent, failed) "
+        f"VALUES (%s, %s, %s, %s, %s, %s) "
+        f"ON CONFLICT (user_id, day, type, account_id) DO UPDATE SET "
+        f"sent = {table}.sent + excluded.sent, "
+        f"failed = {table}.failed + excluded.failed"
+    )
+
+
+def record_outcomes(sent: Iterable[Communication] = (), failed: Iterable[Communication] = (),
+                    account_id: Optional[int] = None, day: Optional[date] = None):
+    """Adds today's sent/failed counts for a processed batch to the rollup."""
+    counts = Counter()
+    for field, messages in (('sent', sent), ('failed', failed)):
+        for message in messages:
+            counts[(message.user_id, message.type, field)] += 1
+    if not counts:
+        return
+
+    buckets = {}
+    for (user_id, message_type, field), count in counts.items():
+        bucket = buckets.setdefault((user_id, message_type), {'sent': 0, 'failed': 0})
+        bucket[field] += count
+
+    day = connection.ops.adapt_datefield_value(day or timezone.localdate())
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(), [
+            (day, user_id, message_type, account_id or 0, bucket['sent'], bucket['failed'])
+            for (user_id, message_type), bucket in buckets.items()
+        ])
+
+
+def communication_stats(user_id: Optional[int], start: date, end: date,
+                        message_type: Optional[str] = None) -> Dict[str, Any]:
+    rows = CommunicationDailyStats.objects.filter(day__gte=start, day__lte=end)
+    queue = MessageQueue.objects.filter(
+        status__in=[MessageQueue.QUEUED, MessageQueue.PROCESSING]
+    )
+    if user_id is not None:
+        rows = rows.filter(user_id=user_id)
+        queue = queue.filter(communication__user_id=user_id)
+    if message_type:
+        rows = rows.filter(type=message_type)
+        queue = queue.filter(communication__type=message_type)
+
+    group = ['day', 'type', 'account_id'] + (['user_id'] if user_id is None else [])
+    daily = list(
+        rows.values(*group)
+        .annotate(sent=Sum('sent'), failed=Sum('failed'))
+        .order_by('day', *group[1:])
+    )
+
+    # Queue rows are deleted once sent, so this counts pending work only
+    queued = dict(
+        queue.values_list('communication__type').annotate(count=Count('id')).order_by()
+    )
+
+    by_type = {
+        channel: {'sent': 0, 'failed': 0, 'queued': queued.get(channel, 0)}
+        for channel, _ in Communication.TYPE_CHOICES
+        if not message_type or channel == message_type
+    }
+    for row in daily:
+        for field in STATS_FIELDS:
+            by_type[row['type']][field] += row[field]
+
+    return {
+        'start': start,
+        'end': end,
+        'totals': {
+            field: sum(counts[field] for counts in by_type.values())
+            for field in STATS_FIELDS + ('queued',)
+        },
+        'by_type': by_type,
+        'daily': daily
+    }
+
+
+def default_range(days: int = 30):
+    end = timezone.localdate()
+    return end - timedelta(days=days - 1), end
+
+
+def queue_summary(queryset) -> Dict[str, Any]:
+    """Counts of ``queryset``'s MessageQueue rows by status, priority and
+    account, from one GROUP BY."""
+    by_status = {code: 0 for code, _ in MessageQueue.STATUS_CHOICES}
+    by_priority = Counter()
+    by_account = Counter()
+    rows = queryset.values('status', 'priority', 'smtp_server_id', 'whatsapp_account_id').annotate(
+        count=Count('id')
+    ).order_by()
+    for row in rows:
+        by_status[row['status']] = by_status.get(row['status'], 0) + row['count']
+        by_priority[row['priority']] += row['count']
+        by_account[(row['smtp_server_id'], row['whatsapp_account_id'])] += row['count']
+
+    return {
+        'total': sum(by_priority.values()),
+        'by_status': by_status,
+        'by_priority': [
+            {'priority': priority, 'count': count}
+            for priority, count in sorted(by_priority.items())
+        ],
+        'by_account': [
+            {'smtp_server': smtp_server, 'whatsapp_account': whatsapp_account, 'count': count}
+            for (smtp_server, whatsapp_account), count in by_account.most_common()
+        ],
+        'batch_sizes': batch_sizes(),
+    }
+
+
+def batch_sizes() -> Dict[str, Any]:
+    """Current adaptive batch size of every active sending account."""
+    fields = ('id', 'name', 'batch_size', 'min_batch_size', 'max_batch_size')
+    return {
+        'smtp_servers': list(SMTPServer.objects.filter(is_active=True).order_by('id').values(*fields)),
+        'whatsapp_accounts': list(WhatsAppAccount.objects.filter(is_active=True).order_by('id').values(*fields)),
+    }
@@ -1,30 +1,51 @@
 import os
 import logging
-from typing import Dict, Any, List, Optional
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from bs4 import BeautifulSoup
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import Prefetch
+from googleapiclient.errors import HttpError
 import requests
-import asyncio
-import aiohttp
 
 from config.celery import app
 from .models import (
     Communication,
     Business,
     SocialMediaProfile,
+    ProfileVerificationCache,
+    GoogleContactLink,
     MessageQueue
 )
+from .archive import archive_communications
+from .crawler import crawl_profiles
+from .google_clients import get_people_service, get_places_service
+from .stats import record_outcomes
+from .events import publish_status
 from .utils import (
     send_email_message,
     send_whatsapp_message,
-    process_message_queue
+    process_message_queue,
+    reap_stuck_messages,
+    upsert_businesses,
+    invalidate_business_list_cache,
+    build_contact_data,
+    contact_content_hash,
+    business_search_cache_key,
+    business_search_inflight_key,
+    SEARCH_CACHE_TTL
 )
 
 logger = logging.getLogger(__name__)
 
+# People API limit for batchCreateContacts / batchUpdateContacts
+CONTACT_BATCH_SIZE = 200
+CONTACT_PERSON_FIELDS = 'names,phoneNumbers,addresses,urls'
+CONTACT_READ_MASK = 'metadata'
+
 
 @app.task(name='communications.process_message_queue_task')
 def process_message_queue_task():
@@ -34,6 +55,36 @@ def process_message_queue_task():
         logger.error(f"Error processing message queue: {str(e)}")
 
 
+@app.task(name='communications.reap_stuck_messages', bind=True)
+def reap_stuck_messages_task(self, lease_seconds: Optional[int] = None):
+    try:
+        return {
+            "status": "success",
+            **reap_stuck_messages(lease_seconds)
+        }
+    except Exception as e:
+        logger.error(f"Error reaping stuck messages: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+
+@app.task(name='communications.archive_communications', bind=True)
+def archive_communications_task(self, older_than_days: Optional[int] = None, batch_size: Optional[int] = None):
+    try:
+        return {
+            "status": "success",
+            "archived_count": archive_communications(older_than_days, batch_size)
+        }
+    except Exception as e:
+        logger.error(f"Error archiving communications: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+
 @app.task(name='communications.send_email_async', bind=True)
 def send_email_async(self, to_email: str, subject: str, message: str, user_id: int, comm_id: int):
     from django.contrib.auth import get_user_model
@@ -42,15 +93,22 @@ def send_email_async(self, to_email: str, subject: str, message: str, user_id: i
     comm = Communication.objects.get(id=comm_id)
 
     try:
-        MessageQueue.objects.get_or_create(
+        queue_item, created = MessageQueue.objects.get_or_create(
             communication=comm,
             defaults={
                 'scheduled_time': timezone.now(),
                 'priority': 1
             }
         )
+        if not created and queue_item.status != MessageQueue.QUEUED:
+            MessageQueue.objects.filter(id=queue_item.id).update(
+                status=MessageQueue.QUEUED,
+                locked_at=None,
+                locked_by=None
+            )
         comm.status = "queued"
         comm.save()
+        publish_status([comm], 'queued')
 
         return {
             "status": "queued",
@@ -60,6 +118,8 @@ def send_email_async(self, to_email: str, subject: str, message: str, user_id: i
         comm.status = "failed"
         comm.error_message = str(e)
         comm.save()
+        record_outcomes(failed=[comm])
+        publish_status([comm], 'failed', {comm.id: str(e)})
         return {"status": "error", "error": str(e), "recipient": to_email}
 
 
@@ -71,15 +131,22 @@ def send_whatsapp_async(self, to_number: str, message_type: str = "text", messag
     comm = Communication.objects.get(id=comm_id)
 
     try:
-        MessageQueue.objects.get_or_create(
+        queue_item, created = MessageQueue.objects.get_or_create(
             communication=comm,
             defaults={
                 'scheduled_time': timezone.now(),
                 'priority': 1
             }
         )
+        if not created and queue_item.status != MessageQueue.QUEUED:
+            MessageQueue.objects.filter(id=queue_item.id).update(
+                status=MessageQueue.QUEUED,
+                locked_at=None,
+                locked_by=None
+            )
         comm.status = "queued"
         comm.save()
+        publish_status([comm], 'queued')
 
         return {
             "status": "queued",
@@ -89,16 +156,15 @@ def send_whatsapp_async(self, to_number: str, message_type: str = "text", messag
         comm.status = "failed"
         comm.error_message = str(e)
         comm.save()
+        record_outcomes(failed=[comm])
+        publish_status([comm], 'failed', {comm.id: str(e)})
         return {"status": "error", "error": str(e), "recipient": to_number}
 
 
 @app.task(name='communications.search_business', bind=True)
 def search_business(self, query: str, location: str) -> Dict[str, Any]:
     try:
-        credentials = Credentials.from_authorized_user_info(
-            settings.GOOGLE_CREDENTIALS
-        )
-        places_service = build('places', 'v1', credentials=credentials)
+        places_service = get_places_service()
         
         search_request = {
             'textQuery': f"{query} in {location}",
@@ -116,9 +182,8 @@ def search_business(self, query: str, location: str) -> Dict[str, Any]:
         
         response = places_service.places().searchText(body=search_request).execute()
         
-        businesses = []
-        for place in response.get('places', []):
-            business_data = {
+        businesses = [
+            {
                 'name': place.get('name'),
                 'address': place.get('formattedAddress'),
                 'phone_number': place.get('phoneNumber', ''),
@@ -127,18 +192,19 @@ def search_business(self, query: str, location: str) -> Dict[str, Any]:
                 'google_maps_link': place.get('googleMapsUri', ''),
                 'google_place_id': place.get('placeId')
             }
-            
-            business, created = Business.objects.update_or_create(
-                google_place_id=business_data['google_place_id'],
-                defaults=business_data
-            )
-            
-            businesses.append(business_data)
+            for place in response.get('places', [])
+        ]
         
-        return {
+        upsert_businesses(businesses)
+        
+        result = {
             "status": "success",
-            "businesses": businesses
+            "businesses": businesses,
+            "place_ids": [b['google_place_id'] for b in businesses if b['google_place_id']]
         }
+        cache.set(business_search_cache_key(query, location), result, SEARCH_CACHE_TTL)
+        
+        return result
         
     except Exception as e:
         logger.error(f"Error searching businesses: {str(e)}")
@@ -146,134 +212,356 @@ def search_business(self, query: str, location: str) -> Dict[str, Any]:
             "status": "error",
             "error": str(e)
         }
+    finally:
+        # Release the single-flight claim so the next search can dispatch
+        inflight_key = business_search_inflight_key(query, location)
+        if cache.get(inflight_key) == self.request.id:
+            cache.delete(inflight_key)
+
+
+def _verify_profiles(profiles: List[SocialMediaProfile]) -> Dict[str, int]:
+    urls = list(dict.fromkeys(profile.profile_url for profile in profiles))
+    entries = {
+        entry.profile_url: entry
+        for entry in ProfileVerificationCache.objects.filter(profile_url__in=urls)
+    }
+    # Only pages that existed last time are worth a conditional request
+    validators = {
+        url: {"etag": entry.etag, "last_modified": entry.last_modified}
+        for url, entry in entries.items()
+        if entry.result.get('exists') and (entry.etag or entry.last_modified)
+    }
+    fetched = crawl_profiles(urls, validators)
+    
+    now = timezone.now()
+    results = {}
+    cache_rows = []
+    not_modified = 0
+    for url, result in zip(urls, fetched):
+        if result.get('not_modified'):
+            entry = entries[url]
+            result = entry.result
+            etag, last_modified = entry.etag, entry.last_modified
+            not_modified += 1
+        else:
+            etag = result.pop('etag', '')
+            last_modified = result.pop('last_modified', '')
+        
+        results[url] = result
+        cache_rows.append(ProfileVerificationCache(
+            profile_url=url,
+            etag=etag,
+            last_modified=last_modified,
+            status_code=result.get('status_code'),
+            result=result,
+            checked_at=now
+        ))
+    
+    for profile in profiles:
+        result = results[profile.profile_url]
+        profile.verified = result.get('exists', False)
+        profile.verification_date = now if result.get('exists') else None
+        profile.profile_data = result
+        profile.updated_at = now
+    
+    with transaction.atomic():
+        ProfileVerificationCache.objects.bulk_create(
+            cache_rows,
+            update_conflicts=True,
+            unique_fields=['profile_url'],
+            update_fields=['etag', 'last_modified', 'status_code', 'result', 'checked_at'],
+            batch_size=500
+        )
+        SocialMediaProfile.objects.bulk_update(
+            profiles,
+            ['verified', 'verification_date', 'profile_data', 'updated_at'],
+            batch_size=500
+        )
+    if profiles:
+        invalidate_business_list_cache()
+    
+    return {
+        "verified_count": sum(1 for profile in profiles if profile.verified),
+        "not_modified_count": not_modified
+    }
 
 
-async def verify_social_profile(session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+@app.task(name='communications.verify_social_profiles', bind=True)
+def verify_social_profiles(self, business_id: int):
     try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                title = soup.title.string if soup.title else ""
-                meta_desc = soup.find('meta', {'name': 'description'})
-                description = meta_desc.get('content', '') if meta_desc else ""
-                
-                return {
-                    "exists": True,
-                    "title": title,
-                    "description": description,
-                    "status_code": response.status
-                }
-            return {
-                "exists": False,
-                "status_code": response.status
-            }
+        business = Business.objects.get(id=business_id)
+        profiles = list(SocialMediaProfile.objects.filter(business=business, verified=False))
+        
+        return {
+            "status": "success",
+            **_verify_profiles(profiles)
+        }
+        
     except Exception as e:
+        logger.error(f"Error verifying social profiles: {str(e)}")
         return {
-            "exists": False,
+            "status": "error",
             "error": str(e)
         }
 
 
-@app.task(name='communications.verify_social_profiles', bind=True)
-def verify_social_profiles(self, business_id: int):
+@app.task(name='communications.verify_social_profiles_bulk', bind=True)
+def verify_social_profiles_bulk(self, business_ids: Optional[List[int]] = None):
     try:
-        business = Business.objects.get(id=business_id)
-        profiles = SocialMediaProfile.objects.filter(business=business, verified=False)
+        profiles = SocialMediaProfile.objects.filter(verified=False)
+        if business_ids is not None:
+            profiles = profiles.filter(business_id__in=business_ids)
+        profiles = list(profiles.only('id', 'business_id', 'profile_url'))
         
-        async def verify_all_profiles():
-            async with aiohttp.ClientSession() as session:
-                tasks = [
-                    verify_social_profile(session, profile.profile_url)
-                    for profile in profiles
-                ]
-                results = await asyncio.gather(*tasks)
-                return results
+        return {
+            "status": "success",
+            "profile_count": len(profiles),
+            **_verify_profiles(profiles)
+        }
         
-        loop = asyncio.get_event_loop()
-        results = loop.run_until_complete(verify_all_profiles())
+    except Exception as e:
+        logger.error(f"Error verifying social profiles in bulk: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+
+@app.task(name='communications.reverify_stale_profiles', bind=True)
+def reverify_stale_profiles(self, max_age_hours: Optional[int] = None, limit: Optional[int] = None):
+    try:
+        max_age = timedelta(hours=max_age_hours or settings.PROFILE_REVERIFY_MAX_AGE_HOURS)
+        cutoff = timezone.now() - max_age
         
-        for profile, result in zip(profiles, results):
-            profile.verified = result.get('exists', False)
-            profile.verification_date = timezone.now() if result.get('exists') else None
-            profile.profile_data = result
-            profile.save()
+        # Oldest first; verifying a profile bumps updated_at, so each run
+        # picks up where the previous one stopped.
+        profiles = list(
+            SocialMediaProfile.objects
+            .filter(updated_at__lt=cutoff)
+            .order_by('updated_at')
+            .only('id', 'business_id', 'profile_url')[:limit or settings.PROFILE_REVERIFY_BATCH_SIZE]
+        )
         
         return {
             "status": "success",
-            "verified_count": sum(1 for r in results if r.get('exists', False))
+            "profile_count": len(profiles),
+            **_verify_profiles(profiles)
         }
         
     except Exception as e:
-        logger.error(f"Error verifying social profiles: {str(e)}")
+        logger.error(f"Error re-verifying stale social profiles: {str(e)}")
         return {
             "status": "error",
             "error": str(e)
         }
 
 
+def _digits(value: Optional[str]) -> str:
+    return ''.join(ch for ch in value or '' if ch.isdigit())
+
+
+def _chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _find_existing_contacts(service, businesses: List[Business]) -> Dict[int, Dict[str, str]]:
+    # Businesses without a stored link may already have a contact (created
+    # by hand or before links were kept); match them by normalized phone
+    # from one paged listing instead of a search per business. Names are
+    # not unique enough: a same-named personal contact would be overwritten.
+    by_phone = {_digits(b.phone_number): b for b in businesses if _digits(b.phone_number)}
+    matches = {}
+    if not by_phone:
+        return matches
+    
+    params = {
+        'resourceName': 'people/me',
+        'personFields': 'phoneNumbers,metadata',
+        'pageSize': 1000
+    }
+    while True:
+        response = service.people().connections().list(**params).execute()
+        for person in response.get('connections', []):
+            business = None
+            for phone in person.get('phoneNumbers', []):
+                business = by_phone.get(_digits(phone.get('value')))
+                if business:
+                    break
+            if business is not None and business.id not in matches:
+                matches[business.id] = {
+                    'resource_name': person['resourceName'],
+                    'etag': person.get('etag', '')
+                }
+        
+        page_token = response.get('nextPageToken')
+        if not page_token or len(matches) == len(by_phone):
+            return matches
+        params['pageToken'] = page_token
+
+
+def _refresh_contact_etags(service, links: List[GoogleContactLink]):
+    response = service.people().getBatchGet(
+        resourceNames=[link.resource_name for link in links],
+        personFields='metadata'
+    ).execute()
+    etags = {
+        item.get('requestedResourceName'): (item.get('person') or {}).get('etag')
+        for item in response.get('responses', [])
+    }
+    for link in links:
+        link.etag = etags.get(link.resource_name) or link.etag
+
+
+def _batch_update_contacts(service, chunk: List):
+    return service.people().batchUpdateContacts(body={
+        'contacts': {
+            link.resource_name: {**contact_data, 'etag': link.etag}
+            for _, contact_data, _, link in chunk
+        },
+        'updateMask': CONTACT_PERSON_FIELDS,
+        'readMask': CONTACT_READ_MASK
+    }).execute()
+
+
+def _sync_contacts(service, businesses: List[Business]) -> Dict[int, Tuple[str, Optional[str]]]:
+    now = timezone.now()
+    links = {
+        link.business_id: link
+        for link in GoogleContactLink.objects.filter(business__in=businesses)
+    }
+    outcome = {}
+    pending = []
+    
+    for business in businesses:
+        contact_data = build_contact_data(business, business.verified_profiles)
+        digest = contact_content_hash(contact_data)
+        link = links.get(business.id)
+        if link and link.content_hash == digest:
+            outcome[business.id] = ('unchanged', link.resource_name)
+            continue
+        pending.append((business, contact_data, digest))
+    
+    unlinked = [business for business, _, _ in pending if business.id not in links]
+    if unlinked:
+        for business_id, match in _find_existing_contacts(service, unlinked).items():
+            links[business_id] = GoogleContactLink(business_id=business_id, **match)
+    
+    creates = [item for item in pending if item[0].id not in links]
+    updates = [item + (links[item[0].id],) for item in pending if item[0].id in links]
+    synced = []
+    
+    for chunk in _chunks(creates, CONTACT_BATCH_SIZE):
+        response = service.people().batchCreateContacts(body={
+            'contacts': [{'contactPerson': contact_data} for _, contact_data, _ in chunk],
+            'readMask': CONTACT_READ_MASK
+        }).execute()
+        # createdPeople is in request order
+        for (business, _, digest), created in zip(chunk, response.get('createdPeople', [])):
+            person = created.get('person') or {}
+            if not person.get('resourceName'):
+                outcome[business.id] = ('failed', None)
+                continue
+            synced.append(GoogleContactLink(
+                business=business,
+                resource_name=person['resourceName'],
+                etag=person.get('etag', ''),
+                content_hash=digest,
+                synced_at=now
+            ))
+            outcome[business.id] = ('created', person['resourceName'])
+    
+    for chunk in _chunks(updates, CONTACT_BATCH_SIZE):
+        try:
+            response = _batch_update_contacts(service, chunk)
+        except HttpError as e:
+            # Usually a stale etag after an edit in Google; refetch and retry once
+            logger.warning(f"Retrying Google Contacts batch update: {str(e)}")
+            try:
+                _refresh_contact_etags(service, [link for *_, link in chunk])
+                response = _batch_update_contacts(service, chunk)
+            except HttpError as e:
+                logger.error(f"Error updating Google Contacts batch: {str(e)}")
+                for business, *_ in chunk:
+                    outcome[business.id] = ('failed', None)
+                continue
+        
+        results = response.get('updateResult', {})
+        for business, _, digest, link in chunk:
+            person = (results.get(link.resource_name) or {}).get('person')
+            if not person:
+                outcome[business.id] = ('failed', None)
+                continue
+            link.etag = person.get('etag', link.etag)
+            link.content_hash = digest
+            link.synced_at = now
+            synced.append(link)
+            outcome[business.id] = ('updated', link.resource_name)
+    
+    GoogleContactLink.objects.bulk_create(
+        synced,
+        update_conflicts=True,
+        unique_fields=['business'],
+        update_fields=['resource_name', 'etag', 'content_hash', 'synced_at'],
+        batch_size=500
+    )
+    
+    return outcome
+
+
+def _contact_businesses():
+    return Business.objects.prefetch_related(
+        Prefetch(
+            'social_profiles',
+            queryset=SocialMediaProfile.objects.filter(verified=True).order_by('id'),
+            to_attr='verified_profiles'
+        )
+    )
+
+
 @app.task(name='communications.sync_google_contacts', bind=True)
 def sync_google_contacts(self, business_id: int):
     try:
-        business = Business.objects.get(id=business_id)
-        credentials = Credentials.from_authorized_user_info(
-            settings.GOOGLE_CREDENTIALS
-        )
+        business = _contact_businesses().get(id=business_id)
+        action, resource_name = _sync_contacts(get_people_service(), [business])[business.id]
         
-        service = build('people', 'v1', credentials=credentials)
-        
-        query = f"name:{business.name} OR phoneNumber:{business.phone_number}"
-        existing = service.people().searchContacts(
-            query=query,
-            readMask='names,phoneNumbers,addresses,urls'
-        ).execute()
+        if action == 'failed':
+            return {
+                "status": "error",
+                "error": "Google Contacts did not accept the contact"
+            }
         
-        contact_data = {
-            'names': [{'givenName': business.name}],
-            'phoneNumbers': [{'value': business.phone_number}],
-            'addresses': [{'formattedValue': business.address}],
-            'urls': []
+        return {
+            "status": "success",
+            "contact_id": resource_name,
+            "action": action
         }
         
-        if business.website:
-            contact_data['urls'].append({
-                'value': business.website,
-                'type': 'website'
-            })
-        
-        if business.google_maps_link:
-            contact_data['urls'].append({
-                'value': business.google_maps_link,
-                'type': 'map'
-            })
-        
-        for profile in business.social_profiles.filter(verified=True):
-            contact_data['urls'].append({
-                'value': profile.profile_url,
-                'type': profile.platform
-            })
-        
-        if existing.get('results'):
-            contact = existing['results'][0]
-            result = service.people().updateContact(
-                resourceName=contact['person']['resourceName'],
-                body=contact_data,
-                updatePersonFields='names,phoneNumbers,addresses,urls'
-            ).execute()
-        else:
-            result = service.people().createContact(
-                body=contact_data
-            ).execute()
+    except Exception as e:
+        logger.error(f"Error syncing to Google Contacts: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+
+@app.task(name='communications.sync_google_contacts_batch', bind=True)
+def sync_google_contacts_batch(self, business_ids: List[int]):
+    try:
+        businesses = list(_contact_businesses().filter(id__in=business_ids))
+        outcome = _sync_contacts(get_people_service(), businesses)
+        counts = Counter(action for action, _ in outcome.values())
         
         return {
             "status": "success",
-            "contact_id": result.get('resourceName'),
-            "action": "updated" if existing.get('results') else "created"
+            "created": counts['created'],
+            "updated": counts['updated'],
+            "unchanged": counts['unchanged'],
+            "failed": counts['failed']
         }
         
     except Exception as e:
-        logger.error(f"Error syncing to Google Contacts: {str(e)}")
+        logger.error(f"Error syncing businesses to Google Contacts: {str(e)}")
         return {
             "status": "error",
             "error": str(e)
@@ -287,27 +575,30 @@ def bulk_message_send(self, message_type: str, recipients: List[str], content: s
         User = get_user_model()
         user = User.objects.get(id=user_id) if user_id else None
         
-        communications = []
         base_priority = 5
-        
-        for recipient in recipients:
-            comm = Communication.objects.create(
-                user=user,
-                type=message_type,
-                status="pending",
-                recipient=recipient,
-                content=content,
-                subject=subject
-            )
-            communications.append(comm)
-            
-            MessageQueue.objects.create(
-                communication=comm,
-                priority=base_priority,
-                scheduled_time=timezone.now() + timedelta(
-                    seconds=len(communications) * 2 
+        now = timezone.now()
+
+        with transaction.atomic():
+            communications = Communication.objects.bulk_create([
+                Communication(
+                    user=user,
+                    type=message_type,
+                    status="queued",
+                    recipient=recipient,
+                    content=content,
+                    subject=subject
                 )
-            )
+                for recipient in recipients
+            ])
+
+            MessageQueue.objects.bulk_create([
+                MessageQueue(
+                    communication=comm,
+                    priority=base_priority,
+                    scheduled_time=now + timedelta(seconds=(index + 1) * 2)
+                )
+                for index, comm in enumerate(communications)
+            ])
         
         process_message_queue_task.delay()
         
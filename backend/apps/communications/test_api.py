@@ -1,9 +1,13 @@
+import json
+from datetime import timedelta
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 from django.utils import timezone
+from django.core.cache import cache
 from unittest.mock import patch
 from .models import (
     Communication,
@@ -14,11 +18,13 @@ from .models import (
     MessageQueue,
     SocialAPIConfig
 )
+from .utils import business_search_cache_key, business_search_inflight_key
 
 User = get_user_model()
 
 class BaseAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         # Create regular user
         self.user = User.objects.create_user(
@@ -84,12 +90,71 @@ class BusinessViewSetTests(BaseAPITest):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(reverse('communications:business-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(len(response.json()['results']), 1)
 
-    @patch('apps.communications.tasks.search_business.delay')
+    def test_business_list_page_cache_shared_and_invalidated(self):
+        self.client.force_authenticate(user=self.user)
+        first = self.client.get(reverse('communications:business-list'))
+        
+        self.client.force_authenticate(user=self.admin_user)
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('communications:business-list'))
+        self.assertEqual(first.content, second.content)
+        
+        SocialMediaProfile.objects.create(
+            business=self.business,
+            platform='facebook',
+            profile_url='https://facebook.com/testbusiness'
+        )
+        response = self.client.get(reverse('communications:business-list'))
+        self.assertEqual(len(response.json()['results'][0]['social_profiles']), 1)
+
+    def test_business_list_filtered_search(self):
+        Business.objects.create(
+            name='Blue Bottle Coffee',
+            address='1 Market St',
+            phone_number='+1234567891',
+            category='cafe',
+            google_maps_link='https://maps.google.com/coffee',
+            google_place_id='coffee_place'
+        )
+        Business.objects.create(
+            name='Corner Bakery',
+            address='2 Coffee Lane',
+            phone_number='+1234567892',
+            category='bakery',
+            google_maps_link='https://maps.google.com/bakery',
+            google_place_id='bakery_place'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(reverse('communications:business-list'), {'q': 'coffee'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        names = [item['name'] for item in response.data['results']]
+        self.assertEqual(set(names), {'Blue Bottle Coffee', 'Corner Bakery'})
+        self.assertIn('rank', response.data['results'][0])
+        
+        response = self.client.get(reverse('communications:business-list'), {'q': 'bakery lane'})
+        self.assertEqual([item['name'] for item in response.data['results']], ['Corner Bakery'])
+        
+        response = self.client.get(reverse('communications:business-list'), {'q': 'Te'})
+        self.assertEqual([item['name'] for item in response.data['results']], ['Test Business'])
+
+    def test_business_search_index_follows_updates(self):
+        self.business.name = 'Renamed Roastery'
+        self.business.save()
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.get(reverse('communications:business-list'), {'q': 'roastery'})
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get(reverse('communications:business-list'), {'q': 'test business'})
+        self.assertEqual(response.data['count'], 0)
+
+    @patch('apps.communications.tasks.search_business.apply_async')
     def test_business_search(self, mock_task):
         self.client.force_authenticate(user=self.user)
-        mock_task.return_value.id = 'test_task_id'
         
         response = self.client.post(
             reverse('communications:business-search'),
@@ -99,7 +164,63 @@ class BusinessViewSetTests(BaseAPITest):
             }
         )
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
-        self.assertEqual(response.data['task_id'], 'test_task_id')
+        self.assertEqual(response.data['task_id'], mock_task.call_args.kwargs['task_id'])
+
+    @patch('apps.communications.views.AsyncResult')
+    @patch('apps.communications.tasks.search_business.apply_async')
+    def test_business_search_single_flight(self, mock_task, mock_result):
+        self.client.force_authenticate(user=self.user)
+        mock_result.return_value.ready.return_value = False
+        
+        first = self.client.post(
+            reverse('communications:business-search'),
+            {'query': 'Coffee', 'location': 'Berlin'}
+        )
+        second = self.client.post(
+            reverse('communications:business-search'),
+            {'query': ' coffee ', 'location': 'berlin'}
+        )
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(first.data['task_id'], second.data['task_id'])
+        mock_task.assert_called_once()
+
+    @patch('apps.communications.views.AsyncResult')
+    @patch('apps.communications.tasks.search_business.apply_async')
+    def test_business_search_served_from_db_when_task_done(self, mock_task, mock_result):
+        self.client.force_authenticate(user=self.user)
+        cache.set(business_search_inflight_key('coffee', 'berlin'), 'done-task')
+        mock_result.return_value.ready.return_value = True
+        mock_result.return_value.successful.return_value = True
+        mock_result.return_value.result = {
+            "status": "success",
+            "place_ids": [self.business.google_place_id]
+        }
+        
+        response = self.client.post(
+            reverse('communications:business-search'),
+            {'query': 'coffee', 'location': 'berlin'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['businesses'][0]['name'], self.business.name)
+        mock_task.assert_not_called()
+        self.assertIsNotNone(cache.get(business_search_cache_key('coffee', 'berlin')))
+
+    @patch('apps.communications.tasks.search_business.apply_async')
+    def test_business_search_served_from_result_cache(self, mock_task):
+        self.client.force_authenticate(user=self.user)
+        cached = {"status": "success", "businesses": [{"name": "Cached Cafe"}]}
+        cache.set(business_search_cache_key('coffee', 'berlin'), cached)
+        
+        response = self.client.post(
+            reverse('communications:business-search'),
+            {
+                'query': '  Coffee ',
+                'location': 'Berlin'
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, cached)
+        mock_task.assert_not_called()
 
     @patch('apps.communications.tasks.verify_social_profiles.delay')
     def test_verify_social_profiles(self, mock_task):
@@ -210,6 +331,105 @@ class BulkMessageViewTests(BaseAPITest):
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(response.data['recipient_count'], 2)
 
+
+class AsyncSendViewTests(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def post(self, name, payload, headers=None):
+        return await self.async_client.post(
+            reverse(f'communications:{name}'),
+            json.dumps(payload),
+            content_type='application/json',
+            headers=self.headers if headers is None else headers
+        )
+
+    @patch('apps.communications.tasks.send_email_async.apply_async')
+    async def test_send_email(self, mock_task):
+        mock_task.return_value.id = 'test_task_id'
+
+        response = await self.post('async-email-send', {
+            'to': 'recipient@test.com',
+            'subject': 'Test Subject',
+            'message': 'Test Message'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['data'], {
+            'message': 'Email queued for delivery',
+            'task_id': 'test_task_id'
+        })
+        comm = await Communication.objects.aget(user=self.user)
+        self.assertEqual((comm.type, comm.status, comm.recipient), (Communication.EMAIL, 'pending', 'recipient@test.com'))
+        self.assertEqual(mock_task.call_args.kwargs['kwargs']['comm_id'], comm.id)
+
+    @patch('apps.communications.tasks.send_whatsapp_async.apply_async')
+    async def test_send_whatsapp(self, mock_task):
+        mock_task.return_value.id = 'test_task_id'
+
+        response = await self.post('async-whatsapp-send', {'to': '+1234567890', 'message_type': 'template'})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotIn('message', mock_task.call_args.kwargs['kwargs'])
+
+    @patch('apps.communications.tasks.bulk_message_send.apply_async')
+    async def test_bulk_message_send(self, mock_task):
+        mock_task.return_value.id = 'test_task_id'
+
+        response = await self.post('async-bulk-send', {
+            'type': Communication.EMAIL,
+            'recipients': ['test1@test.com', 'test2@test.com'],
+            'content': 'Test content'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['recipient_count'], 2)
+        self.assertEqual(mock_task.call_args.kwargs['kwargs']['recipients'], ['test1@test.com', 'test2@test.com'])
+
+    async def test_invalid_requests(self):
+        invalid_email = await self.post('async-email-send', {'to': 'invalid-email', 'subject': '', 'message': ''})
+        invalid_bulk = await self.post('async-bulk-send', {'type': 'fax', 'recipients': ['x'], 'content': 'y'})
+        not_json = await self.async_client.post(
+            reverse('communications:async-email-send'), 'nope', content_type='application/json', headers=self.headers
+        )
+        anonymous = await self.post('async-email-send', {}, headers={})
+
+        self.assertEqual(invalid_email.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(invalid_bulk.json(), {'error': 'Invalid message type'})
+        self.assertEqual(not_json.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_malformed_authorization_header(self):
+        response = await self.post('async-email-send', {}, headers={'Authorization': 'Bearer a b'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_query_string_token_is_rejected(self):
+        token = self.headers['Authorization'].split()[1]
+        response = await self.async_client.post(
+            f"{reverse('communications:async-email-send')}?token={token}",
+            json.dumps({'to': 'recipient@test.com', 'subject': 'Test Subject', 'message': 'Test Message'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(await Communication.objects.filter(user=self.user).aexists())
+        self.assertFalse(await Communication.objects.aexists())
+
+    @patch('apps.communications.tasks.send_whatsapp_async.apply_async')
+    async def test_shares_throttle_with_sync_view(self, mock_task):
+        mock_task.return_value.id = 'test_task_id'
+        payload = {'to': '+1234567890', 'message_type': 'template'}
+
+        with patch('apps.communications.throttles.WhatsAppRateThrottle.rate', '2/day'):
+            responses = [await self.post('async-whatsapp-send', payload) for _ in range(3)]
+
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_202_ACCEPTED, status.HTTP_202_ACCEPTED, status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+
 class AdminAPITests(BaseAPITest):
     def setUp(self):
         super().setUp()
@@ -242,6 +462,21 @@ class AdminAPITests(BaseAPITest):
         response = self.client.get(reverse('communications:smtp-server-list'))
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+    def test_create_clamps_batch_size_to_bounds(self):
+        self.client.force_authenticate(user=self.admin_user)
+        server = {
+            'name': 'Clamped', 'host': 'smtp.test.com', 'port': 587,
+            'username': 'user', 'password': 'pass', 'daily_limit': 100
+        }
+
+        capped = self.client.post(reverse('communications:smtp-server-list'), {**server, 'max_batch_size': 20})
+        raised = self.client.post(reverse('communications:smtp-server-list'), {**server, 'min_batch_size': 80})
+
+        self.assertEqual(capped.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(capped.data['batch_size'], 20)
+        self.assertEqual(raised.data['batch_size'], 80)
+        self.assertEqual(SMTPServer.objects.get(id=raised.data['id']).batch_size, 80)
+
     def test_whatsapp_account_admin_access(self):
         # Test admin access
         self.client.force_authenticate(user=self.admin_user)
@@ -302,4 +537,94 @@ class MessageQueueViewTests(BaseAPITest):
             {'action': 'process'},
             format='json'
         )
-        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def make_queue(self, specs):
+        # specs: (priority, minutes from now, smtp_server)
+        items = []
+        for i, (priority, minutes, smtp_server) in enumerate(specs):
+            communication = Communication.objects.create(
+                user=self.user, type=Communication.EMAIL, recipient=f'q{i}@test.com', content='Queued'
+            )
+            items.append(MessageQueue.objects.create(
+                communication=communication,
+                priority=priority,
+                scheduled_time=timezone.now() + timedelta(minutes=minutes),
+                smtp_server=smtp_server
+            ))
+        return items
+
+    def test_queue_list_pages_in_drain_order(self):
+        self.client.force_authenticate(user=self.admin_user)
+        items = self.make_queue([(0, 5, None), (2, 0, None), (0, 1, None), (1, 3, None), (0, 1, None), (1, 0, None)])
+        expected = [
+            item.id for item in sorted(items + [self.queue_item], key=lambda q: (q.priority, q.scheduled_time, q.id))
+        ]
+
+        seen = []
+        url = reverse('communications:message-queue') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+        row = self.client.get(reverse('communications:message-queue'), {'page_size': 1}).data['results'][0]
+        self.assertEqual(set(row), {
+            'id', 'communication', 'type', 'recipient', 'user', 'status', 'priority', 'scheduled_time',
+            'attempts', 'max_attempts', 'smtp_server', 'whatsapp_account', 'locked_at', 'locked_by'
+        })
+        self.assertEqual(row['user'], self.user.id)
+
+    def test_queue_list_filters(self):
+        self.client.force_authenticate(user=self.admin_user)
+        smtp = SMTPServer.objects.create(
+            name='SMTP', host='smtp.test.com', port=587, username='u', password='p', daily_limit=100
+        )
+        later, urgent = self.make_queue([(1, 120, smtp), (0, 120, None)])
+        url = reverse('communications:message-queue')
+
+        def ids(**params):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            return [row['id'] for row in response.data['results']]
+
+        self.assertEqual(ids(priority=1), [self.queue_item.id, later.id])
+        self.assertEqual(ids(smtp_server=smtp.id), [later.id])
+        window_start = (timezone.now() + timedelta(minutes=60)).isoformat()
+        self.assertEqual(ids(scheduled_after=window_start), [urgent.id, later.id])
+        self.assertEqual(ids(scheduled_before=window_start), [self.queue_item.id])
+        self.assertEqual(ids(status=MessageQueue.FAILED), [])
+
+        for params in ({'priority': 'high'}, {'scheduled_after': 'tomorrow'}, {'whatsapp_account': '1.5'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(self.client.get(url, {'cursor': 'bogus'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_queue_summary(self):
+        self.client.force_authenticate(user=self.admin_user)
+        smtp = SMTPServer.objects.create(
+            name='SMTP', host='smtp.test.com', port=587, username='u', password='p', daily_limit=100
+        )
+        failed, _ = self.make_queue([(0, 0, smtp), (0, 0, smtp)])
+        failed.status = MessageQueue.FAILED
+        failed.save()
+
+        # GROUP BY, then the batch sizes of SMTP servers and WhatsApp accounts
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('communications:message-queue'), {'summary': '1'})
+
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['by_status'], {'queued': 2, 'processing': 0, 'failed': 1})
+        self.assertEqual(response.data['by_priority'], [{'priority': 0, 'count': 2}, {'priority': 1, 'count': 1}])
+        self.assertEqual(response.data['by_account'], [
+            {'smtp_server': smtp.id, 'whatsapp_account': None, 'count': 2},
+            {'smtp_server': None, 'whatsapp_account': None, 'count': 1},
+        ])
+        self.assertEqual(response.data['batch_sizes'], {
+            'smtp_servers': [
+                {'id': smtp.id, 'name': 'SMTP', 'batch_size': 50, 'min_batch_size': 10, 'max_batch_size': 200}
+            ],
+            'whatsapp_accounts': [],
+        })
\ No newline at end of file
@@ -0,0 +1,190 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .archive import archive_communications
+from .management.commands.export_communication_archive import pyarrow
+from .models import Communication, ArchivedCommunication, MessageQueue
+
+User = get_user_model()
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='archiver', email='archiver@test.com', password='pass')
+
+    def make_communications(self, count, days_old, status='sent', **kwargs):
+        communications = Communication.objects.bulk_create([
+            Communication(
+                user=self.user,
+                type=kwargs.get('type', Communication.EMAIL),
+                status=status,
+                recipient=f'user{i}@example.test',
+                subject=f'Subject {i}',
+                content=f'Message body {i} ' * 20
+            )
+            for i in range(count)
+        ])
+        Communication.objects.filter(id__in=[c.id for c in communications]).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+        return communications
+
+
+class ArchiveCommunicationsTests(ArchiveTestCase):
+    def test_moves_old_finished_rows(self):
+        old_sent = self.make_communications(3, days_old=120)
+        old_failed = self.make_communications(2, days_old=120, status='failed')
+        old_queued = self.make_communications(1, days_old=120, status='queued')
+        recent = self.make_communications(2, days_old=1)
+        MessageQueue.objects.create(communication=old_sent[0], scheduled_time=timezone.now())
+
+        archived = archive_communications(older_than_days=90, batch_size=2)
+
+        self.assertEqual(archived, 5)
+        self.assertEqual(
+            set(Communication.objects.values_list('id', flat=True)),
+            {c.id for c in old_queued + recent}
+        )
+        self.assertEqual(
+            set(ArchivedCommunication.objects.values_list('id', flat=True)),
+            {c.id for c in old_sent + old_failed}
+        )
+        self.assertFalse(MessageQueue.objects.exists())
+
+    def test_conflicting_ids_stay_in_hot_table(self):
+        clash, other = self.make_communications(2, days_old=120)
+        ArchivedCommunication.objects.create(
+            id=clash.id, user=self.user, type=Communication.EMAIL, status='sent',
+            recipient='earlier@example.test', compressed_content=b'',
+            created_at=timezone.now(), updated_at=timezone.now()
+        )
+
+        archived = archive_communications(older_than_days=90, batch_size=1)
+
+        self.assertEqual(archived, 1)
+        self.assertEqual(list(Communication.objects.values_list('id', 'status')), [(clash.id, 'conflict')])
+        self.assertEqual(ArchivedCommunication.objects.get(id=clash.id).recipient, 'earlier@example.test')
+        self.assertTrue(ArchivedCommunication.objects.filter(id=other.id).exists())
+        # Not picked up again by later runs
+        self.assertEqual(archive_communications(older_than_days=90), 0)
+
+    def test_already_archived_copy_is_removed_from_hot_table(self):
+        copy = Communication.objects.get(id=self.make_communications(1, days_old=120)[0].id)
+        ArchivedCommunication.from_communication(copy).save()
+
+        archived = archive_communications(older_than_days=90)
+
+        self.assertEqual(archived, 1)
+        self.assertFalse(Communication.objects.exists())
+        self.assertEqual(ArchivedCommunication.objects.count(), 1)
+
+    def test_content_is_compressed(self):
+        communication = self.make_communications(1, days_old=120)[0]
+
+        archive_communications(older_than_days=90)
+
+        archived = ArchivedCommunication.objects.get(id=communication.id)
+        self.assertEqual(archived.content, communication.content)
+        self.assertLess(len(bytes(archived.compressed_content)), len(communication.content))
+        self.assertEqual(archived.subject, communication.subject)
+
+    def test_nothing_to_archive(self):
+        self.make_communications(2, days_old=1)
+
+        self.assertEqual(archive_communications(older_than_days=90), 0)
+
+
+class TieredHistoryTests(ArchiveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.archived = self.make_communications(15, days_old=120)
+        archive_communications(older_than_days=90)
+        self.hot = self.make_communications(10, days_old=1)
+        self.hot_whatsapp = self.make_communications(3, days_old=2, type=Communication.WHATSAPP)
+
+    def test_history_spans_both_tiers(self):
+        response = self.client.get(reverse('communications:message-history'), {'page_size': 20})
+
+        self.assertEqual(response.data['count'], 28)
+        self.assertEqual(len(response.data['results']), 20)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(set(ids[:13]), {c.id for c in self.hot + self.hot_whatsapp})
+        self.assertTrue(set(ids[13:]) <= {c.id for c in self.archived})
+
+        second = self.client.get(reverse('communications:message-history'), {'page_size': 20, 'page': 2})
+        self.assertEqual(len(second.data['results']), 8)
+        self.assertEqual(
+            {row['id'] for row in second.data['results']} | set(ids[13:]),
+            {c.id for c in self.archived}
+        )
+        contents = {c.id: c.content for c in self.archived}
+        first_archived = second.data['results'][0]
+        self.assertEqual(first_archived['content'], contents[first_archived['id']])
+
+    def test_type_filter_applies_to_archive(self):
+        response = self.client.get(
+            reverse('communications:message-history'),
+            {'type': Communication.WHATSAPP}
+        )
+
+        self.assertEqual(response.data['count'], 3)
+
+
+class ExportArchiveCommandTests(ArchiveTestCase):
+    def setUp(self):
+        super().setUp()
+        self.communications = self.make_communications(5, days_old=120)
+        archive_communications(older_than_days=90)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_streams_jsonl_gz(self):
+        path = os.path.join(self.directory.name, 'archive.jsonl.gz')
+        out = StringIO()
+
+        call_command('export_communication_archive', path, '--chunk-size', '2', stdout=out)
+
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual([row['id'] for row in rows], sorted(c.id for c in self.communications))
+        self.assertEqual(rows[0]['content'], self.communications[0].content)
+        self.assertIn('Exported 5 archived communications', out.getvalue())
+        self.assertEqual(ArchivedCommunication.objects.count(), 5)
+
+    def test_delete_after_export(self):
+        path = os.path.join(self.directory.name, 'archive.jsonl.gz')
+
+        call_command(
+            'export_communication_archive', path, '--delete',
+            '--before', (timezone.now() - timedelta(days=100)).date().isoformat(),
+            stdout=StringIO()
+        )
+
+        self.assertFalse(ArchivedCommunication.objects.exists())
+
+    @skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet as parquet
+
+        path = os.path.join(self.directory.name, 'archive.parquet')
+        call_command('export_communication_archive', path, '--chunk-size', '2', stdout=StringIO())
+
+        table = parquet.read_table(path)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column('content')[0].as_py(), self.communications[0].content)
@@ -0,0 +1,644 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from unittest.mock import patch
+from io import StringIO
+from datetime import timedelta
+
+from benchmarks.profiling import BudgetTestMixin
+from benchmarks.stubs import StubPeopleService
+from . import events
+from .models import (
+    Communication,
+    Business,
+    SocialMediaProfile,
+    SMTPServer,
+    WhatsAppAccount,
+    MessageQueue,
+    SocialAPIConfig,
+    ProfileVerificationCache,
+    CommunicationDailyStats
+)
+from .tasks import (
+    process_message_queue_task,
+    send_email_async,
+    send_whatsapp_async,
+    search_business,
+    verify_social_profiles,
+    verify_social_profiles_bulk,
+    reverify_stale_profiles,
+    sync_google_contacts,
+    sync_google_contacts_batch,
+    bulk_message_send,
+    archive_communications_task,
+    reap_stuck_messages_task
+)
+
+User = get_user_model()
+
+
+def make_businesses(size, profiles_per_business=2):
+    businesses = Business.objects.bulk_create([
+        Business(
+            name=f'Business {i}',
+            address=f'{i} Test St',
+            phone_number=f'+1555000{i:04d}',
+            category='Test Category',
+            google_maps_link=f'https://maps.google.com/{i}',
+            google_place_id=f'place_{i}'
+        )
+        for i in range(size)
+    ])
+    SocialMediaProfile.objects.bulk_create([
+        SocialMediaProfile(
+            business=business,
+            platform=platform,
+            profile_url=f'https://{platform}.com/business{business.id}'
+        )
+        for business in businesses
+        for platform in ['facebook', 'twitter'][:profiles_per_business]
+    ])
+    return businesses
+
+
+def make_queued_messages(user, size, message_type=Communication.EMAIL):
+    communications = Communication.objects.bulk_create([
+        Communication(
+            user=user,
+            type=message_type,
+            status='queued',
+            recipient=f'user{i}@test.com' if message_type == Communication.EMAIL else f'+1555{i:07d}',
+            subject='Budget',
+            content='Budget content'
+        )
+        for i in range(size)
+    ])
+    MessageQueue.objects.bulk_create([
+        MessageQueue(communication=comm, scheduled_time=timezone.now(), priority=1)
+        for comm in communications
+    ])
+    return communications
+
+
+class BudgetAPITest(BudgetTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='budgetuser',
+            email='budget@test.com',
+            password='testpass123'
+        )
+        self.admin_user = User.objects.create_superuser(
+            username='budgetadmin',
+            email='budgetadmin@test.com',
+            password='adminpass123'
+        )
+
+    def call_view(self, method, url, user=None, data=None):
+        self.client.force_authenticate(user=user or self.user)
+        response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, getattr(response, 'data', response))
+        return response
+
+    def call_async_view(self, url, data):
+        # Async views authenticate from the Authorization header themselves
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        response = async_to_sync(self.async_client.post)(
+            url, json.dumps(data), content_type='application/json', headers=headers
+        )
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+
+class CommunicationViewBudgetTests(BudgetAPITest):
+    @patch('apps.communications.tasks.send_email_async.apply_async')
+    def test_email_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_email_send',
+            lambda size: None,
+            lambda ctx: self.call_view('post', reverse('communications:email-send'), data={
+                'to': 'recipient@test.com', 'subject': 'Subject', 'message': 'Message'
+            })
+        )
+
+    @patch('apps.communications.tasks.send_whatsapp_async.apply_async')
+    def test_whatsapp_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_whatsapp_send',
+            lambda size: None,
+            lambda ctx: self.call_view('post', reverse('communications:whatsapp-send'), data={
+                'to': '+1234567890', 'message_type': 'text', 'message': 'Message'
+            })
+        )
+
+    @patch('apps.communications.tasks.bulk_message_send.delay')
+    def test_bulk_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_bulk_send',
+            lambda size: [f'user{i}@test.com' for i in range(size)],
+            lambda recipients: self.call_view('post', reverse('communications:bulk-send'), data={
+                'type': 'email', 'recipients': recipients, 'content': 'Content', 'subject': 'Subject'
+            })
+        )
+
+    @patch('apps.communications.tasks.send_email_async.apply_async')
+    def test_async_email_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_async_email_send',
+            lambda size: None,
+            lambda ctx: self.call_async_view(reverse('communications:async-email-send'), {
+                'to': 'recipient@test.com', 'subject': 'Subject', 'message': 'Message'
+            })
+        )
+
+    @patch('apps.communications.tasks.send_whatsapp_async.apply_async')
+    def test_async_whatsapp_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_async_whatsapp_send',
+            lambda size: None,
+            lambda ctx: self.call_async_view(reverse('communications:async-whatsapp-send'), {
+                'to': '+1234567890', 'message_type': 'text', 'message': 'Message'
+            })
+        )
+
+    @patch('apps.communications.tasks.bulk_message_send.apply_async')
+    def test_async_bulk_send(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_async_bulk_send',
+            lambda size: [f'user{i}@test.com' for i in range(size)],
+            lambda recipients: self.call_async_view(reverse('communications:async-bulk-send'), {
+                'type': 'email', 'recipients': recipients, 'content': 'Content', 'subject': 'Subject'
+            })
+        )
+
+    @override_settings(EVENTS_REDIS_URL=None, EVENTS_HEARTBEAT_SECONDS=0.01)
+    def test_message_events(self):
+        self.addCleanup(events._local_subscribers.clear)
+
+        async def open_stream(token):
+            response = await self.async_client.get(reverse('communications:message-events'), {'token': token})
+            self.assertEqual(response.status_code, 200)
+            stream = response.streaming_content
+            # The retry hint, then one keepalive once the subscription is up
+            chunks = [await anext(stream), await anext(stream)]
+            await stream.aclose()
+            return chunks
+
+        self.assertWithinBudget(
+            'view_message_events',
+            lambda size: str(AccessToken.for_user(self.user)),
+            lambda token: async_to_sync(open_stream)(token)
+        )
+
+    def test_message_history(self):
+        self.assertWithinBudget(
+            'view_message_history',
+            lambda size: make_queued_messages(self.user, size),
+            lambda ctx: self.call_view('get', reverse('communications:message-history'))
+        )
+
+    def test_communication_stats(self):
+        def setup(size):
+            # One rollup row per day and channel, however many messages it counts
+            CommunicationDailyStats.objects.bulk_create([
+                CommunicationDailyStats(
+                    day=timezone.localdate() - timedelta(days=i % 30),
+                    user=self.user,
+                    type=message_type,
+                    account_id=i,
+                    sent=1000,
+                    failed=10
+                )
+                for i in range(size)
+                for message_type in (Communication.EMAIL, Communication.WHATSAPP)
+            ])
+            make_queued_messages(self.user, size)
+
+        self.assertWithinBudget(
+            'view_communication_stats',
+            setup,
+            lambda ctx: self.call_view('get', reverse('communications:communication-stats'))
+        )
+
+    def test_message_queue_list(self):
+        self.assertWithinBudget(
+            'view_message_queue_list',
+            lambda size: make_queued_messages(self.user, size),
+            lambda ctx: self.call_view('get', reverse('communications:message-queue'), user=self.admin_user)
+        )
+
+    def test_message_queue_clear(self):
+        def setup(size):
+            make_queued_messages(self.user, size)
+            MessageQueue.objects.update(
+                status=MessageQueue.PROCESSING,
+                locked_at=timezone.now() - timedelta(hours=1),
+                locked_by='worker'
+            )
+
+        self.assertWithinBudget(
+            'view_message_queue_clear',
+            setup,
+            lambda ctx: self.call_view(
+                'post', reverse('communications:message-queue'), user=self.admin_user, data={'action': 'clear'}
+            )
+        )
+
+
+class BusinessViewBudgetTests(BudgetAPITest):
+    def test_business_list(self):
+        self.assertWithinBudget(
+            'view_business_list',
+            make_businesses,
+            lambda ctx: self.call_view('get', reverse('communications:business-list'))
+        )
+
+    def test_business_detail(self):
+        self.assertWithinBudget(
+            'view_business_detail',
+            lambda size: make_businesses(1, profiles_per_business=2)[0],
+            lambda business: self.call_view('get', reverse('communications:business-detail', args=[business.id]))
+        )
+
+    def test_business_list_query(self):
+        self.assertWithinBudget(
+            'view_business_list_query',
+            make_businesses,
+            lambda ctx: self.call_view('get', reverse('communications:business-list'), data={'q': 'business'})
+        )
+
+    @patch('apps.communications.tasks.search_business.apply_async')
+    def test_business_search(self, mock_task):
+        self.assertWithinBudget(
+            'view_business_search',
+            make_businesses,
+            lambda ctx: self.call_view('post', reverse('communications:business-search'), data={
+                'query': 'coffee', 'location': 'Berlin'
+            })
+        )
+
+    @patch('apps.communications.tasks.verify_social_profiles.delay')
+    def test_business_verify_social_profiles(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_business_verify_social_profiles',
+            lambda size: make_businesses(1)[0],
+            lambda business: self.call_view(
+                'post', reverse('communications:business-verify-social-profiles', args=[business.id])
+            )
+        )
+
+    @patch('apps.communications.tasks.sync_google_contacts.delay')
+    def test_business_sync_to_contacts(self, mock_task):
+        mock_task.return_value.id = 'task'
+        self.assertWithinBudget(
+            'view_business_sync_to_contacts',
+            lambda size: make_businesses(1)[0],
+            lambda business: self.call_view(
+                'post', reverse('communications:business-sync-to-contacts', args=[business.id])
+            )
+        )
+
+    def test_social_profile_list(self):
+        def setup(size):
+            business = make_businesses(1, profiles_per_business=0)[0]
+            SocialMediaProfile.objects.bulk_create([
+                SocialMediaProfile(
+                    business=business,
+                    platform='facebook',
+                    profile_url=f'https://facebook.com/page{i}'
+                )
+                for i in range(size)
+            ])
+            return business
+
+        self.assertWithinBudget(
+            'view_social_profile_list',
+            setup,
+            lambda business: self.call_view(
+                'get', reverse('communications:business-social-profile-list', args=[business.id])
+            )
+        )
+
+
+class AdminViewBudgetTests(BudgetAPITest):
+    def make_smtp_servers(self, size):
+        return SMTPServer.objects.bulk_create([
+            SMTPServer(name=f'SMTP {i}', host='smtp.test.com', port=587, username='u', password='p')
+            for i in range(size)
+        ])
+
+    def make_whatsapp_accounts(self, size):
+        return WhatsAppAccount.objects.bulk_create([
+            WhatsAppAccount(name=f'WA {i}', phone_number_id=str(i), access_token='t')
+            for i in range(size)
+        ])
+
+    def test_smtp_server_list(self):
+        self.assertWithinBudget(
+            'view_smtp_server_list',
+            self.make_smtp_servers,
+            lambda ctx: self.call_view('get', reverse('communications:smtp-server-list'), user=self.admin_user)
+        )
+
+    def test_smtp_server_reset_counter(self):
+        self.assertWithinBudget(
+            'view_smtp_server_reset_counter',
+            lambda size: self.make_smtp_servers(1)[0],
+            lambda server: self.call_view(
+                'post', reverse('communications:smtp-server-reset-counter', args=[server.id]), user=self.admin_user
+            )
+        )
+
+    def test_whatsapp_account_list(self):
+        self.assertWithinBudget(
+            'view_whatsapp_account_list',
+            self.make_whatsapp_accounts,
+            lambda ctx: self.call_view('get', reverse('communications:whatsapp-account-list'), user=self.admin_user)
+        )
+
+    def test_whatsapp_account_reset_counter(self):
+        self.assertWithinBudget(
+            'view_whatsapp_account_reset_counter',
+            lambda size: self.make_whatsapp_accounts(1)[0],
+            lambda account: self.call_view(
+                'post', reverse('communications:whatsapp-account-reset-counter', args=[account.id]),
+                user=self.admin_user
+            )
+        )
+
+    def test_social_config_list(self):
+        platforms = [choice[0] for choice in SocialMediaProfile.PLATFORM_CHOICES]
+
+        def setup(size):
+            SocialAPIConfig.objects.bulk_create([
+                SocialAPIConfig(platform=platform, api_key='k', api_secret='s')
+                for platform in platforms[:size]
+            ])
+
+        self.assertWithinBudget(
+            'view_social_config_list',
+            setup,
+            lambda ctx: self.call_view('get', reverse('communications:social-config-list'), user=self.admin_user)
+        )
+
+
+class TaskBudgetTests(BudgetTestMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='budgetuser',
+            email='budget@test.com',
+            password='testpass123'
+        )
+        SMTPServer.objects.create(
+            name='Budget SMTP', host='smtp.test.com', port=587,
+            username='u', password='p', daily_limit=10 ** 6
+        )
+        WhatsAppAccount.objects.create(
+            name='Budget WA', phone_number_id='1', access_token='t', daily_limit=10 ** 6
+        )
+
+    def test_process_message_queue_email(self):
+        self.assertWithinBudget(
+            'task_process_message_queue_email',
+            lambda size: make_queued_messages(self.user, size),
+            lambda ctx: process_message_queue_task()
+        )
+
+    @patch('requests.post')
+    def test_process_message_queue_whatsapp(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"messages": [{"id": "wamid"}]}
+        self.assertWithinBudget(
+            'task_process_message_queue_whatsapp',
+            lambda size: make_queued_messages(self.user, size, Communication.WHATSAPP),
+            lambda ctx: process_message_queue_task()
+        )
+
+    def test_send_email_async(self):
+        def setup(size):
+            return Communication.objects.create(
+                user=self.user, type=Communication.EMAIL, recipient='a@test.com',
+                subject='s', content='c'
+            )
+
+        self.assertWithinBudget(
+            'task_send_email_async',
+            setup,
+            lambda comm: send_email_async('a@test.com', 's', 'c', self.user.id, comm.id)
+        )
+
+    def test_send_whatsapp_async(self):
+        def setup(size):
+            return Communication.objects.create(
+                user=self.user, type=Communication.WHATSAPP, recipient='+1555', content='c'
+            )
+
+        self.assertWithinBudget(
+            'task_send_whatsapp_async',
+            setup,
+            lambda comm: send_whatsapp_async('+1555', 'text', 'c', self.user.id, comm.id)
+        )
+
+    @patch('apps.communications.tasks.process_message_queue_task.delay')
+    def test_bulk_message_send(self, mock_delay):
+        self.assertWithinBudget(
+            'task_bulk_message_send',
+            lambda size: [f'user{i}@test.com' for i in range(size)],
+            lambda recipients: bulk_message_send('email', recipients, 'Content', 'Subject', self.user.id)
+        )
+
+    @patch('apps.communications.tasks.get_places_service')
+    def test_search_business(self, mock_service):
+        def setup(size):
+            places = [
+                {
+                    'name': f'Place {i}',
+                    'formattedAddress': f'{i} Main St',
+                    'phoneNumber': f'+1555{i:07d}',
+                    'types': ['cafe'],
+                    'googleMapsUri': f'https://maps.google.com/{i}',
+                    'placeId': f'place_{i}'
+                }
+                for i in range(size)
+            ]
+            mock_service.return_value.places.return_value.searchText.return_value.execute.return_value = {
+                'places': places
+            }
+
+        self.assertWithinBudget(
+            'task_search_business',
+            setup,
+            lambda ctx: search_business('coffee', 'Berlin')
+        )
+
+    def test_verify_social_profiles(self):
+        def fake_crawl(urls, validators=None):
+            return [{"exists": True, "title": url, "description": "", "status_code": 200} for url in urls]
+
+        def setup(size):
+            business = make_businesses(1, profiles_per_business=0)[0]
+            SocialMediaProfile.objects.bulk_create([
+                SocialMediaProfile(
+                    business=business,
+                    platform='facebook',
+                    profile_url=f'https://facebook.com/page{i}'
+                )
+                for i in range(size)
+            ])
+            return business
+
+        with patch('apps.communications.tasks.crawl_profiles', fake_crawl):
+            self.assertWithinBudget(
+                'task_verify_social_profiles',
+                setup,
+                lambda business: verify_social_profiles(business.id)
+            )
+
+    def test_verify_social_profiles_bulk(self):
+        def fake_crawl(urls, validators=None):
+            return [{"exists": True, "title": url, "description": "", "status_code": 200} for url in urls]
+
+        with patch('apps.communications.tasks.crawl_profiles', fake_crawl):
+            self.assertWithinBudget(
+                'task_verify_social_profiles_bulk',
+                lambda size: [business.id for business in make_businesses(size)],
+                lambda business_ids: verify_social_profiles_bulk(business_ids)
+            )
+
+    def test_reverify_stale_profiles(self):
+        def fake_crawl(urls, validators=None):
+            return [
+                {"exists": True, "not_modified": True, "status_code": 304}
+                if url in validators else
+                {"exists": True, "title": url, "description": "", "status_code": 200, "etag": '"v1"'}
+                for url in urls
+            ]
+
+        def setup(size):
+            business = make_businesses(1, profiles_per_business=0)[0]
+            profiles = SocialMediaProfile.objects.bulk_create([
+                SocialMediaProfile(
+                    business=business,
+                    platform='facebook',
+                    profile_url=f'https://facebook.com/page{i}',
+                    verified=True
+                )
+                for i in range(size)
+            ])
+            # Half of the pages were seen before and answer 304
+            ProfileVerificationCache.objects.bulk_create([
+                ProfileVerificationCache(
+                    profile_url=profile.profile_url,
+                    etag='"v1"',
+                    status_code=200,
+                    result={"exists": True, "title": profile.profile_url},
+                    checked_at=timezone.now()
+                )
+                for profile in profiles[::2]
+            ])
+            SocialMediaProfile.objects.update(updated_at=timezone.now() - timedelta(days=30))
+
+        with patch('apps.communications.tasks.crawl_profiles', fake_crawl):
+            self.assertWithinBudget(
+                'task_reverify_stale_profiles',
+                setup,
+                lambda ctx: reverify_stale_profiles()
+            )
+
+    def test_sync_google_contacts(self):
+        def setup(size):
+            business = make_businesses(1, profiles_per_business=0)[0]
+            SocialMediaProfile.objects.bulk_create([
+                SocialMediaProfile(
+                    business=business,
+                    platform='facebook',
+                    profile_url=f'https://facebook.com/page{i}',
+                    verified=True
+                )
+                for i in range(size)
+            ])
+            return business
+
+        with patch('apps.communications.tasks.get_people_service', StubPeopleService):
+            self.assertWithinBudget(
+                'task_sync_google_contacts',
+                setup,
+                lambda business: sync_google_contacts(business.id)
+            )
+
+    def test_sync_google_contacts_batch(self):
+        def setup(size):
+            businesses = make_businesses(size)
+            SocialMediaProfile.objects.update(verified=True)
+            return [business.id for business in businesses]
+
+        with patch('apps.communications.tasks.get_people_service', StubPeopleService):
+            self.assertWithinBudget(
+                'task_sync_google_contacts_batch',
+                setup,
+                lambda business_ids: sync_google_contacts_batch(business_ids)
+            )
+
+    def test_archive_communications(self):
+        def setup(size):
+            communications = make_queued_messages(self.user, size)
+            Communication.objects.filter(id__in=[c.id for c in communications]).update(
+                status='sent',
+                created_at=timezone.now() - timedelta(days=365)
+            )
+
+        self.assertWithinBudget(
+            'task_archive_communications',
+            setup,
+            lambda ctx: archive_communications_task()
+        )
+
+    def test_reap_stuck_messages(self):
+        def setup(size):
+            make_queued_messages(self.user, size)
+            MessageQueue.objects.update(
+                status=MessageQueue.PROCESSING,
+                locked_at=timezone.now() - timedelta(hours=1),
+                locked_by='worker'
+            )
+
+        self.assertWithinBudget(
+            'task_reap_stuck_messages',
+            setup,
+            lambda ctx: reap_stuck_messages_task()
+        )
+
+    def test_cleanup_invalid_tokens(self):
+        def setup(size):
+            now = timezone.now()
+            OutstandingToken.objects.bulk_create([
+                OutstandingToken(
+                    user=None if i % 2 else self.user,
+                    jti=f'jti-{i}',
+                    token=f'token-{i}',
+                    created_at=now,
+                    expires_at=now + timedelta(days=1)
+                )
+                for i in range(size)
+            ])
+
+        self.assertWithinBudget(
+            'command_cleanup_invalid_tokens',
+            setup,
+            lambda ctx: call_command('cleanup_invalid_tokens', stdout=StringIO())
+        )
@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import UnknownApiNameOrVersion
+from unittest.mock import patch
+
+from benchmarks.stubs import StubPeopleService
+from . import google_clients
+from .models import Business, SocialMediaProfile, GoogleContactLink
+from .tasks import sync_google_contacts, sync_google_contacts_batch
+
+
+def make_business(i, **kwargs):
+    defaults = {
+        'name': f'Business {i}',
+        'address': f'{i} Test St',
+        'phone_number': f'+1 555 000 {i:04d}',
+        'category': 'Test Category',
+        'google_maps_link': f'https://maps.google.com/{i}',
+        'google_place_id': f'place_{i}'
+    }
+    defaults.update(kwargs)
+    return Business.objects.create(**defaults)
+
+
+class GoogleContactsSyncTests(TestCase):
+    def setUp(self):
+        self.people = StubPeopleService()
+        patcher = patch('apps.communications.tasks.get_people_service', return_value=self.people)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.businesses = [make_business(i) for i in range(3)]
+        self.ids = [business.id for business in self.businesses]
+
+    def test_creates_contacts_in_one_batch(self):
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(self.people.calls, ['connections.list', 'batchCreateContacts'])
+        links = GoogleContactLink.objects.all()
+        self.assertEqual(links.count(), 3)
+        self.assertEqual(
+            {link.resource_name for link in links},
+            set(self.people.contacts)
+        )
+
+    def test_unchanged_businesses_are_skipped(self):
+        sync_google_contacts_batch(self.ids)
+        self.people.calls.clear()
+
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual(result['unchanged'], 3)
+        self.assertEqual(self.people.calls, [])
+
+    def test_changed_business_is_updated(self):
+        sync_google_contacts_batch(self.ids)
+        self.people.calls.clear()
+        business = self.businesses[0]
+        SocialMediaProfile.objects.create(
+            business=business,
+            platform='facebook',
+            profile_url='https://facebook.com/business0',
+            verified=True
+        )
+
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual((result['updated'], result['unchanged']), (1, 2))
+        self.assertEqual(self.people.calls, ['batchUpdateContacts'])
+        link = GoogleContactLink.objects.get(business=business)
+        contact = self.people.contacts[link.resource_name]
+        self.assertEqual(link.etag, contact['etag'])
+        self.assertIn({'value': 'https://facebook.com/business0', 'type': 'facebook'}, contact['urls'])
+
+    def test_existing_contact_is_linked_not_duplicated(self):
+        existing = self.people._store({
+            'names': [{'displayName': 'Someone Else'}],
+            'phoneNumbers': [{'value': '+15550000001'}]
+        })
+
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual((result['created'], result['updated']), (2, 1))
+        self.assertEqual(len(self.people.contacts), 3)
+        link = GoogleContactLink.objects.get(business=self.businesses[1])
+        self.assertEqual(link.resource_name, existing['resourceName'])
+
+    def test_same_name_contact_is_not_linked(self):
+        personal = self.people._store({
+            'names': [{'displayName': self.businesses[0].name}],
+            'phoneNumbers': [{'value': '+15559999999'}]
+        })
+
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual(result['created'], 3)
+        link = GoogleContactLink.objects.get(business=self.businesses[0])
+        self.assertNotEqual(link.resource_name, personal['resourceName'])
+        self.assertEqual(self.people.contacts[personal['resourceName']]['names'], [{'displayName': self.businesses[0].name}])
+
+    def test_stale_etag_is_refreshed(self):
+        sync_google_contacts_batch(self.ids)
+        link = GoogleContactLink.objects.get(business=self.businesses[0])
+        self.people.touch(link.resource_name)
+        Business.objects.filter(id=self.businesses[0].id).update(name='Renamed')
+        self.people.calls.clear()
+
+        result = sync_google_contacts_batch(self.ids)
+
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(self.people.calls, ['batchUpdateContacts', 'getBatchGet', 'batchUpdateContacts'])
+        self.assertEqual(
+            self.people.contacts[link.resource_name]['names'],
+            [{'givenName': 'Renamed'}]
+        )
+
+    def test_large_sync_is_chunked(self):
+        ids = self.ids + [make_business(i).id for i in range(3, 250)]
+
+        result = sync_google_contacts_batch(ids)
+
+        self.assertEqual(result['created'], 250)
+        self.assertEqual(self.people.calls.count('batchCreateContacts'), 2)
+
+    def test_single_business_task(self):
+        created = sync_google_contacts(self.businesses[0].id)
+        unchanged = sync_google_contacts(self.businesses[0].id)
+
+        self.assertEqual(created['action'], 'created')
+        self.assertEqual(unchanged, {
+            'status': 'success',
+            'contact_id': created['contact_id'],
+            'action': 'unchanged'
+        })
+
+
+class GoogleClientFactoryTests(TestCase):
+    def setUp(self):
+        google_clients.reset_services()
+        self.addCleanup(google_clients.reset_services)
+
+    def make_credentials(self, expires_in):
+        return Credentials(
+            token='token',
+            refresh_token='refresh',
+            expiry=datetime.now(dt_timezone.utc).replace(tzinfo=None) + expires_in
+        )
+
+    def test_static_discovery_builds_offline(self):
+        service = google_clients._build('people', 'v1', Credentials(token='token'))
+
+        self.assertTrue(hasattr(service, 'people'))
+
+    @patch('apps.communications.google_clients.build')
+    @patch('apps.communications.google_clients.Credentials.from_authorized_user_info')
+    def test_clients_and_credentials_are_built_once(self, mock_from_info, mock_build):
+        mock_from_info.return_value = self.make_credentials(timedelta(hours=1))
+
+        with self.settings(GOOGLE_CREDENTIALS={'refresh_token': 'refresh'}):
+            people = google_clients.get_people_service()
+            self.assertIs(google_clients.get_people_service(), people)
+            google_clients.get_places_service()
+
+        self.assertEqual(mock_from_info.call_count, 1)
+        self.assertEqual(mock_build.call_count, 2)
+        self.assertTrue(mock_build.call_args.kwargs['static_discovery'])
+        self.assertFalse(mock_build.call_args.kwargs['cache_discovery'])
+
+    @patch('apps.communications.google_clients.build')
+    def test_falls_back_to_dynamic_discovery(self, mock_build):
+        mock_build.side_effect = [UnknownApiNameOrVersion('name: x  version: v1'), 'service']
+
+        self.assertEqual(google_clients._build('x', 'v1', None), 'service')
+        self.assertFalse(mock_build.call_args.kwargs['static_discovery'])
+
+    @patch('google.oauth2.credentials.Credentials.refresh')
+    @patch('apps.communications.google_clients.Credentials.from_authorized_user_info')
+    def test_refreshes_tokens_before_expiry(self, mock_from_info, mock_refresh):
+        credentials = self.make_credentials(timedelta(minutes=2))
+        mock_from_info.return_value = credentials
+
+        google_clients.get_credentials()
+        self.assertEqual(mock_refresh.call_count, 1)
+
+        credentials.expiry = datetime.now(dt_timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+        google_clients.get_credentials()
+        self.assertEqual(mock_refresh.call_count, 1)
+
+    @patch('apps.communications.google_clients.get_service')
+    def test_worker_warmup(self, mock_get_service):
+        with self.settings(GOOGLE_CREDENTIALS={}):
+            google_clients.warm_google_clients()
+        mock_get_service.assert_not_called()
+
+        with self.settings(GOOGLE_CREDENTIALS={'refresh_token': 'refresh'}):
+            google_clients.warm_google_clients()
+        self.assertEqual(
+            [c.args for c in mock_get_service.call_args_list],
+            [('places', 'v1'), ('people', 'v1')]
+        )
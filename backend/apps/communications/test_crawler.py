@@ -0,0 +1,341 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from datetime import timedelta
+from unittest import skipIf
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .crawler import crawl_profiles, crawl_domain
+from .html_meta import extract_meta, etree
+from .models import Business, SocialMediaProfile, ProfileVerificationCache
+from .tasks import verify_social_profiles_bulk, reverify_stale_profiles
+
+PROFILE_HEAD = (
+    b'<!DOCTYPE html><html><head><title>Fixture Page</title>'
+    b'<meta name="description" content="A fixture profile">'
+    b'<meta property="og:image" content="https://cdn.test/logo.png"></head>'
+)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    active = {}
+    max_active = {}
+    started = []
+    conditional_hits = []
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_html(self, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if self.path.startswith('/etag'):
+            self.send_header('ETag', '"v1"')
+        self.end_headers()
+
+    def do_GET(self):
+        # Keyed by host and path so stragglers from other tests don't count
+        host = self.headers.get('Host', '').split(':')[0] + self.path.split('?')[0]
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+            self.started.append(host)
+        try:
+            self.route()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+    def route(self):
+        path = self.path.split('?')[0]
+        if path == '/profile':
+            self._send_html()
+            self.wfile.write(PROFILE_HEAD)
+            # A large body the crawler must never download
+            for _ in range(64):
+                self.wfile.write(b'<p>' + b'x' * 65536 + b'</p>')
+        elif path == '/slow':
+            time.sleep(0.1)
+            self._send_html()
+            self.wfile.write(PROFILE_HEAD)
+        elif path == '/hang':
+            self._send_html()
+            self.wfile.write(b'<html><head>')
+            self.wfile.flush()
+            time.sleep(1)
+        elif path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.conditional_hits.append(self.path)
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send_html()
+            self.wfile.write(PROFILE_HEAD)
+        elif path == '/no-head-end':
+            self._send_html()
+            self.wfile.write(b'<html><head><title>Truncated</title>' + b' ' * 200000)
+        else:
+            self._send_html(404)
+
+
+class CrawlerFixtureTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+        cls.server.daemon_threads = True
+        cls.port = cls.server.server_address[1]
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FixtureHandler.max_active.clear()
+        FixtureHandler.started.clear()
+        FixtureHandler.conditional_hits.clear()
+
+    def url(self, path, host='127.0.0.1'):
+        return f'http://{host}:{self.port}{path}'
+
+
+class HtmlMetaTests(TestCase):
+    document = (
+        '<html><head><title>\n  Caf\u00e9 &amp; Bar </title>'
+        '<meta name="Description" content="Best coffee">'
+        '<meta property="og:title" content="Cafe OG">'
+        '<meta property="og:title" content="Duplicate">'
+        '<meta property="og:url" content="https://example.test/cafe" />'
+        '<script>var head = "</title>";</script>'
+        '</head><body><meta property="og:image" content="ignored"><p>' + 'x' * 100000 + '</p>'
+        '</body></html>'
+    )
+
+    def assertMeta(self, result):
+        self.assertEqual(result['title'], 'Caf\u00e9 & Bar')
+        self.assertEqual(result['description'], 'Best coffee')
+        self.assertEqual(result['opengraph'], {
+            'title': 'Cafe OG',
+            'url': 'https://example.test/cafe'
+        })
+
+    def test_html_parser(self):
+        self.assertMeta(extract_meta(self.document.encode('utf-8'), 'utf-8', use_lxml=False))
+
+    def test_other_charset(self):
+        self.assertMeta(extract_meta(self.document.encode('latin-1'), 'ISO-8859-1', use_lxml=False))
+
+    def test_unknown_charset(self):
+        self.assertMeta(extract_meta(self.document.encode('utf-8'), 'no-such-charset', use_lxml=False))
+
+    @skipIf(etree is None, 'lxml is not installed')
+    def test_lxml(self):
+        self.assertMeta(extract_meta(self.document.encode('utf-8'), 'utf-8', use_lxml=True))
+
+    def test_missing_tags(self):
+        result = extract_meta(b'<html><body>no head</body></html>', use_lxml=False)
+
+        self.assertEqual(result, {"title": "", "description": "", "opengraph": {}})
+
+
+class ProfileCrawlerTests(CrawlerFixtureTestCase):
+    def test_reads_head_only(self):
+        started = time.perf_counter()
+        result = crawl_profiles([self.url('/profile')], max_bytes=1024 * 1024)[0]
+
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertTrue(result['exists'])
+        self.assertEqual(result['title'], 'Fixture Page')
+        self.assertEqual(result['description'], 'A fixture profile')
+
+    def test_large_head_parsed_off_loop(self):
+        result = crawl_profiles([self.url('/profile')], offload_bytes=1)[0]
+
+        self.assertEqual(result['title'], 'Fixture Page')
+        self.assertEqual(result['opengraph'], {'image': 'https://cdn.test/logo.png'})
+
+    def test_missing_page(self):
+        result = crawl_profiles([self.url('/missing')])[0]
+
+        self.assertFalse(result['exists'])
+        self.assertEqual(result['status_code'], 404)
+
+    def test_read_timeout(self):
+        result = crawl_profiles([self.url('/hang')], read_timeout=0.2)[0]
+
+        self.assertFalse(result['exists'])
+        self.assertEqual(result['error'], 'timeout')
+
+    def test_size_limit_without_head_end(self):
+        result = crawl_profiles([self.url('/no-head-end')], max_bytes=4096)[0]
+
+        self.assertTrue(result['exists'])
+        self.assertEqual(result['title'], 'Truncated')
+
+    def test_per_domain_concurrency(self):
+        urls = [self.url(f'/slow?page={i}') for i in range(6)]
+        urls += [self.url(f'/slow?page={i}', host='localhost') for i in range(6)]
+
+        results = crawl_profiles(urls, per_domain=2, concurrency=10)
+
+        self.assertTrue(all(result['exists'] for result in results))
+        self.assertEqual(FixtureHandler.max_active['127.0.0.1/slow'], 2)
+        self.assertEqual(FixtureHandler.max_active['localhost/slow'], 2)
+
+    def test_global_concurrency(self):
+        urls = [self.url(f'/slow?page={i}') for i in range(6)]
+
+        crawl_profiles(urls, per_domain=10, concurrency=1)
+
+        self.assertEqual(FixtureHandler.max_active['127.0.0.1/slow'], 1)
+
+    def test_busy_domain_does_not_starve_others(self):
+        urls = [self.url(f'/slow?page={i}') for i in range(6)]
+        urls += [self.url(f'/slow?page={i}', host='localhost') for i in range(2)]
+
+        results = crawl_profiles(urls, per_domain=1, concurrency=2)
+
+        self.assertTrue(all(result['exists'] for result in results))
+        # localhost is served while 127.0.0.1 still has queued urls
+        self.assertLess(
+            max(i for i, host in enumerate(FixtureHandler.started) if host == 'localhost/slow'),
+            max(i for i, host in enumerate(FixtureHandler.started) if host == '127.0.0.1/slow')
+        )
+
+    def test_duplicate_urls_fetched_once(self):
+        urls = [self.url('/slow'), self.url('/missing'), self.url('/slow')]
+
+        results = crawl_profiles(urls)
+
+        self.assertEqual([r['exists'] for r in results], [True, False, True])
+        self.assertIs(results[0], results[2])
+
+    def test_conditional_request(self):
+        url = self.url('/etag')
+
+        first = crawl_profiles([url])[0]
+        second = crawl_profiles([url], {url: {'etag': first['etag'], 'last_modified': ''}})[0]
+
+        self.assertEqual(first['etag'], '"v1"')
+        self.assertEqual(second, {"exists": True, "not_modified": True, "status_code": 304})
+        self.assertEqual(FixtureHandler.conditional_hits, ['/etag'])
+
+    def test_crawl_domain(self):
+        self.assertEqual(crawl_domain('https://www.Facebook.com/page'), 'facebook.com')
+        self.assertEqual(crawl_domain('https://m.facebook.com/page'), 'm.facebook.com')
+
+
+@override_settings(PROFILE_CRAWLER_READ_TIMEOUT=0.5)
+class VerifySocialProfilesBulkTests(CrawlerFixtureTestCase):
+    def setUp(self):
+        super().setUp()
+        self.businesses = [
+            Business.objects.create(name=f'Business {i}', google_place_id=f'place_{i}')
+            for i in range(2)
+        ]
+        for business in self.businesses:
+            SocialMediaProfile.objects.create(
+                business=business,
+                platform='facebook',
+                profile_url=self.url(f'/profile?business={business.id}')
+            )
+            SocialMediaProfile.objects.create(
+                business=business,
+                platform='instagram',
+                profile_url=self.url(f'/missing?business={business.id}')
+            )
+
+    def test_verifies_profiles_across_businesses(self):
+        result = verify_social_profiles_bulk([b.id for b in self.businesses])
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['profile_count'], 4)
+        self.assertEqual(result['verified_count'], 2)
+
+        verified = SocialMediaProfile.objects.filter(verified=True)
+        self.assertEqual(set(verified.values_list('platform', flat=True)), {'facebook'})
+        self.assertEqual(verified.first().profile_data['title'], 'Fixture Page')
+
+    def test_limits_to_given_businesses(self):
+        result = verify_social_profiles_bulk([self.businesses[0].id])
+
+        self.assertEqual(result['profile_count'], 2)
+        self.assertFalse(
+            SocialMediaProfile.objects.filter(business=self.businesses[1], verified=True).exists()
+        )
+
+
+@override_settings(PROFILE_CRAWLER_READ_TIMEOUT=0.5)
+class ProfileReverificationTests(CrawlerFixtureTestCase):
+    def setUp(self):
+        super().setUp()
+        self.business = Business.objects.create(name='Business', google_place_id='place_1')
+        self.profile = SocialMediaProfile.objects.create(
+            business=self.business,
+            platform='facebook',
+            profile_url=self.url('/etag')
+        )
+
+    def make_stale(self, *profiles):
+        SocialMediaProfile.objects.filter(id__in=[p.id for p in profiles]).update(
+            updated_at=timezone.now() - timedelta(days=30)
+        )
+
+    def test_stores_validators(self):
+        verify_social_profiles_bulk([self.business.id])
+
+        entry = ProfileVerificationCache.objects.get(profile_url=self.profile.profile_url)
+        self.assertEqual(entry.etag, '"v1"')
+        self.assertEqual(entry.status_code, 200)
+        self.assertEqual(entry.result['title'], 'Fixture Page')
+        self.assertNotIn('etag', entry.result)
+
+    def test_unchanged_profile_keeps_cached_result(self):
+        verify_social_profiles_bulk([self.business.id])
+        self.make_stale(self.profile)
+
+        result = reverify_stale_profiles()
+
+        self.assertEqual(result['profile_count'], 1)
+        self.assertEqual(result['not_modified_count'], 1)
+        self.assertEqual(FixtureHandler.conditional_hits, ['/etag'])
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.verified)
+        self.assertEqual(self.profile.profile_data['title'], 'Fixture Page')
+        self.assertEqual(ProfileVerificationCache.objects.count(), 1)
+
+    def test_reverifies_oldest_first_in_batches(self):
+        other = SocialMediaProfile.objects.create(
+            business=self.business,
+            platform='twitter',
+            profile_url=self.url('/missing')
+        )
+        fresh = SocialMediaProfile.objects.create(
+            business=self.business,
+            platform='linkedin',
+            profile_url=self.url('/slow')
+        )
+        self.make_stale(self.profile)
+        SocialMediaProfile.objects.filter(id=other.id).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+
+        first = reverify_stale_profiles(limit=1)
+        second = reverify_stale_profiles(limit=1)
+        third = reverify_stale_profiles(limit=1)
+
+        self.assertEqual((first['profile_count'], first['verified_count']), (1, 0))
+        self.assertEqual((second['profile_count'], second['verified_count']), (1, 1))
+        self.assertEqual(third['profile_count'], 0)
+        fresh.refresh_from_db()
+        self.assertIsNone(fresh.verification_date)
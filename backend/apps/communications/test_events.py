@@ -0,0 +1,157 @@
+import asyncio
+import json
+from unittest.mock import patch, MagicMock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import events
+from .events import publish_status, user_channel
+from .models import Communication, MessageQueue, SMTPServer
+from .utils import process_message_queue
+
+User = get_user_model()
+
+
+class EventsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='events', email='events@test.com', password='pass')
+        self.messages = Communication.objects.bulk_create([
+            Communication(
+                user=self.user,
+                type=Communication.EMAIL,
+                status='queued',
+                recipient=f'user{i}@example.test',
+                subject='Events',
+                content='Events content'
+            )
+            for i in range(3)
+        ])
+
+
+@override_settings(EVENTS_REDIS_URL=None)
+class PublishStatusTests(EventsTestCase):
+    @override_settings(EVENTS_REDIS_URL='redis://localhost:6379/2')
+    def test_one_redis_message_per_user(self):
+        other = User.objects.create_user(username='other', email='other@test.com', password='pass')
+        other_message = Communication.objects.create(
+            user=other, type=Communication.WHATSAPP, recipient='+15550000000', content='Hi'
+        )
+        client = MagicMock()
+
+        with patch('apps.communications.events._client', return_value=client):
+            publish_status(self.messages + [other_message], 'failed', {self.messages[0].id: 'boom'})
+
+        pipe = client.pipeline.return_value
+        published = {call.args[0]: json.loads(call.args[1]) for call in pipe.publish.call_args_list}
+        self.assertEqual(set(published), {user_channel(self.user.id), user_channel(other.id)})
+        self.assertEqual(published[user_channel(self.user.id)][0], {
+            "id": self.messages[0].id, "type": "email", "status": "failed", "error": "boom"
+        })
+        self.assertEqual(len(published[user_channel(self.user.id)]), 3)
+        pipe.execute.assert_called_once()
+
+    @override_settings(EVENTS_REDIS_URL='redis://localhost:6379/2')
+    def test_publish_errors_are_swallowed(self):
+        client = MagicMock()
+        client.pipeline.return_value.execute.side_effect = ConnectionError('redis down')
+
+        with patch('apps.communications.events._client', return_value=client):
+            publish_status(self.messages, 'sent')
+
+    @patch('apps.communications.utils.publish_status')
+    def test_queue_processing_publishes_transitions(self, mock_publish):
+        SMTPServer.objects.create(
+            name='SMTP', host='smtp.test.com', port=587, username='u', password='p', daily_limit=100
+        )
+        MessageQueue.objects.bulk_create([
+            MessageQueue(communication=message, scheduled_time=timezone.now())
+            for message in self.messages
+        ])
+
+        process_message_queue()
+
+        self.assertEqual(
+            [(call.args[0], call.args[1]) for call in mock_publish.call_args_list if call.args[0]],
+            [(self.messages, 'processing'), (self.messages, 'sent')]
+        )
+
+
+@override_settings(EVENTS_REDIS_URL=None, EVENTS_HEARTBEAT_SECONDS=0.05)
+class MessageEventsViewTests(EventsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('communications:message-events')
+        self.token = str(AccessToken.for_user(self.user))
+        self.addCleanup(events._local_subscribers.clear)
+
+    async def open_stream(self, **params):
+        response = await self.async_client.get(self.url, params)
+        return response, response.streaming_content
+
+    async def wait_for_subscriber(self):
+        for _ in range(100):
+            if self.user.id in events._local_subscribers:
+                return
+            await asyncio.sleep(0.01)
+        self.fail('stream never subscribed')
+
+    async def test_requires_token(self):
+        missing = await self.async_client.get(self.url)
+        invalid = await self.async_client.get(self.url, {'token': 'not-a-token'})
+
+        self.assertEqual(missing.status_code, 401)
+        self.assertEqual(invalid.status_code, 401)
+
+    async def test_streams_status_events(self):
+        response, stream = await self.open_stream(token=self.token)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        pending = asyncio.ensure_future(anext(stream))
+        await self.wait_for_subscriber()
+        publish_status(self.messages[:2], 'sent')
+
+        first = await pending
+        second = await anext(stream)
+        self.assertEqual(
+            first,
+            f'event: status\ndata: {json.dumps({"id": self.messages[0].id, "type": "email", "status": "sent"})}\n\n'.encode()
+        )
+        self.assertIn(f'"id": {self.messages[1].id}'.encode(), second)
+
+        # A client disconnect cancels the pending read, which unsubscribes
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertNotIn(self.user.id, events._local_subscribers)
+
+    async def test_bearer_header_and_keepalive(self):
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {self.token}'})
+        stream = response.streaming_content
+
+        await anext(stream)
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+        await stream.aclose()
+
+    async def test_other_users_events_are_not_delivered(self):
+        other = await User.objects.acreate(username='other', email='other@test.com')
+        other_message = await Communication.objects.acreate(
+            user=other, type=Communication.EMAIL, recipient='x@example.test', content='Hi'
+        )
+        response, stream = await self.open_stream(token=self.token)
+        await anext(stream)
+
+        pending = asyncio.ensure_future(anext(stream))
+        await self.wait_for_subscriber()
+        publish_status([other_message], 'sent')
+
+        self.assertEqual(await pending, b': keepalive\n\n')
+        await stream.aclose()
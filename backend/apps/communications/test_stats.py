@@ -0,0 +1,224 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch, MagicMock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .models import (
+    Communication,
+    CommunicationDailyStats,
+    MessageQueue,
+    SMTPServer,
+    WhatsAppAccount
+)
+from .stats import record_outcomes
+from .utils import process_message_queue
+
+User = get_user_model()
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats', email='stats@test.com', password='pass')
+        self.other = User.objects.create_user(username='other', email='other@test.com', password='pass')
+
+    def make_communications(self, count, user=None, message_type=Communication.EMAIL, status='queued'):
+        return Communication.objects.bulk_create([
+            Communication(
+                user=user or self.user,
+                type=message_type,
+                status=status,
+                recipient=f'user{i}@example.test',
+                subject='Stats',
+                content='Stats content'
+            )
+            for i in range(count)
+        ])
+
+
+class RecordOutcomesTests(StatsTestCase):
+    def test_increments_existing_buckets(self):
+        messages = self.make_communications(3)
+
+        record_outcomes(sent=messages[:2], failed=messages[2:], account_id=7)
+        record_outcomes(sent=messages, account_id=7)
+        record_outcomes(failed=messages[:1])
+
+        self.assertEqual(
+            set(CommunicationDailyStats.objects.values_list('type', 'account_id', 'sent', 'failed')),
+            {(Communication.EMAIL, 7, 5, 1), (Communication.EMAIL, 0, 0, 1)}
+        )
+        self.assertEqual(
+            set(CommunicationDailyStats.objects.values_list('day', flat=True)),
+            {timezone.localdate()}
+        )
+
+    def test_one_query_per_batch(self):
+        messages = self.make_communications(4) + self.make_communications(2, user=self.other)
+
+        with self.assertNumQueries(1):
+            record_outcomes(sent=messages[:3], failed=messages[3:], account_id=1)
+
+        self.assertEqual(CommunicationDailyStats.objects.count(), 2)
+
+    def test_empty_batch_is_a_noop(self):
+        with self.assertNumQueries(0):
+            record_outcomes()
+
+    @patch('requests.post')
+    def test_queue_processing_updates_rollup(self, mock_post):
+        mock_post.side_effect = [
+            MagicMock(status_code=200, json=MagicMock(return_value={"messages": [{"id": "wamid"}]})),
+            MagicMock(status_code=400, text='bad', json=MagicMock(return_value={})),
+        ]
+        SMTPServer.objects.create(
+            name='SMTP', host='smtp.test.com', port=587, username='u', password='p', daily_limit=100
+        )
+        account = WhatsAppAccount.objects.create(
+            name='WA', phone_number_id='1', access_token='t', daily_limit=100
+        )
+        messages = self.make_communications(3) + self.make_communications(2, message_type=Communication.WHATSAPP)
+        MessageQueue.objects.bulk_create([
+            MessageQueue(communication=message, scheduled_time=timezone.now())
+            for message in messages
+        ])
+
+        process_message_queue()
+
+        self.assertEqual(
+            set(CommunicationDailyStats.objects.values_list('type', 'sent', 'failed')),
+            {(Communication.EMAIL, 3, 0), (Communication.WHATSAPP, 1, 1)}
+        )
+        self.assertEqual(
+            CommunicationDailyStats.objects.get(type=Communication.WHATSAPP).account_id,
+            account.id
+        )
+
+
+class CommunicationStatsViewTests(StatsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('communications:communication-stats')
+        today = timezone.localdate()
+        CommunicationDailyStats.objects.bulk_create([
+            CommunicationDailyStats(day=today, user=self.user, type=Communication.EMAIL, account_id=1, sent=10, failed=1),
+            CommunicationDailyStats(day=today, user=self.user, type=Communication.EMAIL, account_id=2, sent=5),
+            CommunicationDailyStats(day=today - timedelta(days=1), user=self.user,
+                                    type=Communication.WHATSAPP, account_id=3, sent=7, failed=2),
+            CommunicationDailyStats(day=today - timedelta(days=60), user=self.user,
+                                    type=Communication.EMAIL, account_id=1, sent=100),
+            CommunicationDailyStats(day=today, user=self.other, type=Communication.EMAIL, account_id=1, sent=50),
+        ])
+        queued = self.make_communications(2, message_type=Communication.WHATSAPP)
+        MessageQueue.objects.bulk_create([
+            MessageQueue(communication=message, scheduled_time=timezone.now())
+            for message in queued
+        ])
+
+    def test_own_stats_for_last_30_days(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals'], {'sent': 22, 'failed': 3, 'queued': 2})
+        self.assertEqual(response.data['by_type'], {
+            Communication.EMAIL: {'sent': 15, 'failed': 1, 'queued': 0},
+            Communication.WHATSAPP: {'sent': 7, 'failed': 2, 'queued': 2},
+        })
+        self.assertEqual(len(response.data['daily']), 3)
+        self.assertNotIn('user_id', response.data['daily'][0])
+
+    def test_date_range_and_type_filter(self):
+        start = (timezone.localdate() - timedelta(days=90)).isoformat()
+
+        response = self.client.get(self.url, {'start': start, 'type': Communication.EMAIL})
+
+        self.assertEqual(response.data['totals'], {'sent': 115, 'failed': 1, 'queued': 0})
+        self.assertEqual(list(response.data['by_type']), [Communication.EMAIL])
+
+    def test_invalid_range(self):
+        for params in ({'start': 'yesterday'}, {'start': '2024-02-30'}, {'start': '2024-03-01', 'end': '2024-02-01'},
+                       {'start': '2020-01-01', 'end': '2024-01-01'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_invalid_filters(self):
+        for params, error in (({'end': 'soon'}, 'end must be a valid date (YYYY-MM-DD)'),
+                              ({'type': 'fax'}, 'type must be email or whatsapp'),
+                              ({'user': 'me'}, "user must be a user id or 'all'")):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertEqual(response.data['error'], error)
+
+    def test_user_param_requires_staff(self):
+        own = self.client.get(self.url, {'user': self.user.id})
+        self.assertEqual(own.data['totals']['sent'], 22)
+        for requested in ('all', self.other.id):
+            response = self.client.get(self.url, {'user': requested})
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN, requested)
+
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='pass')
+        self.client.force_authenticate(user=admin)
+
+        everyone = self.client.get(self.url, {'user': 'all'})
+        self.assertEqual(everyone.data['totals']['sent'], 72)
+        self.assertIn('user_id', everyone.data['daily'][0])
+        other = self.client.get(self.url, {'user': self.other.id})
+        self.assertEqual(other.data['totals']['sent'], 50)
+
+
+class RebuildStatsCommandTests(StatsTestCase):
+    def test_rebuild_matches_incremental_rollup(self):
+        sent = self.make_communications(3, status='sent')
+        failed = self.make_communications(2, message_type=Communication.WHATSAPP, status='failed')
+        Communication.objects.filter(id__in=[c.id for c in sent]).update(sent_at=timezone.now())
+        record_outcomes(sent=sent)
+        record_outcomes(failed=failed)
+        incremental = set(CommunicationDailyStats.objects.values_list('day', 'user_id', 'type', 'sent', 'failed'))
+
+        out = StringIO()
+        call_command('rebuild_communication_stats', stdout=out)
+
+        self.assertEqual(
+            set(CommunicationDailyStats.objects.values_list('day', 'user_id', 'type', 'sent', 'failed')),
+            incremental
+        )
+        self.assertIn('Rebuilt 2 daily stats rows', out.getvalue())
+
+    def test_rebuild_rewrites_rows_in_place(self):
+        sent = self.make_communications(2, status='sent')
+        Communication.objects.filter(id__in=[c.id for c in sent]).update(sent_at=timezone.now())
+        today = timezone.localdate()
+        drifted = CommunicationDailyStats.objects.create(
+            day=today, user=self.user, type=Communication.EMAIL, sent=9, failed=4
+        )
+        orphan = CommunicationDailyStats.objects.create(
+            day=today - timedelta(days=3), user=self.other, type=Communication.WHATSAPP, sent=5
+        )
+
+        call_command('rebuild_communication_stats', stdout=StringIO())
+
+        drifted.refresh_from_db()
+        self.assertEqual((drifted.sent, drifted.failed), (2, 0))
+        self.assertFalse(CommunicationDailyStats.objects.filter(id=orphan.id).exists())
+        self.assertEqual(CommunicationDailyStats.objects.count(), 1)
+
+    def test_rebuild_locks_one_day_at_a_time(self):
+        sent = self.make_communications(2, status='sent')
+        Communication.objects.filter(id=sent[0].id).update(sent_at=timezone.now() - timedelta(days=1))
+        Communication.objects.filter(id=sent[1].id).update(sent_at=timezone.now())
+
+        with patch('apps.communications.management.commands.rebuild_communication_stats.transaction') as tx:
+            call_command('rebuild_communication_stats', stdout=StringIO())
+
+        self.assertEqual(tx.atomic.call_count, 2)
+        self.assertEqual(
+            sorted(CommunicationDailyStats.objects.values_list('sent', flat=True)), [1, 1]
+        )
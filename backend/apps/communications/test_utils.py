@@ -1,15 +1,22 @@
-from django.test import TestCase
+from email import message_from_bytes
+from smtplib import SMTPServerDisconnected
+from django.core import mail
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from unittest.mock import patch, MagicMock
 from datetime import timedelta
 from .models import (
+    Business,
     SMTPServer,
     WhatsAppAccount,
     Communication,
+    CommunicationDailyStats,
     MessageQueue
 )
+from .adaptive import is_healthy, next_batch_size
+from .mime import MimeTemplate
 from .utils import (
     get_available_smtp_server,
     get_available_whatsapp_account,
@@ -17,7 +24,10 @@ from .utils import (
     send_email_message,
     process_email_batch,
     process_whatsapp_batch,
-    process_message_queue
+    process_message_queue,
+    reap_stuck_messages,
+    upsert_businesses,
+    business_search_cache_key
 )
 
 User = get_user_model()
@@ -227,6 +237,58 @@ class BatchProcessingTests(TestCase):
         self.smtp_server.refresh_from_db()
         self.assertEqual(self.smtp_server.messages_sent_today, 3)
 
+    def make_campaign(self, size):
+        Communication.objects.filter(id__in=[m.id for m in self.email_messages]).update(
+            subject='Campaign', content='Same body for everyone'
+        )
+        for i in range(3, size):
+            self.email_messages.append(Communication.objects.create(
+                user=self.user,
+                type=Communication.EMAIL,
+                recipient=f'test{i}@test.com',
+                subject='Campaign',
+                content='Same body for everyone',
+                status='queued'
+            ))
+        for message in self.email_messages:
+            message.refresh_from_db()
+
+    def test_email_batch_renders_shared_content_once(self):
+        self.make_campaign(3)
+
+        with patch('apps.communications.mime.MimeTemplate', wraps=MimeTemplate) as mock_template:
+            process_email_batch(self.email_messages)
+
+        mock_template.assert_called_once()
+        self.assertEqual([email.to for email in mail.outbox], [[m.recipient] for m in self.email_messages])
+        rendered = [email.message() for email in mail.outbox]
+        self.assertIs(rendered[0].payload, rendered[1].payload)
+        parsed = message_from_bytes(rendered[2].as_bytes(linesep='\r\n'))
+        self.assertEqual(parsed['To'], 'test2@test.com')
+        self.assertEqual(parsed['Subject'], 'Campaign')
+        self.assertEqual(parsed.get_payload(), 'Same body for everyone')
+        self.assertNotEqual(parsed['Message-ID'], message_from_bytes(rendered[0].as_bytes())['Message-ID'])
+
+    @override_settings(EMAIL_BCC_GROUP_SIZE=2)
+    def test_email_batch_groups_recipients_as_bcc(self):
+        self.make_campaign(5)
+
+        process_email_batch(self.email_messages)
+
+        self.assertEqual([email.bcc for email in mail.outbox], [
+            ['test0@test.com', 'test1@test.com'],
+            ['test2@test.com', 'test3@test.com'],
+            ['test4@test.com'],
+        ])
+        parsed = message_from_bytes(mail.outbox[0].message().as_bytes())
+        self.assertEqual(parsed['To'], 'undisclosed-recipients:;')
+        self.assertNotIn('Bcc', parsed)
+        self.assertEqual(
+            Communication.objects.filter(id__in=[m.id for m in self.email_messages], status='sent').count(), 5
+        )
+        self.smtp_server.refresh_from_db()
+        self.assertEqual(self.smtp_server.messages_sent_today, 5)
+
     @patch('requests.post')
     def test_process_whatsapp_batch(self, mock_post):
         mock_response = MagicMock()
@@ -273,4 +335,243 @@ class BatchProcessingTests(TestCase):
         self.assertEqual(
             mock_whatsapp_batch.call_args[0][0],
             self.whatsapp_messages
-        )
\ No newline at end of file
+        )
+
+    def test_process_message_queue_removes_sent_rows(self):
+        now = timezone.now()
+        for message in self.email_messages:
+            MessageQueue.objects.create(communication=message, scheduled_time=now, priority=1)
+        later = MessageQueue.objects.create(
+            communication=self.whatsapp_messages[0],
+            scheduled_time=now + timedelta(hours=1),
+            priority=1
+        )
+
+        process_message_queue()
+
+        self.assertEqual(list(MessageQueue.objects.all()), [later])
+        self.assertEqual(later.status, MessageQueue.QUEUED)
+        for message in self.email_messages:
+            message.refresh_from_db()
+            self.assertEqual(message.status, 'sent')
+
+    @patch('requests.post')
+    def test_process_message_queue_parks_failed_rows(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=400, text='bad request')
+        mock_post.return_value.json.return_value = {}
+        for message in self.whatsapp_messages:
+            MessageQueue.objects.create(communication=message, scheduled_time=timezone.now())
+
+        process_message_queue()
+
+        self.assertEqual(
+            set(MessageQueue.objects.values_list('status', 'attempts', 'locked_at')),
+            {(MessageQueue.FAILED, 1, None)}
+        )
+
+        # Parked rows are not claimed again
+        process_message_queue()
+        self.assertEqual(mock_post.call_count, 3)
+
+    def test_claim_uses_ready_index(self):
+        from django.db import connection
+
+        queryset = MessageQueue.objects.filter(
+            status=MessageQueue.QUEUED,
+            locked_at__isnull=True,
+            scheduled_time__lte=timezone.now(),
+            communication__type=Communication.EMAIL
+        ).order_by('priority', 'scheduled_time')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+
+        self.assertIn('messagequeue_ready_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def claim(self, message, minutes_ago, attempts=1):
+        Communication.objects.filter(id=message.id).update(status='processing')
+        return MessageQueue.objects.create(
+            communication=message,
+            scheduled_time=timezone.now(),
+            status=MessageQueue.PROCESSING,
+            locked_at=timezone.now() - timedelta(minutes=minutes_ago),
+            locked_by='dead-worker:1',
+            attempts=attempts
+        )
+
+    @override_settings(MESSAGE_QUEUE_LEASE_SECONDS=300)
+    def test_reaper_takes_back_expired_claims(self):
+        retry = self.claim(self.email_messages[0], minutes_ago=60)
+        exhausted = self.claim(self.email_messages[1], minutes_ago=60, attempts=3)
+        alive = self.claim(self.email_messages[2], minutes_ago=1)
+
+        # Select, two UPDATEs per outcome, one rollup upsert (plus savepoints)
+        with self.assertNumQueries(8):
+            result = reap_stuck_messages()
+
+        self.assertEqual(result, {"requeued": 1, "failed": 1})
+        self.assertEqual(
+            set(MessageQueue.objects.values_list('id', 'status', 'locked_at', 'attempts')),
+            {(retry.id, MessageQueue.QUEUED, None, 1), (exhausted.id, MessageQueue.FAILED, None, 3),
+             (alive.id, MessageQueue.PROCESSING, alive.locked_at, 1)}
+        )
+        self.assertEqual(
+            list(Communication.objects.filter(id__in=[m.id for m in self.email_messages])
+                 .order_by('id').values_list('status', flat=True)),
+            ['queued', 'failed', 'processing']
+        )
+        self.assertEqual(CommunicationDailyStats.objects.get().failed, 1)
+
+        # Requeued rows are claimable again
+        process_message_queue()
+        self.assertFalse(MessageQueue.objects.filter(id=retry.id).exists())
+
+    def test_claim_records_worker(self):
+        MessageQueue.objects.create(communication=self.email_messages[0], scheduled_time=timezone.now())
+
+        with patch('apps.communications.utils.process_email_batch'):
+            process_message_queue()
+
+        self.assertIn(':', MessageQueue.objects.get().locked_by)
+
+    @override_settings(MESSAGE_QUEUE_LEASE_SECONDS=0)
+    @patch('requests.post')
+    def test_long_batches_renew_their_leases(self, mock_post):
+        stale = timezone.now() - timedelta(hours=1)
+        for message in self.whatsapp_messages:
+            self.claim(message, minutes_ago=60)
+        leases = []
+
+        def send(*args, **kwargs):
+            leases.append(MessageQueue.objects.get(communication__recipient=kwargs['json']['to']).locked_at)
+            return MagicMock(status_code=200, json=MagicMock(return_value={"messages": [{"id": "wamid"}]}))
+        mock_post.side_effect = send
+
+        process_whatsapp_batch(self.whatsapp_messages)
+
+        self.assertEqual(len(leases), 3)
+        self.assertTrue(all(lease > stale for lease in leases))
+
+    def test_claim_respects_account_batch_sizes(self):
+        SMTPServer.objects.filter(id=self.smtp_server.id).update(batch_size=2)
+        WhatsAppAccount.objects.filter(id=self.whatsapp_account.id).update(batch_size=1)
+        for message in self.email_messages + self.whatsapp_messages:
+            MessageQueue.objects.create(communication=message, scheduled_time=timezone.now())
+
+        with patch('apps.communications.utils.process_email_batch') as mock_email_batch, \
+                patch('apps.communications.utils.process_whatsapp_batch') as mock_whatsapp_batch:
+            process_message_queue()
+
+        self.assertEqual(mock_email_batch.call_args[0], (self.email_messages[:2], self.smtp_server))
+        self.assertEqual(mock_whatsapp_batch.call_args[0], (self.whatsapp_messages[:1], self.whatsapp_account))
+        self.assertEqual(MessageQueue.objects.filter(status=MessageQueue.QUEUED).count(), 3)
+
+    @override_settings(BATCH_SIZE_INCREASE=10, BATCH_SIZE_DECREASE_FACTOR=0.5)
+    def test_email_batch_size_grows_and_halves(self):
+        process_email_batch(self.email_messages)
+        self.smtp_server.refresh_from_db()
+        self.assertEqual(self.smtp_server.batch_size, 60)
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=SMTPServerDisconnected('gone')):
+            process_email_batch(self.email_messages)
+        self.smtp_server.refresh_from_db()
+        self.assertEqual(self.smtp_server.batch_size, 30)
+
+        SMTPServer.objects.filter(id=self.smtp_server.id).update(min_batch_size=25, max_batch_size=32)
+        self.smtp_server.refresh_from_db()
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=SMTPServerDisconnected('gone')):
+            process_email_batch(self.email_messages, self.smtp_server)
+        self.assertEqual(SMTPServer.objects.get(id=self.smtp_server.id).batch_size, 25)
+        process_email_batch(self.email_messages, self.smtp_server)
+        process_email_batch(self.email_messages, self.smtp_server)
+        self.assertEqual(SMTPServer.objects.get(id=self.smtp_server.id).batch_size, 32)
+
+    @override_settings(BATCH_SIZE_INCREASE=10)
+    def test_batch_size_saved_against_current_bounds(self):
+        claimed = SMTPServer.objects.get(id=self.smtp_server.id)
+        # An admin narrows the bounds and another worker sends while this batch runs
+        SMTPServer.objects.filter(id=claimed.id).update(min_batch_size=5, max_batch_size=40, messages_sent_today=7)
+
+        process_email_batch(self.email_messages, claimed)
+
+        server = SMTPServer.objects.get(id=claimed.id)
+        self.assertEqual((server.min_batch_size, server.max_batch_size), (5, 40))
+        self.assertEqual(server.batch_size, 40)
+        self.assertEqual(server.messages_sent_today, 7 + len(self.email_messages))
+
+    @override_settings(BATCH_ERROR_RATE_THRESHOLD=0.5)
+    @patch('requests.post')
+    def test_whatsapp_throttling_shrinks_batch(self, mock_post):
+        sent = MagicMock(status_code=200, json=MagicMock(return_value={"messages": [{"id": "wamid"}]}))
+        throttled = MagicMock(status_code=429, text='rate limited', json=MagicMock(return_value={}))
+
+        mock_post.side_effect = [sent, sent, sent]
+        process_whatsapp_batch(self.whatsapp_messages)
+        self.whatsapp_account.refresh_from_db()
+        self.assertEqual(self.whatsapp_account.batch_size, 60)
+
+        # One failure in three is within the error budget, but a 429 is not
+        mock_post.side_effect = [sent, throttled, sent]
+        process_whatsapp_batch(self.whatsapp_messages)
+        self.whatsapp_account.refresh_from_db()
+        self.assertEqual(self.whatsapp_account.batch_size, 30)
+
+    @override_settings(BATCH_LATENCY_TARGET_MS=100)
+    def test_slow_batches_are_unhealthy(self):
+        self.assertTrue(is_healthy(10, 0, 0.5))
+        self.assertFalse(is_healthy(10, 0, 2))
+        self.assertFalse(is_healthy(10, 1, 0.5))
+        self.assertFalse(is_healthy(0, 0, 0, throttled=True))
+        self.assertEqual(next_batch_size(50, 10, 200, healthy=False), 25)
+        self.assertEqual(next_batch_size(195, 10, 200, healthy=True), 200)
+
+
+class BusinessSearchUtilsTests(TestCase):
+    def place_row(self, place_id, name):
+        return {
+            'name': name,
+            'address': '1 Main St',
+            'phone_number': '+1234567890',
+            'website': '',
+            'category': 'cafe',
+            'google_maps_link': f'https://maps.google.com/{place_id}',
+            'google_place_id': place_id
+        }
+
+    def test_upsert_businesses_inserts_and_updates(self):
+        upsert_businesses([self.place_row('p1', 'Old Name')])
+        created_at = Business.objects.get(google_place_id='p1').created_at
+
+        with self.assertNumQueries(1):
+            upsert_businesses([
+                self.place_row('p1', 'New Name'),
+                self.place_row('p2', 'Second'),
+            ])
+
+        self.assertEqual(Business.objects.count(), 2)
+        updated = Business.objects.get(google_place_id='p1')
+        self.assertEqual(updated.name, 'New Name')
+        self.assertEqual(updated.created_at, created_at)
+
+    def test_upsert_businesses_deduplicates_and_skips_missing_ids(self):
+        upsert_businesses([
+            self.place_row('p1', 'First'),
+            self.place_row('p1', 'Duplicate'),
+            self.place_row(None, 'No place id'),
+        ])
+        self.assertEqual(Business.objects.count(), 1)
+        self.assertEqual(Business.objects.get().name, 'Duplicate')
+
+    def test_search_cache_key_is_normalized(self):
+        self.assertEqual(
+            business_search_cache_key('Coffee  Shops', ' Berlin'),
+            business_search_cache_key('coffee shops', 'BERLIN ')
+        )
+        self.assertNotEqual(
+            business_search_cache_key('coffee', 'Berlin'),
+            business_search_cache_key('coffee', 'Paris')
+        )
@@ -8,4 +8,26 @@ class EmailRateThrottle(UserRateThrottle):
 
 class WhatsAppRateThrottle(UserRateThrottle):
     rate = '50/day'
-    scope = 'whatsapp_send'
\ No newline at end of file
+    scope = 'whatsapp_send'
+
+
+async def allow_request_async(throttle, request) -> bool:
+    # SimpleRateThrottle.allow_request on the async cache API
+    if throttle.rate is None:
+        return True
+
+    throttle.key = throttle.get_cache_key(request, None)
+    if throttle.key is None:
+        return True
+
+    throttle.history = await throttle.cache.aget(throttle.key, [])
+    throttle.now = throttle.timer()
+
+    while throttle.history and throttle.history[-1] <= throttle.now - throttle.duration:
+        throttle.history.pop()
+    if len(throttle.history) >= throttle.num_requests:
+        return throttle.throttle_failure()
+
+    throttle.history.insert(0, throttle.now)
+    await throttle.cache.aset(throttle.key, throttle.history, throttle.duration)
+    return True
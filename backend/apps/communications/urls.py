@@ -5,12 +5,17 @@ from .views import (
     EmailView,
     WhatsAppView,
     MessageHistoryView,
+    CommunicationStatsView,
+    MessageEventsView,
     BusinessViewSet,
     SocialMediaProfileViewSet,
     SMTPServerViewSet,
     WhatsAppAccountViewSet,
     MessageQueueView,
     BulkMessageView,
+    AsyncEmailView,
+    AsyncWhatsAppView,
+    AsyncBulkMessageView,
     SocialAPIConfigViewSet
 )
 
@@ -32,8 +37,15 @@ urlpatterns = [
     path("email/", EmailView.as_view(), name="email-send"),
     path("whatsapp/", WhatsAppView.as_view(), name="whatsapp-send"),
     path("bulk/", BulkMessageView.as_view(), name="bulk-send"),
+
+    # Same contracts as above, as async views for ASGI deployments
+    path("async/email/", AsyncEmailView.as_view(), name="async-email-send"),
+    path("async/whatsapp/", AsyncWhatsAppView.as_view(), name="async-whatsapp-send"),
+    path("async/bulk/", AsyncBulkMessageView.as_view(), name="async-bulk-send"),
     
     path("history/", MessageHistoryView.as_view(), name="message-history"),
+    path("stats/", CommunicationStatsView.as_view(), name="communication-stats"),
+    path("events/", MessageEventsView.as_view(), name="message-events"),
     path("queue/", MessageQueueView.as_view(), name="message-queue"),
     
 ]
\ No newline at end of file
@@ -1,15 +1,138 @@
+import hashlib
+import json
+import os
+import socket
+import time
+import uuid
 import requests
-from typing import Optional, Dict, Any, List
+from datetime import timedelta
+from typing import Optional, Dict, Any, List, Iterable, Union
 from django.core.mail import get_connection, EmailMessage
 from django.conf import settings
 from django.utils import timezone
 from django.db.models import F
 from django.core.cache import cache
 from django.db import transaction
-from .models import Communication, SMTPServer, WhatsAppAccount
+from .models import Business, Communication, SMTPServer, WhatsAppAccount, MessageQueue
+from .stats import record_outcomes
+from .events import publish_status
+from .mime import build_batch_emails
+from .adaptive import THROTTLE_STATUS_CODES, adapt_batch_size, save_batch_size
 
 CACHE_TTL = 3600
-BATCH_SIZE = 50
+SEARCH_CACHE_TTL = 900
+BUSINESS_LIST_VERSION_KEY = 'business_list_version'
+SEARCH_INFLIGHT_TTL = 120
+SEARCH_RESULT_FIELDS = [
+    'name',
+    'address',
+    'phone_number',
+    'website',
+    'category',
+    'google_maps_link',
+    'google_place_id',
+]
+BUSINESS_UPSERT_FIELDS = [
+    'name',
+    'address',
+    'phone_number',
+    'website',
+    'category',
+    'google_maps_link',
+    'updated_at',
+]
+
+
+def get_business_list_version() -> str:
+    version = cache.get(BUSINESS_LIST_VERSION_KEY)
+    if version is None:
+        cache.add(BUSINESS_LIST_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(BUSINESS_LIST_VERSION_KEY)
+    return version
+
+
+def invalidate_business_list_cache():
+    # Pages are keyed by version, so bumping it orphans every cached page
+    cache.set(BUSINESS_LIST_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def normalize_search_term(value: str) -> str:
+    return ' '.join(value.casefold().split())
+
+
+def business_search_cache_key(query: str, location: str) -> str:
+    normalized = f"{normalize_search_term(query)}|{normalize_search_term(location)}"
+    return f"business_search_{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def business_search_inflight_key(query: str, location: str) -> str:
+    return f"{business_search_cache_key(query, location)}_inflight"
+
+
+def load_search_results(place_ids: List[str]) -> List[Dict[str, Any]]:
+    rows = {
+        row['google_place_id']: row
+        for row in Business.objects.filter(
+            google_place_id__in=place_ids
+        ).values(*SEARCH_RESULT_FIELDS)
+    }
+    return [rows[place_id] for place_id in place_ids if place_id in rows]
+
+
+def upsert_businesses(rows: Iterable[Dict[str, Any]]) -> List[Business]:
+    # One row per place; Postgres refuses to touch the same row twice in a
+    # single INSERT ... ON CONFLICT statement.
+    by_place_id = {
+        row['google_place_id']: row
+        for row in rows
+        if row.get('google_place_id')
+    }
+    if not by_place_id:
+        return []
+
+    businesses = Business.objects.bulk_create(
+        [Business(**row) for row in by_place_id.values()],
+        update_conflicts=True,
+        unique_fields=['google_place_id'],
+        update_fields=BUSINESS_UPSERT_FIELDS,
+        batch_size=500,
+    )
+    invalidate_business_list_cache()
+    return businesses
+
+
+def build_contact_data(business: Business, verified_profiles: Iterable) -> Dict[str, Any]:
+    contact_data = {
+        'names': [{'givenName': business.name}],
+        'phoneNumbers': [{'value': business.phone_number}],
+        'addresses': [{'formattedValue': business.address}],
+        'urls': []
+    }
+    
+    if business.website:
+        contact_data['urls'].append({
+            'value': business.website,
+            'type': 'website'
+        })
+    
+    if business.google_maps_link:
+        contact_data['urls'].append({
+            'value': business.google_maps_link,
+            'type': 'map'
+        })
+    
+    for profile in verified_profiles:
+        contact_data['urls'].append({
+            'value': profile.profile_url,
+            'type': profile.platform
+        })
+    
+    return contact_data
+
+
+def contact_content_hash(contact_data: Dict[str, Any]) -> str:
+    payload = json.dumps(contact_data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
 
 def get_available_smtp_server() -> Optional[SMTPServer]:
@@ -58,6 +181,30 @@ def get_available_whatsapp_account() -> Optional[WhatsAppAccount]:
     return available_accounts.first()
 
 
+def build_whatsapp_payload(to_number: str, message: str = None, message_type: str = "text") -> Dict[str, Any]:
+    if message_type == "template":
+        return {
+            "messaging_product": "whatsapp",
+            "to": to_number,
+            "type": "template",
+            "template": {
+                "name": "hello_world",
+                "language": {
+                    "code": "en_US"
+                }
+            }
+        }
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": to_number,
+        "type": "text",
+        "text": {
+            "body": message
+        }
+    }
+
+
 def send_whatsapp_message(to_number: str, message: str = None, message_type: str = "text", user = None) -> Dict[str, Any]:
     try:
         account = get_available_whatsapp_account()
@@ -67,34 +214,13 @@ def send_whatsapp_message(to_number: str, message: str = None, message_type: str
                 "error": "No available WhatsApp accounts with remaining capacity"
             }
 
-        url = f"https://graph.facebook.com/v21.0/{account.phone_number_id}/messages"
+        url = f"{settings.WHATSAPP_GRAPH_URL}/{account.phone_number_id}/messages"
         headers = {
             "Authorization": f"Bearer {account.access_token}",
             "Content-Type": "application/json",
         }
 
-        if message_type == "template":
-            data = {
-                "messaging_product": "whatsapp",
-                "to": to_number,
-                "type": "template",
-                "template": {
-                    "name": "hello_world",
-                    "language": {
-                        "code": "en_US"
-                    }
-                }
-            }
-        else:
-            data = {
-                "messaging_product": "whatsapp",
-                "recipient_type": "individual",
-                "to": to_number,
-                "type": "text",
-                "text": {
-                    "body": message
-                }
-            }
+        data = build_whatsapp_payload(to_number, message, message_type)
 
         response = requests.post(url, headers=headers, json=data)
         response_data = response.json()
@@ -169,9 +295,113 @@ def send_email_message(to_email: str, subject: str, message: str, user) -> Dict[
     return result
 
 
-def process_email_batch(messages: List[Communication]):
+def finish_queue_items(sent_ids: Iterable[int] = (), failed_ids: Iterable[int] = ()):
+    """Drops queue rows of sent communications and parks failed ones."""
+    sent_ids = list(sent_ids)
+    failed_ids = list(failed_ids)
+    if sent_ids:
+        MessageQueue.objects.filter(communication_id__in=sent_ids).delete()
+    if failed_ids:
+        MessageQueue.objects.filter(communication_id__in=failed_ids).update(
+            status=MessageQueue.FAILED,
+            locked_at=None,
+            locked_by=None
+        )
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseHeartbeat:
+    """Renews the queue leases of a batch while it is being sent.
+
+    Call ``beat()`` between units of work; it only touches the database once
+    every third of MESSAGE_QUEUE_LEASE_SECONDS, so the reaper never takes
+    back rows from a batch that is slow but alive.
+    """
+
+    def __init__(self, messages: List[Communication]):
+        self.ids = [m.id for m in messages]
+        self.interval = settings.MESSAGE_QUEUE_LEASE_SECONDS / 3
+        self.last = time.monotonic()
+
+    def beat(self):
+        if time.monotonic() - self.last < self.interval:
+            return
+        MessageQueue.objects.filter(
+            communication_id__in=self.ids,
+            status=MessageQueue.PROCESSING
+        ).update(locked_at=timezone.now())
+        self.last = time.monotonic()
+
+
+def reap_stuck_messages(lease_seconds: Optional[int] = None) -> Dict[str, int]:
+    """Takes back claims whose lease expired (a worker died mid-batch).
+
+    The claim already counted the attempt, so rows with attempts left go
+    back to queued and the rest fail for good; the communications follow.
+    """
     now = timezone.now()
-    server = get_available_smtp_server()
+    cutoff = now - timedelta(seconds=lease_seconds or settings.MESSAGE_QUEUE_LEASE_SECONDS)
+
+    with transaction.atomic():
+        stuck = list(MessageQueue.objects.select_for_update(
+            skip_locked=True,
+            of=('self',)
+        ).select_related('communication').filter(
+            status=MessageQueue.PROCESSING,
+            locked_at__lt=cutoff
+        ).only(
+            'id', 'attempts', 'max_attempts',
+            'communication__id', 'communication__user_id', 'communication__type'
+        ).order_by())
+        requeued = [item for item in stuck if item.attempts < item.max_attempts]
+        exhausted = [item for item in stuck if item.attempts >= item.max_attempts]
+
+        if requeued:
+            MessageQueue.objects.filter(id__in=[item.id for item in requeued]).update(
+                status=MessageQueue.QUEUED,
+                locked_at=None,
+                locked_by=None
+            )
+            Communication.objects.filter(id__in=[item.communication_id for item in requeued]).update(
+                status='queued',
+                updated_at=now
+            )
+        if exhausted:
+            MessageQueue.objects.filter(id__in=[item.id for item in exhausted]).update(
+                status=MessageQueue.FAILED,
+                locked_at=None,
+                locked_by=None
+            )
+            Communication.objects.filter(id__in=[item.communication_id for item in exhausted]).update(
+                status='failed',
+                error_message='Processing lease expired',
+                updated_at=now
+            )
+
+    failed = [item.communication for item in exhausted]
+    record_outcomes(failed=failed)
+    publish_status([item.communication for item in requeued], 'queued')
+    publish_status(failed, 'failed', {m.id: 'Processing lease expired' for m in failed})
+    return {"requeued": len(requeued), "failed": len(exhausted)}
+
+
+def complete_batch(sent: List[Communication] = (), failed: List[Communication] = (),
+                   account_id: Optional[int] = None, errors: Union[str, Dict[int, str], None] = None):
+    """Queue, stats and live-status bookkeeping for a processed batch."""
+    if isinstance(errors, str):
+        errors = {m.id: errors for m in failed}
+    finish_queue_items([m.id for m in sent], [m.id for m in failed])
+    record_outcomes(sent, failed, account_id)
+    publish_status(sent, 'sent')
+    publish_status(failed, 'failed', errors)
+
+
+def process_email_batch(messages: List[Communication], server: Optional[SMTPServer] = None):
+    now = timezone.now()
+    server = server or get_available_smtp_server()
     
     if not server:
         Communication.objects.filter(id__in=[m.id for m in messages]).update(
@@ -179,6 +409,7 @@ def process_email_batch(messages: List[Communication]):
             error_message='No available SMTP servers',
             updated_at=now
         )
+        complete_batch(failed=messages, errors='No available SMTP servers')
         return
     
     connection = get_connection(
@@ -189,19 +420,10 @@ def process_email_batch(messages: List[Communication]):
         use_tls=server.use_tls
     )
     
-    email_messages = []
-    for message in messages:
-        email = EmailMessage(
-            subject=message.subject,
-            body=message.content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[message.recipient],
-            connection=connection,
-        )
-        email_messages.append(email)
-    
+    started = time.monotonic()
     try:
-        connection.send_messages(email_messages)
+        connection.send_messages(build_batch_emails(messages, connection))
+        seconds = time.monotonic() - started
         
         Communication.objects.filter(id__in=[m.id for m in messages]).update(
             status='sent',
@@ -209,8 +431,9 @@ def process_email_batch(messages: List[Communication]):
             updated_at=now
         )
         
-        server.messages_sent_today = F('messages_sent_today') + len(messages)
-        server.save()
+        adapt_batch_size(server, len(messages), 0, seconds)
+        save_batch_size(server, sent=len(messages))
+        complete_batch(sent=messages, account_id=server.id)
         
     except Exception as e:
         Communication.objects.filter(id__in=[m.id for m in messages]).update(
@@ -218,13 +441,16 @@ def process_email_batch(messages: List[Communication]):
             error_message=str(e),
             updated_at=now
         )
+        if adapt_batch_size(server, len(messages), len(messages), time.monotonic() - started):
+            save_batch_size(server)
+        complete_batch(failed=messages, account_id=server.id, errors=str(e))
     finally:
         connection.close()
 
 
-def process_whatsapp_batch(messages: List[Communication]):
+def process_whatsapp_batch(messages: List[Communication], account: Optional[WhatsAppAccount] = None):
     now = timezone.now()
-    account = get_available_whatsapp_account()
+    account = account or get_available_whatsapp_account()
     
     if not account:
         Communication.objects.filter(id__in=[m.id for m in messages]).update(
@@ -232,9 +458,10 @@ def process_whatsapp_batch(messages: List[Communication]):
             error_message='No available WhatsApp accounts',
             updated_at=now
         )
+        complete_batch(failed=messages, errors='No available WhatsApp accounts')
         return
     
-    url = f"https://graph.facebook.com/v21.0/{account.phone_number_id}/messages"
+    url = f"{settings.WHATSAPP_GRAPH_URL}/{account.phone_number_id}/messages"
     headers = {
         "Authorization": f"Bearer {account.access_token}",
         "Content-Type": "application/json",
@@ -242,37 +469,39 @@ def process_whatsapp_batch(messages: List[Communication]):
     
     success_ids = []
     failed_messages = {}
+    heartbeat = LeaseHeartbeat(messages)
+    throttled = False
+    started = time.monotonic()
     
     for message in messages:
+        heartbeat.beat()
         try:
-            data = {
-                "messaging_product": "whatsapp",
-                "recipient_type": "individual",
-                "to": message.recipient,
-                "type": "text",
-                "text": {"body": message.content}
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
+            response = requests.post(
+                url, headers=headers, json=build_whatsapp_payload(message.recipient, message.content)
+            )
             response_data = response.json()
             
             if response.status_code in [200, 201] and "messages" in response_data:
                 success_ids.append(message.id)
             else:
+                throttled = throttled or response.status_code in THROTTLE_STATUS_CODES
                 failed_messages[message.id] = f"API Error: {response.text}"
                 
         except Exception as e:
             failed_messages[message.id] = str(e)
     
+    resized = adapt_batch_size(
+        account, len(messages), len(failed_messages), time.monotonic() - started, throttled
+    )
     if success_ids:
         Communication.objects.filter(id__in=success_ids).update(
             status='sent',
             sent_at=now,
             updated_at=now
         )
-        
-        account.messages_sent_today = F('messages_sent_today') + len(success_ids)
-        account.save()
+
+    if success_ids or resized:
+        save_batch_size(account, sent=len(success_ids))
     
     if failed_messages:
         for message_id, error in failed_messages.items():
@@ -281,32 +510,62 @@ def process_whatsapp_batch(messages: List[Communication]):
                 error_message=error,
                 updated_at=now
             )
+    
+    complete_batch(
+        sent=[m for m in messages if m.id not in failed_messages],
+        failed=[m for m in messages if m.id in failed_messages],
+        account_id=account.id,
+        errors=failed_messages
+    )
 
 
 def process_message_queue():
     now = timezone.now()
+    server = get_available_smtp_server()
+    account = get_available_whatsapp_account()
+    # Each channel claims up to its own account's adaptive batch size
+    batch_sizes = {
+        Communication.EMAIL: server.batch_size if server else settings.MESSAGE_QUEUE_BATCH_SIZE,
+        Communication.WHATSAPP: account.batch_size if account else settings.MESSAGE_QUEUE_BATCH_SIZE,
+    }
     
     with transaction.atomic():
-        messages = Communication.objects.select_related(
-            'messagequeue',
-            'smtp_server',
-            'whatsapp_account'
+        # Claim straight from the queue table so messagequeue_ready_idx
+        # drives the scan; the communication is looked up per row for its channel
+        ready = MessageQueue.objects.select_for_update(
+            skip_locked=True,
+            of=('self',)
+        ).select_related(
+            'communication',
+            'communication__smtp_server',
+            'communication__whatsapp_account'
         ).filter(
-            status='queued',
-            messagequeue__scheduled_time__lte=now,
-            messagequeue__locked_at__isnull=True,
-            messagequeue__attempts__lt=F('messagequeue__max_attempts')
+            status=MessageQueue.QUEUED,
+            locked_at__isnull=True,
+            scheduled_time__lte=now,
+            attempts__lt=F('max_attempts')
         ).order_by(
-            'messagequeue__priority',
-            'messagequeue__scheduled_time'
-        )[:BATCH_SIZE]
+            'priority',
+            'scheduled_time'
+        )
+        queue_items = []
+        for channel, size in batch_sizes.items():
+            queue_items.extend(ready.filter(communication__type=channel)[:size])
         
-        message_ids = [m.id for m in messages]
-        if message_ids:
-            Communication.objects.filter(id__in=message_ids).update(
+        messages = [item.communication for item in queue_items]
+        if queue_items:
+            MessageQueue.objects.filter(id__in=[item.id for item in queue_items]).update(
+                status=MessageQueue.PROCESSING,
+                locked_at=now,
+                locked_by=worker_id(),
+                attempts=F('attempts') + 1
+            )
+            Communication.objects.filter(id__in=[m.id for m in messages]).update(
                 status='processing'
             )
     
+    publish_status(messages, 'processing')
+    
     email_messages = []
     whatsapp_messages = []
     
@@ -317,7 +576,7 @@ def process_message_queue():
             whatsapp_messages.append(message)
     
     if email_messages:
-        process_email_batch(email_messages)
+        process_email_batch(email_messages, server)
     
     if whatsapp_messages:
-        process_whatsapp_batch(whatsapp_messages)
\ No newline at end of file
+        process_whatsapp_batch(whatsapp_messages, account)
\ No newline at end of file
@@ -1,14 +1,31 @@
+import json
+import uuid
+from abc import ABC, abstractmethod
 import tweepy
 import requests
+from contextlib import aclosing
+from asgiref.sync import sync_to_async
+from celery.result import AsyncResult
 from rest_framework import status, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import permission_classes, action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor
+from rest_framework.renderers import JSONRenderer
+from rest_framework.throttling import UserRateThrottle
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework_simplejwt.exceptions import InvalidToken
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.core.cache import cache
-from datetime import timedelta
+from datetime import datetime
+from config.celery import app as celery_app
+from apps.authentication.authentication import CachedJWTAuthentication
 
 CACHE_TTL = 300
 from .tasks import (
@@ -27,20 +44,36 @@ from .models import (
     SMTPServer,
     WhatsAppAccount,
     MessageQueue,
-    SocialAPIConfig
+    SocialAPIConfig,
+    ArchivedCommunication
 )
+from .archive import TieredSequence
+from .stats import communication_stats, default_range, queue_summary
+from .events import subscribe
 from .serializers import (
     EmailMessageSerializer, 
     WhatsAppMessageSerializer,
     CommunicationHistorySerializer,
     BusinessSerializer,
+    BusinessSearchResultSerializer,
     SocialMediaProfileSerializer,
     SMTPServerSerializer,
     WhatsAppAccountSerializer,
-    MessageQueueSerializer,
+    MessageQueueListSerializer,
     SocialAPIConfigSerializer
 )
-from .throttles import EmailRateThrottle, WhatsAppRateThrottle
+from .throttles import EmailRateThrottle, WhatsAppRateThrottle, allow_request_async
+from .publisher import apply_task
+from .search import search_businesses
+from .utils import (
+    get_business_list_version,
+    business_search_cache_key,
+    business_search_inflight_key,
+    load_search_results,
+    reap_stuck_messages,
+    SEARCH_CACHE_TTL,
+    SEARCH_INFLIGHT_TTL
+)
 
 
 class MessageHistoryPagination(PageNumberPagination):
@@ -49,6 +82,60 @@ class MessageHistoryPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class BusinessPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MessageQueuePagination(CursorPagination):
+    """Keyset pagination in drain order.
+
+    DRF's cursor only keys on the first ordering field plus an offset, which
+    degrades on the few distinct priorities; this cursor carries the full
+    (priority, scheduled_time, id) key, so each page is one index range scan.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('priority', 'scheduled_time', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.has_previous = False
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                priority, scheduled_time, pk = cursor.position.split('|')
+                priority, pk = int(priority), int(pk)
+                scheduled_time = datetime.fromisoformat(scheduled_time)
+            except (AttributeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                Q(priority__gt=priority)
+                | Q(priority=priority, scheduled_time__gt=scheduled_time)
+                | Q(priority=priority, scheduled_time=scheduled_time, id__gt=pk)
+            )
+
+        rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = f'{last.priority}|{last.scheduled_time.isoformat()}|{last.id}'
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        return None
+
+
 class MessageHistoryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = MessageHistoryPagination
@@ -67,15 +154,18 @@ class MessageHistoryView(APIView):
             'smtp_server',
             'whatsapp_account'
         ).filter(user=request.user)
+        archived = ArchivedCommunication.objects.filter(user=request.user)
         
         if message_type in [Communication.EMAIL, Communication.WHATSAPP]:
             queryset = queryset.filter(type=message_type)
+            archived = archived.filter(type=message_type)
             
-        queryset = queryset.order_by('-created_at')
+        queryset = queryset.order_by('-created_at', '-id')
+        archived = archived.order_by('-created_at', '-id')
         
         paginator = self.pagination_class()
         paginator.request = request
-        page = paginator.paginate_queryset(queryset, request, view=self)
+        page = paginator.paginate_queryset(TieredSequence(queryset, archived), request, view=self)
         
         serializer = CommunicationHistorySerializer(page, many=True)
         response_data = paginator.get_paginated_response(serializer.data).data
@@ -85,25 +175,148 @@ class MessageHistoryView(APIView):
         return Response(response_data)
 
 
+async def authenticate_async(request, allow_query_token=False):
+    """JWT authentication for the plain async views (DRF views are sync only).
+
+    ``allow_query_token`` also accepts the token as ``?token=``, for clients
+    that cannot set an Authorization header.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        if header:
+            raw_token = authentication.get_raw_token(header)
+        else:
+            raw_token = request.GET.get('token') if allow_query_token else None
+        if not raw_token:
+            return None
+        validated_token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class MessageEventsView(View):
+    """Server-sent events with status changes of the user's communications.
+
+    EventSource cannot set headers, so the access token may also be passed
+    as ``?token=``. Needs an ASGI server; each open stream holds one pub/sub
+    subscription and no database connection.
+    """
+    retry_ms = 3000
+
+    async def get(self, request):
+        user = await authenticate_async(request, allow_query_token=True)
+        if user is None:
+            return JsonResponse({
+                "error": "Valid access token required"
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        response = StreamingHttpResponse(self.stream(user.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, user_id):
+        yield f'retry: {self.retry_ms}\n\n'
+        async with aclosing(subscribe(user_id, settings.EVENTS_HEARTBEAT_SECONDS)) as updates:
+            async for events in updates:
+                if events is None:
+                    yield ': keepalive\n\n'
+                    continue
+                for event in events:
+                    yield f'event: status\ndata: {json.dumps(event)}\n\n'
+
+
+class CommunicationStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    max_days = 366
+
+    def get(self, request):
+        params = request.query_params
+        dates = dict(zip(('start', 'end'), default_range()))
+        for param in dates:
+            if not params.get(param):
+                continue
+            try:
+                dates[param] = parse_date(params[param])
+            except ValueError:
+                dates[param] = None
+            if dates[param] is None:
+                return Response({
+                    "error": f"{param} must be a valid date (YYYY-MM-DD)"
+                }, status=status.HTTP_400_BAD_REQUEST)
+        start, end = dates['start'], dates['end']
+        if start > end:
+            return Response({
+                "error": "start must not be after end"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= self.max_days:
+            return Response({
+                "error": f"Date range is limited to {self.max_days} days"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        message_type = params.get('type') or None
+        if message_type not in [None, Communication.EMAIL, Communication.WHATSAPP]:
+            return Response({
+                "error": f"type must be {Communication.EMAIL} or {Communication.WHATSAPP}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Staff can look at another user (?user=<id>) or everyone (?user=all)
+        user_id = request.user.id
+        requested_user = params.get('user')
+        if requested_user:
+            if requested_user != 'all' and not requested_user.isdigit():
+                return Response({
+                    "error": "user must be a user id or 'all'"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            requested_id = None if requested_user == 'all' else int(requested_user)
+            if requested_id != user_id and not request.user.is_staff:
+                return Response({
+                    "error": "Only staff can view other users' stats"
+                }, status=status.HTTP_403_FORBIDDEN)
+            user_id = requested_id
+
+        return Response(communication_stats(user_id, start, end, message_type))
+
+
 class BusinessViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = BusinessSerializer
     queryset = Business.objects.prefetch_related('social_profiles').all()
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    def list(self, request, *args, **kwargs):
+        paginator = BusinessPagination()
+        query = request.query_params.get('q', '').strip()
+        
+        if query:
+            queryset = search_businesses(self.get_queryset(), query)
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = BusinessSearchResultSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
+        # Businesses are global, so pages are shared by every user and kept
+        # as rendered JSON; any Business/SocialMediaProfile write bumps the
+        # version and orphans them.
+        page_number = request.query_params.get(paginator.page_query_param, '1')
+        cache_key = None
+        if page_number.isdigit():
+            cache_key = (
+                f'business_list_{get_business_list_version()}_'
+                f'{page_number}_{paginator.get_page_size(request)}'
+            )
+            cached_body = cache.get(cache_key)
+            if cached_body is not None:
+                return HttpResponse(cached_body, content_type='application/json')
         
-        if self.action == 'list':
-            cache_key = f'business_list_{self.request.user.id}'
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is None:
-                cached_data = list(queryset)
-                cache.set(cache_key, cached_data, CACHE_TTL)
-            
-            return cached_data
+        page = paginator.paginate_queryset(self.get_queryset().order_by('id'), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        body = JSONRenderer().render(paginator.get_paginated_response(serializer.data).data)
+        
+        if cache_key:
+            cache.set(cache_key, body, CACHE_TTL)
         
-        return queryset
+        return HttpResponse(body, content_type='application/json')
 
     @action(detail=False, methods=['post'])
     def search(self, request):
@@ -116,22 +329,52 @@ class BusinessViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cache_key = f'business_search_{query}_{location}'
+        cache_key = business_search_cache_key(query, location)
         cached_result = cache.get(cache_key)
         
         if cached_result:
             return Response(cached_result)
         
-        task = search_business.delay(query, location)
+        inflight_key = business_search_inflight_key(query, location)
+        task_id = cache.get(inflight_key)
         
-        response_data = {
-            "message": "Business search initiated",
-            "task_id": task.id
-        }
+        if task_id:
+            task_result = AsyncResult(task_id, app=celery_app)
+            if not task_result.ready():
+                return Response({
+                    "message": "Business search in progress",
+                    "task_id": task_id
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            payload = task_result.result if task_result.successful() else None
+            if isinstance(payload, dict) and payload.get("status") == "success":
+                response_data = {
+                    "status": "success",
+                    "businesses": load_search_results(payload.get("place_ids", [])),
+                    "place_ids": payload.get("place_ids", [])
+                }
+                cache.set(cache_key, response_data, SEARCH_CACHE_TTL)
+                cache.delete(inflight_key)
+                return Response(response_data)
+            
+            # The previous search failed; let this request dispatch a new one
+            cache.delete(inflight_key)
         
-        cache.set(cache_key, response_data, 300)
+        # Single flight: only the request that claims the key dispatches the
+        # task, concurrent identical searches get the same task ID back.
+        task_id = str(uuid.uuid4())
+        if not cache.add(inflight_key, task_id, SEARCH_INFLIGHT_TTL):
+            return Response({
+                "message": "Business search in progress",
+                "task_id": cache.get(inflight_key)
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        search_business.apply_async(args=[query, location], task_id=task_id)
         
-        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+        return Response({
+            "message": "Business search initiated",
+            "task_id": task_id
+        }, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'])
     def verify_social_profiles(self, request, pk=None):
@@ -284,6 +527,16 @@ class EmailView(APIView):
         )
 
 
+def bulk_request_error(data):
+    if not all([data.get('type'), data.get('recipients'), data.get('content')]):
+        return "type, recipients, and content are required"
+    if not isinstance(data.get('recipients'), list):
+        return "recipients must be a list"
+    if data.get('type') not in [Communication.EMAIL, Communication.WHATSAPP]:
+        return "Invalid message type"
+    return None
+
+
 class BulkMessageView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -293,19 +546,10 @@ class BulkMessageView(APIView):
         content = request.data.get('content')
         subject = request.data.get('subject')
         
-        if not all([message_type, recipients, content]):
-            return Response({
-                "error": "type, recipients, and content are required"
-            }, status=status.HTTP_400_BAD_REQUEST)
-            
-        if not isinstance(recipients, list):
+        error = bulk_request_error(request.data)
+        if error:
             return Response({
-                "error": "recipients must be a list"
-            }, status=status.HTTP_400_BAD_REQUEST)
-            
-        if message_type not in [Communication.EMAIL, Communication.WHATSAPP]:
-            return Response({
-                "error": "Invalid message type"
+                "error": error
             }, status=status.HTTP_400_BAD_REQUEST)
             
         task = bulk_message_send.delay(
@@ -323,6 +567,160 @@ class BulkMessageView(APIView):
         }, status=status.HTTP_202_ACCEPTED)
 
 
+class AsyncSendView(View, ABC):
+    """Base of the async send endpoints, served through config/asgi.py.
+
+    Does what DRF does for the sync views (JWT auth, throttling, JSON body)
+    without holding a thread for the request: the ORM calls use the async
+    API and the broker publish runs on the publisher pool.
+    """
+    http_method_names = ['post']
+    throttle_classes = [UserRateThrottle]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated API like the DRF views, so no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def post(self, request):
+        request.user = await authenticate_async(request)
+        if request.user is None:
+            return JsonResponse({
+                "detail": "Authentication credentials were not provided."
+            }, status=status.HTTP_401_UNAUTHORIZED)
+
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not await allow_request_async(throttle, request):
+                return JsonResponse({
+                    "detail": f"Request was throttled. Expected available in {int(throttle.wait() or 0)} seconds."
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({
+                "success": False,
+                "error": "Request body must be JSON"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            data = {}
+
+        return await self.send(request, data)
+
+    @abstractmethod
+    async def send(self, request, data):
+        """Handles the authenticated, throttled JSON body; returns the response."""
+
+
+class AsyncEmailView(AsyncSendView):
+    throttle_classes = [EmailRateThrottle]
+
+    async def send(self, request, data):
+        serializer = EmailMessageSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(
+                {"success": False, "error": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        comm = await Communication.objects.acreate(
+            user=request.user,
+            type=Communication.EMAIL,
+            status="pending",
+            recipient=serializer.validated_data["to"],
+            subject=serializer.validated_data["subject"],
+            content=serializer.validated_data["message"]
+        )
+
+        task = await apply_task(
+            send_email_async,
+            to_email=serializer.validated_data["to"],
+            subject=serializer.validated_data["subject"],
+            message=serializer.validated_data["message"],
+            user_id=request.user.id,
+            comm_id=comm.id
+        )
+
+        return JsonResponse(
+            {
+                "success": True,
+                "data": {
+                    "message": "Email queued for delivery",
+                    "task_id": task.id,
+                },
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AsyncWhatsAppView(AsyncSendView):
+    throttle_classes = [WhatsAppRateThrottle]
+
+    async def send(self, request, data):
+        serializer = WhatsAppMessageSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(
+                {"success": False, "error": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        comm = await Communication.objects.acreate(
+            user=request.user,
+            type=Communication.WHATSAPP,
+            status="pending",
+            recipient=serializer.validated_data["to"],
+            content=serializer.validated_data.get("message", "hello_world template")
+        )
+
+        task_kwargs = {
+            'to_number': serializer.validated_data["to"],
+            'message_type': serializer.validated_data["message_type"],
+            'user_id': request.user.id,
+            'comm_id': comm.id
+        }
+
+        if serializer.validated_data["message_type"] == "text":
+            task_kwargs['message'] = serializer.validated_data["message"]
+
+        task = await apply_task(send_whatsapp_async, **task_kwargs)
+
+        return JsonResponse(
+            {
+                "success": True,
+                "data": {
+                    "message": "WhatsApp message queued for delivery",
+                    "task_id": task.id,
+                },
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AsyncBulkMessageView(AsyncSendView):
+    async def send(self, request, data):
+        error = bulk_request_error(data)
+        if error:
+            return JsonResponse({
+                "error": error
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        task = await apply_task(
+            bulk_message_send,
+            message_type=data['type'],
+            recipients=data['recipients'],
+            content=data['content'],
+            subject=data.get('subject'),
+            user_id=request.user.id
+        )
+
+        return JsonResponse({
+            "message": f"Bulk {data['type']} send initiated",
+            "task_id": task.id,
+            "recipient_count": len(data['recipients'])
+        }, status=status.HTTP_202_ACCEPTED)
+
+
 class SocialAPIConfigViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     serializer_class = SocialAPIConfigSerializer
@@ -355,54 +753,83 @@ class SocialAPIConfigViewSet(viewsets.ModelViewSet):
 
 
 class MessageQueueView(APIView):
+    """Admin view of the queue.
+
+    GET lists rows a page at a time (``?cursor=`` from ``next``), or with
+    ``?summary=1`` returns counts by status, priority and account instead.
+    Filters: status (default queued when listing, all in summary mode),
+    type, priority, smtp_server, whatsapp_account, scheduled_after and
+    scheduled_before (ISO 8601).
+    """
     permission_classes = [permissions.IsAdminUser]
-    
+    pagination_class = MessageQueuePagination
+
     def get(self, request):
-        status_filter = request.query_params.get('status', 'queued')
-        message_type = request.query_params.get('type')
-        
-        cache_key = f'message_queue_{status_filter}_{message_type}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data)
-        
-        queryset = MessageQueue.objects.filter(
-            communication__status=status_filter
-        ).select_related(
-            'communication',
-            'communication__user',
-            'smtp_server',
-            'whatsapp_account'
+        params = request.query_params
+        summary = params.get('summary') in ('1', 'true')
+        queryset = MessageQueue.objects.all()
+
+        status_filter = params.get('status', None if summary else MessageQueue.QUEUED)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        if params.get('type'):
+            queryset = queryset.filter(communication__type=params['type'])
+
+        for param, lookup in (('priority', 'priority'), ('smtp_server', 'smtp_server_id'),
+                              ('whatsapp_account', 'whatsapp_account_id')):
+            value = params.get(param)
+            if value is None:
+                continue
+            if not value.lstrip('-').isdigit():
+                return Response({
+                    "error": f"{param} must be an integer"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookup: int(value)})
+
+        for param, lookup in (('scheduled_after', 'scheduled_time__gte'), ('scheduled_before', 'scheduled_time__lt')):
+            if not params.get(param):
+                continue
+            try:
+                moment = parse_datetime(params[param])
+            except ValueError:
+                moment = None
+            if moment is None:
+                return Response({
+                    "error": f"{param} must be an ISO 8601 datetime"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            queryset = queryset.filter(**{lookup: moment})
+
+        if summary:
+            return Response(queue_summary(queryset))
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            queryset.select_related('communication').only(*MessageQueueListSerializer.columns),
+            request,
+            view=self
         )
-        
-        if message_type:
-            queryset = queryset.filter(communication__type=message_type)
-        
-        serializer = MessageQueueSerializer(queryset, many=True)
-        response_data = serializer.data
-        
-        cache.set(cache_key, response_data, 60)
-        
-        return Response(response_data)
+        serializer = MessageQueueListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         action = request.data.get('action', 'process')
         
         if action == 'process':
             task = process_message_queue_task.delay()
-            message = "Queue processing initiated"
+            return Response({
+                "message": "Queue processing initiated",
+                "task_id": task.id
+            }, status=status.HTTP_202_ACCEPTED)
         elif action == 'clear':
-            MessageQueue.objects.filter(
-                locked_at__lt=timezone.now() - timedelta(minutes=30)
-            ).update(locked_at=None, locked_by=None)
-            message = "Cleared stuck messages"
-        else:
+            # Same as the periodic reaper, on demand
             return Response({
-                "error": "Invalid action"
-            }, status=status.HTTP_400_BAD_REQUEST)
+                "message": "Cleared stuck messages",
+                "task_id": None,
+                **reap_stuck_messages()
+            }, status=status.HTTP_202_ACCEPTED)
         
         return Response({
-            "message": message,
-            "task_id": task.id if action == 'process' else None
-        }, status=status.HTTP_202_ACCEPTED)
\ No newline at end of file
+            "error": "Invalid action"
+        }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
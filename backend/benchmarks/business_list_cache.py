@@ -0,0 +1,144 @@
+"""Memory and latency of the BusinessViewSet.list cache.
+
+Compares the previous strategy (the whole prefetched queryset pickled per
+user, re-serialized on every hit) with the shared cache of rendered JSON
+pages, on a throwaway database seeded with N businesses.
+
+    python -m benchmarks.business_list_cache --businesses 100000 --users 10
+"""
+import argparse
+import os
+import pickle
+import statistics
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.communications.models import Business, SocialMediaProfile  # noqa: E402
+from apps.communications.serializers import BusinessSerializer  # noqa: E402
+
+
+def seed(count):
+    batch = 5000
+    for start in range(0, count, batch):
+        businesses = Business.objects.bulk_create([
+            Business(
+                name=f"Business {i}",
+                address=f"{i} Benchmark Avenue",
+                phone_number=f"+1555{i:07d}",
+                website=f"https://example.test/{i}",
+                category="establishment, point_of_interest",
+                google_maps_link=f"https://maps.google.com/?cid={i}",
+                google_place_id=f"bench-{i}",
+            )
+            for i in range(start, min(start + batch, count))
+        ])
+        SocialMediaProfile.objects.bulk_create([
+            SocialMediaProfile(
+                business=business,
+                platform="facebook",
+                profile_url=f"https://facebook.com/{business.google_place_id}",
+            )
+            for business in businesses
+        ])
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def legacy(users, repeat):
+    queryset = Business.objects.prefetch_related("social_profiles").all()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    cached = pickle.dumps(list(queryset))
+    miss_ms = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def hit():
+        JSONRenderer().render(BusinessSerializer(pickle.loads(cached), many=True).data)
+
+    return {
+        "cache_bytes": len(cached) * users,
+        "miss_ms": miss_ms,
+        "hit_ms": timed(hit, repeat),
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def paged(users, repeat, pages):
+    user_model = get_user_model()
+    clients = []
+    for i in range(users):
+        client = APIClient()
+        client.force_authenticate(user=user_model.objects.create_user(
+            username=f"bench{i}", email=f"bench{i}@example.test", password="bench"
+        ))
+        clients.append(client)
+
+    url = reverse("communications:business-list")
+    cache.clear()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    bodies = [clients[0].get(url, {"page": page}).content for page in range(1, pages + 1)]
+    miss_ms = (time.perf_counter() - started) * 1000 / pages
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def hit():
+        for client in clients:
+            client.get(url, {"page": 1})
+
+    return {
+        "cache_bytes": sum(len(body) for body in bodies),
+        "miss_ms": miss_ms,
+        "hit_ms": timed(hit, repeat) / users,
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--businesses", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=5, help="Distinct pages requested in the paged run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        seed(args.businesses)
+        results = {
+            "per-user queryset": legacy(args.users, args.repeat),
+            "shared JSON pages": paged(args.users, args.repeat, args.pages),
+        }
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    print(f"{args.businesses} businesses, {args.users} users")
+    print(f"{'strategy':<20}{'cache MiB':>11}{'miss ms':>11}{'hit ms':>10}{'peak MiB':>10}")
+    for label, r in results.items():
+        print(f"{label:<20}{r['cache_bytes'] / 2 ** 20:>11.2f}{r['miss_ms']:>11.1f}{r['hit_ms']:>10.2f}{r['peak_mib']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
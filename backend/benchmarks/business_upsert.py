@@ -0,0 +1,92 @@
+"""Benchmark for persisting ``search_business`` results.
+
+Runs the ``search_business`` task against a local stub Places API and compares
+its batched upsert with the previous per-place ``update_or_create`` loop, for a
+first search (inserts) and a repeated search (updates).
+
+    python -m benchmarks.business_upsert --places 20 100 500
+"""
+import argparse
+import os
+import time
+from unittest.mock import patch
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    setup_databases,
+    teardown_databases,
+)
+
+from apps.communications.models import Business  # noqa: E402
+from apps.communications.tasks import search_business  # noqa: E402
+from benchmarks.stubs import StubPlacesService  # noqa: E402
+
+
+def legacy_search(service, query, location):
+    response = service.places().searchText(body={"textQuery": f"{query} in {location}"}).execute()
+    for place in response.get("places", []):
+        business_data = {
+            "name": place.get("name"),
+            "address": place.get("formattedAddress"),
+            "phone_number": place.get("phoneNumber", ""),
+            "website": place.get("websiteUri", ""),
+            "category": ", ".join(place.get("types", [])),
+            "google_maps_link": place.get("googleMapsUri", ""),
+            "google_place_id": place.get("placeId"),
+        }
+        Business.objects.update_or_create(
+            google_place_id=business_data["google_place_id"],
+            defaults=business_data,
+        )
+
+
+def measure(fn):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    return elapsed * 1000, len(ctx.captured_queries)
+
+
+def bench(service):
+    places = service.places_per_search
+    rows = []
+
+    for label, run in (
+        ("update_or_create", lambda q: legacy_search(service, q, "Legacy")),
+        ("bulk upsert", lambda q: search_business(q, "Batched")),
+    ):
+        Business.objects.all().delete()
+        cache.clear()
+        insert_ms, insert_queries = measure(lambda: run("coffee"))
+        update_ms, update_queries = measure(lambda: run("coffee"))
+        rows.append((label, places, insert_ms, insert_queries, update_ms, update_queries))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, nargs="+", default=[20, 100, 500])
+    args = parser.parse_args()
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        print(f"{'strategy':<18}{'places':>8}{'insert ms':>12}{'queries':>9}{'update ms':>12}{'queries':>9}")
+        for places in args.places:
+            service = StubPlacesService(places_per_search=places)
+            with patch("apps.communications.tasks.get_places_service", return_value=service):
+                for row in bench(service):
+                    print(f"{row[0]:<18}{row[1]:>8}{row[2]:>12.1f}{row[3]:>9}{row[4]:>12.1f}{row[5]:>9}")
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Latency of the communication stats endpoint.
+
+Seeds a rollup equivalent to --rollup-messages sent over a year by --users
+users (one row per user, day, channel and account) and times GET /stats/ for
+one user's last 30 days and for all users. For comparison, the same 30-day
+breakdown is computed with COUNT(*) over --messages Communication rows.
+
+    python -m benchmarks.communication_stats --users 50 --accounts 5 --messages 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.db.models.functions import TruncDate  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.communications.models import Communication, CommunicationDailyStats  # noqa: E402
+
+CHANNELS = (Communication.EMAIL, Communication.WHATSAPP)
+
+
+def seed_rollup(users, accounts, days, messages):
+    today = timezone.localdate()
+    per_row = max(1, messages // (len(users) * accounts * days * len(CHANNELS)))
+    rows = (
+        CommunicationDailyStats(
+            day=today - timedelta(days=day),
+            user=user,
+            type=channel,
+            account_id=account,
+            sent=per_row,
+            failed=per_row // 50
+        )
+        for user in users
+        for day in range(days)
+        for channel in CHANNELS
+        for account in range(1, accounts + 1)
+    )
+    CommunicationDailyStats.objects.bulk_create(rows, batch_size=5000)
+    return CommunicationDailyStats.objects.count()
+
+
+def seed_messages(users, count):
+    now = timezone.now()
+    batch = 5000
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        communications = Communication.objects.bulk_create([
+            Communication(
+                user=random.choice(users),
+                type=random.choice(CHANNELS),
+                status="sent" if random.random() > 0.02 else "failed",
+                recipient=f"user{start + i}@example.test",
+                content="Benchmark",
+                sent_at=now
+            )
+            for i in range(size)
+        ])
+        # Spread over the last year
+        for comm in communications:
+            comm.created_at = now - timedelta(minutes=random.randrange(365 * 24 * 60))
+        Communication.objects.bulk_update(communications, ["created_at"])
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--accounts", type=int, default=5, help="Accounts per channel")
+    parser.add_argument("--rollup-messages", type=int, default=10_000_000)
+    parser.add_argument("--messages", type=int, default=200_000, help="Communication rows for the COUNT(*) baseline")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user_model = get_user_model()
+        users = user_model.objects.bulk_create([
+            user_model(username=f"bench{i}", email=f"bench{i}@example.test")
+            for i in range(args.users)
+        ])
+        admin = user_model.objects.create_superuser(username="benchadmin", email="admin@example.test", password="bench")
+        rollup_rows = seed_rollup(users, args.accounts, 365, args.rollup_messages)
+        seed_messages(users, args.messages)
+
+        user_client = APIClient()
+        user_client.force_authenticate(user=users[0])
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=admin)
+        url = reverse("communications:communication-stats")
+        start = timezone.now() - timedelta(days=30)
+
+        def count_star():
+            list(
+                Communication.objects.filter(user=users[0], created_at__gte=start, status__in=["sent", "failed"])
+                .values("type", "status", day=TruncDate("created_at"))
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+
+        results = {
+            "rollup, one user": timed(lambda: user_client.get(url), args.repeat),
+            "rollup, all users": timed(lambda: admin_client.get(url, {"user": "all"}), args.repeat),
+            "COUNT(*), one user": timed(count_star, args.repeat),
+        }
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    print(f"{rollup_rows} rollup rows for {args.rollup_messages} messages; {args.messages} Communication rows")
+    for label, ms in results.items():
+        print(f"{label:<22}{ms:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""CPU and memory to build and serialize a bulk email batch.
+
+Compares one ``EmailMessage`` rendered per recipient (the old
+``process_email_batch``) with ``build_batch_emails``: the shared MIME
+template per distinct subject/body, and optionally BCC groups of
+--group-sizes recipients per SMTP transaction. Every message is serialized
+the way Django's SMTP backend does it, without a server; --smtp also sends
+the batch to a local sink SMTP server for wall time.
+
+    python -m benchmarks.email_batch --messages 10000 --contents 1 --group-sizes 50 500
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.mail import EmailMessage, get_connection  # noqa: E402
+from django.core.mail.message import sanitize_address  # noqa: E402
+
+from apps.communications.mime import build_batch_emails  # noqa: E402
+from apps.communications.models import Communication  # noqa: E402
+from benchmarks.stubs import SinkSMTPServer  # noqa: E402
+
+
+def make_messages(count, contents, body_kib):
+    bodies = [
+        f"Hello,\n\nCampaign {i} news.\n\n" + "Lorem ipsum dolor sit amet. " * max(1, body_kib * 1024 // 28)
+        for i in range(contents)
+    ]
+    return [
+        Communication(
+            type=Communication.EMAIL,
+            recipient=f"user{i}@example.test",
+            subject=f"Campaign {i % contents}",
+            content=bodies[i % contents],
+        )
+        for i in range(count)
+    ]
+
+
+def per_recipient_emails(messages, connection=None):
+    return [
+        EmailMessage(
+            subject=message.subject,
+            body=message.content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[message.recipient],
+            connection=connection,
+        )
+        for message in messages
+    ]
+
+
+def serialize(emails):
+    # What EmailBackend._send does for each message, minus the socket
+    size = 0
+    for email in emails:
+        encoding = email.encoding or settings.DEFAULT_CHARSET
+        sanitize_address(email.from_email, encoding)
+        [sanitize_address(addr, encoding) for addr in email.recipients()]
+        size += len(email.message().as_bytes(linesep="\r\n"))
+    return size
+
+
+def measure(build, messages):
+    # Timed and traced in separate passes: tracemalloc slows allocation down
+    started = time.process_time()
+    emails = build(messages)
+    size = serialize(emails)
+    cpu = time.process_time() - started
+    transactions = len(emails)
+    del emails
+
+    tracemalloc.start()
+    serialize(build(messages))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"transactions": transactions, "bytes": size, "cpu_s": cpu, "peak_mib": peak / 2**20}
+
+
+def send(build, messages, sink):
+    connection = get_connection(
+        "django.core.mail.backends.smtp.EmailBackend", host=sink.host, port=sink.port, use_tls=False
+    )
+    started = time.perf_counter()
+    with connection:
+        connection.send_messages(build(messages, connection))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--contents", type=int, default=1, help="Distinct subject/body pairs in the batch")
+    parser.add_argument("--body-kib", type=int, default=4)
+    parser.add_argument("--group-sizes", type=int, nargs="*", default=[50])
+    parser.add_argument("--smtp", action="store_true", help="Also send each variant to a sink SMTP server")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.contents, args.body_kib)
+    variants = [
+        ("per-recipient EmailMessage", per_recipient_emails),
+        ("shared MIME template", lambda batch, connection=None: build_batch_emails(batch, connection, 1)),
+    ] + [
+        (f"template + BCC groups of {size}",
+         lambda batch, connection=None, size=size: build_batch_emails(batch, connection, size))
+        for size in args.group_sizes
+    ]
+
+    per_10k = 10000 / args.messages
+    print(f"{args.messages} messages, {args.contents} distinct contents, {args.body_kib} KiB bodies")
+    header = f"{'variant':<32}{'SMTP txns':>10}{'MiB out':>9}{'CPU s/10k':>11}{'peak MiB':>10}"
+    print(header + ("{:>10}".format("send s") if args.smtp else ""))
+    for name, build in variants:
+        result = measure(build, messages)
+        line = (f"{name:<32}{result['transactions']:>10}{result['bytes'] / 2**20:>9.1f}"
+                f"{result['cpu_s'] * per_10k:>11.2f}{result['peak_mib']:>10.1f}")
+        if args.smtp:
+            with SinkSMTPServer() as sink:
+                line += f"{send(build, messages, sink):>10.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
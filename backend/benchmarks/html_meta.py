@@ -0,0 +1,93 @@
+"""Profile page metadata extraction microbenchmark.
+
+Compares the old full-page ``BeautifulSoup(html, 'html.parser')`` parse with
+the head-only ``extract_meta`` extractor (``html.parser`` and, when
+installed, lxml) on a synthetic social profile page.
+
+    python -m benchmarks.html_meta
+    python -m benchmarks.html_meta --head-kib 200 --body-kib 2048 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from apps.communications.html_meta import etree, extract_meta  # noqa: E402
+
+
+def build_page(head_kib, body_kib):
+    # Social pages typically carry a large inline JSON blob in <head>
+    blob = json.dumps({"items": ["x" * 64] * max(1, head_kib * 1024 // 70)})
+    head = (
+        "<head><meta charset=\"utf-8\"><title>Example Business | Facebook</title>"
+        "<meta name=\"description\" content=\"Example business profile\">"
+        "<meta property=\"og:title\" content=\"Example Business\">"
+        "<meta property=\"og:image\" content=\"https://cdn.example.test/logo.png\">"
+        f"<script type=\"application/json\">{blob}</script></head>"
+    )
+    row = "<div class=\"post\"><a href=\"/p/1\">post</a><span>" + "y" * 200 + "</span></div>"
+    body = "<body>" + row * max(1, body_kib * 1024 // len(row)) + "</body>"
+    return f"<!DOCTYPE html><html>{head}{body}</html>".encode("utf-8")
+
+
+def bs4_full(raw):
+    soup = BeautifulSoup(raw.decode("utf-8"), "html.parser")
+    title = soup.title.string if soup.title else ""
+    meta_desc = soup.find("meta", {"name": "description"})
+    return title, meta_desc.get("content", "") if meta_desc else ""
+
+
+def measure(func, raw, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(raw)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(timings), "min_ms": min(timings)}
+
+
+def run(args):
+    raw = build_page(args.head_kib, args.body_kib)
+    head = raw[:raw.index(b"</head>")]
+    candidates = {
+        "bs4 full page": lambda doc: bs4_full(doc),
+        "bs4 head only": lambda doc: bs4_full(doc[:doc.index(b"</head>")]),
+        "extract_meta html.parser": lambda doc: extract_meta(doc, "utf-8", use_lxml=False),
+    }
+    if etree is not None:
+        candidates["extract_meta lxml"] = lambda doc: extract_meta(doc, "utf-8", use_lxml=True)
+
+    results = {name: measure(func, raw, args.repeat) for name, func in candidates.items()}
+    return {"document_kib": len(raw) / 1024, "head_kib": len(head) / 1024, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--head-kib", type=int, default=64, help="Size of the inline JSON in <head>")
+    parser.add_argument("--body-kib", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Document: {report['document_kib']:.0f} KiB, head {report['head_kib']:.0f} KiB")
+    baseline = report["results"]["bs4 full page"]["median_ms"]
+    for name, timing in report["results"].items():
+        print(f"{name:<26} {timing['median_ms']:9.2f} ms median "
+              f"{timing['min_ms']:9.2f} ms min  {baseline / timing['median_ms']:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
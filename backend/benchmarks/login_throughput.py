@@ -0,0 +1,122 @@
+"""Login throughput per core.
+
+Posts --logins successful logins to /api/auth/login/ from each of the
+--workers thread counts and reports logins per second, per core used, and
+the p50/p99 latency. A bare check_password loop gives the hashing ceiling
+for one core. The GeoIP lookup is stubbed (with --geoip-latency seconds of
+delay) and cached per IP as in production.
+
+    python -m benchmarks.login_throughput --users 20 --logins 200 --workers 1 2 4
+
+A throwaway SQLite file database is created for the run, so the configured
+database is never touched.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import check_password  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fake_geoip(latency):
+    def get(url, **kwargs):
+        time.sleep(latency)
+        return MagicMock(status_code=200, json=MagicMock(return_value={"country_code": "US"}))
+    return get
+
+
+def run_logins(users, logins, workers):
+    url = reverse("authentication:login")
+
+    def login(i):
+        user = users[i % len(users)]
+        started = time.perf_counter()
+        response = Client().post(
+            url, {"email": user.email, "password": PASSWORD}, REMOTE_ADDR=f"198.51.100.{i % len(users)}"
+        )
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(login, range(logins)))
+    return results, time.perf_counter() - started
+
+
+def hash_ceiling(encoded, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        check_password(PASSWORD, encoded)
+    return repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200, help="Logins per worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--geoip-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # Concurrent writers need a real file and a busy timeout rather than the
+    # shared-cache in-memory test database
+    workdir = tempfile.TemporaryDirectory()
+    database = settings.DATABASES["default"]
+    database["TEST"]["NAME"] = os.path.join(workdir.name, "bench.sqlite3")
+    database["OPTIONS"]["timeout"] = 30
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user_model = get_user_model()
+        users = [
+            user_model.objects.create_user(username=f"bench{i}", email=f"bench{i}@example.test", password=PASSWORD)
+            for i in range(args.users)
+        ]
+        ceiling = hash_ceiling(users[0].password, 20)
+
+        rows = []
+        with patch("apps.authentication.utils.requests.get", side_effect=fake_geoip(args.geoip_latency)):
+            for workers in args.workers:
+                cache.clear()
+                results, seconds = run_logins(users, args.logins, workers)
+                latencies = [elapsed for code, elapsed in results if code == 200]
+                cores = min(workers, settings.PASSWORD_HASH_WORKERS, os.cpu_count() or 1)
+                rows.append((workers, len(latencies), len(results) - len(latencies), len(results) / seconds,
+                             len(results) / seconds / cores, percentile(latencies, 50) * 1000,
+                             percentile(latencies, 99) * 1000))
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        workdir.cleanup()
+
+    print(f"{os.cpu_count()} CPUs, PASSWORD_HASH_WORKERS={settings.PASSWORD_HASH_WORKERS}; "
+          f"check_password ceiling {ceiling:.1f}/s on one core")
+    print(f"{'workers':>8}{'ok':>6}{'errors':>8}{'logins/s':>10}{'per core':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers, ok, errors, rate, per_core, p50, p99 in rows:
+        print(f"{workers:>8}{ok:>6}{errors:>8}{rate:>10.1f}{per_core:>10.1f}{p50:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Query-count, wall-time and allocation budgets for hot code paths.
+
+``profile()`` measures a block; ``BudgetTestMixin.assertWithinBudget`` runs a
+scenario at every configured data size and compares the measurements with the
+committed budget in ``benchmarks/budgets/<scenario>.json``.
+
+A budget is linear in the data size, ``base + per_item * size``, for each of
+``queries``, ``wall_ms`` and ``peak_kib``. A constant-query endpoint has
+``per_item == 0`` for queries, so an N+1 regression fails at the larger size.
+Budget files hold only those limits and the headroom (``tolerance``) applied
+to the measurements they were fitted from; every run prints what it measured.
+
+Environment:
+    QUERY_BUDGET_SIZES    comma-separated data sizes (default "1,20")
+    UPDATE_QUERY_BUDGETS  set to 1 to rewrite budget files from measurements
+"""
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+BUDGET_DIR = Path(__file__).resolve().parent / "budgets"
+DEFAULT_SIZES = (1, 20)
+
+# Timing and allocation vary between machines, queries do not.
+WALL_HEADROOM = 5.0
+WALL_FLOOR_MS = 500.0
+ALLOC_HEADROOM = 2.0
+ALLOC_FLOOR_KIB = 1024.0
+METRICS = ("queries", "wall_ms", "peak_kib")
+
+
+def budget_sizes():
+    raw = os.getenv("QUERY_BUDGET_SIZES")
+    if not raw:
+        return DEFAULT_SIZES
+    return tuple(sorted({int(size) for size in raw.split(",") if size.strip()}))
+
+
+def updating_budgets():
+    return os.getenv("UPDATE_QUERY_BUDGETS") == "1"
+
+
+class Profile:
+    def __init__(self):
+        self.queries = 0
+        self.wall_ms = 0.0
+        self.peak_kib = 0.0
+        self.sql = []
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "wall_ms": round(self.wall_ms, 3),
+            "peak_kib": round(self.peak_kib, 1),
+        }
+
+
+@contextmanager
+def profile():
+    result = Profile()
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            yield result
+            result.wall_ms = (time.perf_counter() - started) * 1000
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if not already_tracing:
+            tracemalloc.stop()
+    result.peak_kib = max(0, peak - baseline) / 1024
+    result.sql = [query["sql"] for query in ctx.captured_queries]
+    result.queries = len(result.sql)
+
+
+def budget_path(scenario):
+    return BUDGET_DIR / f"{scenario}.json"
+
+
+def load_budget(scenario):
+    path = budget_path(scenario)
+    if not path.exists():
+        return None
+    with path.open() as fh:
+        return json.load(fh)
+
+
+def allowed(budget, metric, size):
+    limit = budget[metric]
+    return limit["base"] + limit["per_item"] * size
+
+
+def fit_budget(measurements):
+    sizes = sorted(measurements)
+    budget = {}
+    for metric in METRICS:
+        points = [(size, measurements[size][metric]) for size in sizes]
+        per_item = 0.0
+        for (s1, v1), (s2, v2) in zip(points, points[1:]):
+            per_item = max(per_item, (v2 - v1) / (s2 - s1))
+        base = max(value - per_item * size for size, value in points)
+
+        if metric == "queries":
+            per_item = math.ceil(per_item * 100) / 100
+            base = math.ceil(base)
+        elif metric == "wall_ms":
+            per_item = round(per_item * WALL_HEADROOM, 3)
+            base = round(max(base * WALL_HEADROOM, WALL_FLOOR_MS), 1)
+        else:
+            per_item = round(per_item * ALLOC_HEADROOM, 1)
+            base = round(max(base * ALLOC_HEADROOM, ALLOC_FLOOR_KIB), 1)
+        budget[metric] = {"base": base, "per_item": per_item}
+    return budget
+
+
+def save_budget(scenario, budget):
+    BUDGET_DIR.mkdir(parents=True, exist_ok=True)
+    data = dict(budget)
+    data["tolerance"] = {"wall_ms": WALL_HEADROOM, "peak_kib": ALLOC_HEADROOM}
+    with budget_path(scenario).open("w") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+class BudgetTestMixin:
+    """Mix into a ``django.test.TestCase``.
+
+    ``setup(size)`` creates the data for one size and returns whatever
+    ``run(context)`` needs; only ``run`` is measured. Each size is rolled back
+    before the next, so scenarios see exactly the data they created.
+    """
+
+    def measure_scenario(self, setup, run):
+        measurements = {}
+        for size in budget_sizes():
+            sid = transaction.savepoint()
+            try:
+                cache.clear()
+                context = setup(size)
+                with profile() as result:
+                    run(context)
+            finally:
+                transaction.savepoint_rollback(sid)
+                cache.clear()
+            measurements[size] = result
+        return measurements
+
+    def report(self, scenario, measurements):
+        sizes = "; ".join(
+            f"size {size}: {m['queries']} queries, {m['wall_ms']:.1f} ms, {m['peak_kib']:.1f} KiB"
+            for size, m in sorted(measurements.items())
+        )
+        sys.stderr.write(f"\n[budget] {scenario}: {sizes}")
+
+    def assertWithinBudget(self, scenario, setup, run):
+        profiles = self.measure_scenario(setup, run)
+        measurements = {size: result.as_dict() for size, result in profiles.items()}
+        self.report(scenario, measurements)
+
+        if updating_budgets():
+            save_budget(scenario, fit_budget(measurements))
+            return
+
+        budget = load_budget(scenario)
+        if budget is None:
+            self.fail(
+                f"No budget committed for {scenario}; "
+                f"run the tests with UPDATE_QUERY_BUDGETS=1 to create {budget_path(scenario).name}"
+            )
+
+        for size, result in profiles.items():
+            for metric in METRICS:
+                limit = allowed(budget, metric, size)
+                value = getattr(result, metric)
+                if value > limit:
+                    message = (
+                        f"{scenario} at size {size}: {metric}={value:g} exceeds budget {limit:g} "
+                        f"(base {budget[metric]['base']:g} + {budget[metric]['per_item']:g}/item)"
+                    )
+                    if metric == "queries":
+                        message += "\n" + "\n".join(
+                            f"  {index}. {sql}" for index, sql in enumerate(result.sql, 1)
+                        )
+                    self.fail(message)
@@ -0,0 +1,239 @@
+"""End-to-end queue throughput benchmark.
+
+Enqueues N messages through ``BulkMessageView`` and drains them with repeated
+``process_message_queue`` runs against the local SMTP sink and fake Graph API,
+reporting drain rate, latency percentiles and DB query counts per run.
+
+    python -m benchmarks.queue_drain --messages 1000 --channel email
+    python -m benchmarks.queue_drain --messages 500 --channel whatsapp --latency 0.02 --error-rate 0.05
+
+A throwaway test database is created for the run, so the configured database
+is never touched.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from unittest.mock import patch
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    teardown_databases,
+)
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.communications.models import (  # noqa: E402
+    Communication,
+    MessageQueue,
+    SMTPServer,
+    WhatsAppAccount,
+)
+from apps.communications.stats import batch_sizes  # noqa: E402
+from apps.communications.utils import process_message_queue  # noqa: E402
+from benchmarks.stubs import FakeGraphAPIServer, SinkSMTPServer  # noqa: E402
+from config.celery import app  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_recipients(channel, count):
+    if channel == Communication.EMAIL:
+        return [f"load{i}@example.test" for i in range(count)]
+    return [f"+1555{i:07d}" for i in range(count)]
+
+
+def enqueue(user, channel, recipients, respect_schedule):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    payload = {
+        "type": channel,
+        "recipients": recipients,
+        "content": "Load test message body",
+        "subject": "Load test" if channel == Communication.EMAIL else None,
+    }
+
+    # Run the bulk task inline but keep its trailing queue kick out of the
+    # measurement; the drain loop below is what we want to time.
+    with patch("apps.communications.tasks.process_message_queue_task.delay"):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = client.post(reverse("communications:bulk-send"), payload, format="json")
+            elapsed = time.perf_counter() - started
+
+    if response.status_code != 202:
+        raise SystemExit(f"Bulk send rejected: {response.status_code} {response.data}")
+
+    if not respect_schedule:
+        MessageQueue.objects.update(scheduled_time=timezone.now())
+
+    return {"seconds": elapsed, "queries": len(ctx.captured_queries)}
+
+
+def drain(max_runs, wait_for_schedule):
+    runs = []
+    started = time.perf_counter()
+    while len(runs) < max_runs:
+        remaining = Communication.objects.filter(status="queued").count()
+        if not remaining:
+            break
+        with CaptureQueriesContext(connection) as ctx:
+            run_started = time.perf_counter()
+            process_message_queue()
+            run_elapsed = time.perf_counter() - run_started
+        processed = remaining - Communication.objects.filter(status="queued").count()
+        runs.append({
+            "seconds": run_elapsed,
+            "queries": len(ctx.captured_queries),
+            "processed": processed,
+        })
+        if not processed:
+            if not wait_for_schedule:
+                break
+            time.sleep(0.1)
+    total = time.perf_counter() - started
+    return runs, total
+
+
+def run(args):
+    user = get_user_model().objects.create_user(
+        username="loadtest", email="loadtest@example.test", password="loadtest"
+    )
+
+    with SinkSMTPServer(latency=args.latency, error_rate=args.error_rate) as smtp, \
+            FakeGraphAPIServer(
+                latency=args.latency,
+                error_rate=args.error_rate,
+                throttle_rate=args.throttle_rate,
+            ) as graph, \
+            override_settings(WHATSAPP_GRAPH_URL=graph.base_url):
+        SMTPServer.objects.create(
+            name="Sink",
+            host=smtp.host,
+            port=smtp.port,
+            username="sink",
+            password="sink",
+            use_tls=False,
+            daily_limit=10 ** 9,
+        )
+        WhatsAppAccount.objects.create(
+            name="Fake Graph",
+            phone_number_id="100000000000001",
+            access_token="stub-token",
+            daily_limit=10 ** 9,
+        )
+
+        recipients = build_recipients(args.channel, args.messages)
+        enqueue_stats = enqueue(user, args.channel, recipients, args.respect_schedule)
+        runs, drain_seconds = drain(args.max_runs, args.respect_schedule)
+
+        delivered = len(smtp.messages) if args.channel == Communication.EMAIL else len(graph.requests)
+
+    sent = Communication.objects.filter(status="sent")
+    latencies = [
+        (sent_at - created_at).total_seconds()
+        for created_at, sent_at in sent.values_list("created_at", "sent_at")
+    ]
+    run_queries = [r["queries"] for r in runs]
+    run_seconds = [r["seconds"] for r in runs]
+    processed = sum(r["processed"] for r in runs)
+
+    return {
+        "channel": args.channel,
+        "messages": args.messages,
+        "enqueue": enqueue_stats,
+        "drain": {
+            "runs": len(runs),
+            "seconds": drain_seconds,
+            "processed": processed,
+            "messages_per_second": processed / drain_seconds if drain_seconds else 0.0,
+            "queries_total": sum(run_queries),
+            "queries_per_run_mean": statistics.fmean(run_queries) if runs else 0.0,
+            "queries_per_message": sum(run_queries) / processed if processed else 0.0,
+            "run_seconds_p50": percentile(run_seconds, 50),
+            "run_seconds_p99": percentile(run_seconds, 99),
+            "batch_per_run": [r["processed"] for r in runs],
+        },
+        "batch_sizes": batch_sizes(),
+        "outcome": {
+            "sent": sent.count(),
+            "failed": Communication.objects.filter(status="failed").count(),
+            "still_queued": Communication.objects.filter(status="queued").count(),
+            "delivered_to_stub": delivered,
+        },
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies, default=0.0),
+        },
+    }
+
+
+def print_report(report):
+    drain_stats = report["drain"]
+    print(f"Channel:            {report['channel']}")
+    print(f"Messages:           {report['messages']}")
+    print(f"Enqueue:            {report['enqueue']['seconds']:.3f}s, {report['enqueue']['queries']} queries")
+    print(f"Drain:              {drain_stats['seconds']:.3f}s over {drain_stats['runs']} runs")
+    print(f"Drain rate:         {drain_stats['messages_per_second']:.1f} msg/s")
+    print(f"Queries:            {drain_stats['queries_total']} total, "
+          f"{drain_stats['queries_per_run_mean']:.1f}/run, {drain_stats['queries_per_message']:.2f}/msg")
+    print(f"Run time p50/p99:   {drain_stats['run_seconds_p50']:.3f}s / {drain_stats['run_seconds_p99']:.3f}s")
+    batches = drain_stats["batch_per_run"] or [0]
+    accounts = report["batch_sizes"]["smtp_servers"] + report["batch_sizes"]["whatsapp_accounts"]
+    print(f"Batch per run:      first {batches[0]}, max {max(batches)}, last {batches[-1]}; adaptive size now "
+          + ", ".join(f"{a['name']} {a['batch_size']}" for a in accounts))
+    latency = report["latency_seconds"]
+    print(f"Latency p50/p90/p99/max: {latency['p50']:.3f}s / {latency['p90']:.3f}s / "
+          f"{latency['p99']:.3f}s / {latency['max']:.3f}s")
+    outcome = report["outcome"]
+    print(f"Outcome:            {outcome['sent']} sent, {outcome['failed']} failed, "
+          f"{outcome['still_queued']} queued, {outcome['delivered_to_stub']} seen by stub")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--channel", choices=[Communication.EMAIL, Communication.WHATSAPP], default=Communication.EMAIL)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of injected latency per provider call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of provider calls that fail")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of Graph API calls answered with 429")
+    parser.add_argument("--max-runs", type=int, default=10_000)
+    parser.add_argument("--respect-schedule", action="store_true",
+                        help="Keep the staggered scheduled_time set by bulk_message_send")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    app.conf.task_always_eager = True
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        report = run(args)
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Throughput of the sync vs async email send endpoints under concurrency.
+
+Fires --requests POSTs at /email/ from --concurrency threads (the WSGI
+model: one thread per in-flight request) and at /async/email/ from as many
+concurrent asyncio tasks on one event loop (the ASGI model), then reports
+requests per second and latency percentiles for each.
+
+Celery publishes go to an in-memory broker with --broker-latency seconds of
+injected delay per publish, standing in for the round trip to Redis; that
+wait is what the async view overlaps across requests. Throttling is disabled
+for the run.
+
+    python -m benchmarks.send_throughput --requests 500 --concurrency 50 --broker-latency 0.005
+
+A throwaway SQLite file database is created for the run, so the configured
+database is never touched.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+from django.test.utils import override_settings, setup_databases, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from kombu.messaging import Producer  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from apps.communications.models import Communication  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def payload(i):
+    return json.dumps({
+        "to": f"load{i}@example.test",
+        "subject": "Load test",
+        "message": "Load test message body",
+    })
+
+
+def run_sync(url, token, requests, concurrency):
+    def send(i):
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        started = time.perf_counter()
+        response = client.post(url, payload(i), content_type="application/json")
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, range(requests)))
+    return results, time.perf_counter() - started
+
+
+async def run_async(url, token, requests, concurrency):
+    client = AsyncClient()
+    headers = {"Authorization": f"Bearer {token}"}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with slots:
+            started = time.perf_counter()
+            response = await client.post(url, payload(i), content_type="application/json", headers=headers)
+            return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send(i) for i in range(requests)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, seconds):
+    latencies = [elapsed for code, elapsed in results if code == 202]
+    return {
+        "ok": len(latencies),
+        "errors": len(results) - len(latencies),
+        "rps": len(results) / seconds if seconds else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--broker-latency", type=float, default=0.005, help="Seconds added to each publish")
+    args = parser.parse_args()
+
+    publish = Producer.publish
+
+    def slow_publish(self, *a, **kw):
+        time.sleep(args.broker_latency)
+        return publish(self, *a, **kw)
+
+    # Concurrent writers need a real file and a busy timeout rather than the
+    # shared-cache in-memory test database
+    workdir = tempfile.TemporaryDirectory()
+    database = settings.DATABASES["default"]
+    database["TEST"]["NAME"] = os.path.join(workdir.name, "bench.sqlite3")
+    database["OPTIONS"]["timeout"] = 30
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        user = get_user_model().objects.create_user(
+            username="loadtest", email="loadtest@example.test", password="loadtest"
+        )
+        token = str(AccessToken.for_user(user))
+
+        with override_settings(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+            ASYNC_PUBLISH_WORKERS=args.concurrency,
+        ), patch.object(Producer, "publish", slow_publish):
+            results = {
+                "sync (threads)": summarize(*run_sync(
+                    reverse("communications:email-send"), token, args.requests, args.concurrency
+                )),
+                "async (event loop)": summarize(*asyncio.run(run_async(
+                    reverse("communications:async-email-send"), token, args.requests, args.concurrency
+                ))),
+            }
+        created = Communication.objects.count()
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        workdir.cleanup()
+
+    print(f"{args.requests} requests per mode, concurrency {args.concurrency}, "
+          f"broker latency {args.broker_latency * 1000:.1f} ms; {created} communications created")
+    print(f"{'':<20}{'ok':>6}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, row in results.items():
+        print(f"{label:<20}{row['ok']:>6}{row['errors']:>8}{row['rps']:>10.1f}{row['p50']:>10.2f}{row['p99']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SinkSMTPServer:
+    """Local SMTP server that accepts and discards every message.
+
+    Modelled on aiosmtpd's ``Sink`` handler but without the dependency. It
+    speaks just enough ESMTP (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA) for
+    ``smtplib`` and Django's SMTP backend. ``latency`` delays every DATA reply
+    and ``error_rate`` answers that fraction of DATA commands with a 451.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        with self._lock:
+            self.connections += 1
+
+        async def reply(line):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 sink ESMTP ready")
+        mail_from = None
+        rcpt_to = []
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                command = line[:4].upper()
+
+                if command == "EHLO":
+                    writer.write(b"250-sink\r\n250-8BITMIME\r\n250-AUTH PLAIN LOGIN\r\n")
+                    await reply("250 SMTPUTF8")
+                elif command == "HELO":
+                    await reply("250 sink")
+                elif command == "AUTH":
+                    parts = line.split()
+                    if parts[1].upper() == "LOGIN":
+                        for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                            await reply(f"334 {prompt}")
+                            await reader.readline()
+                    elif len(parts) == 2:
+                        await reply("334 ")
+                        await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    mail_from = line.split(":", 1)[1].strip()
+                    rcpt_to = []
+                    await reply("250 OK")
+                elif command == "RCPT":
+                    rcpt_to.append(line.split(":", 1)[1].strip())
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    size = 0
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        size += len(chunk)
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    if self.error_rate and random.random() < self.error_rate:
+                        await reply("451 4.3.0 Injected failure")
+                    else:
+                        with self._lock:
+                            self.messages.append({
+                                "mail_from": mail_from,
+                                "rcpt_to": rcpt_to,
+                                "size": size,
+                                "received_at": time.time(),
+                            })
+                        await reply("250 OK queued")
+                    mail_from = None
+                    rcpt_to = []
+                elif command == "RSET":
+                    mail_from = None
+                    rcpt_to = []
+                    await reply("250 OK")
+                elif command == "NOOP":
+                    await reply("250 OK")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class FakeGraphAPIServer:
+    """Local stand-in for the WhatsApp Cloud API ``/messages`` endpoint.
+
+    Point ``settings.WHATSAPP_GRAPH_URL`` at ``base_url``. ``latency`` delays
+    every response, ``error_rate`` returns a 500 for that fraction of calls and
+    ``throttle_rate`` returns a 429 like the real API does when rate limited.
+    """
+
+    api_version = "v21.0"
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{self.api_version}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status_code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if not self.path.endswith("/messages"):
+                    return self._send_json(404, {"error": {"message": "Unknown path"}})
+
+                roll = random.random()
+                if roll < stub.throttle_rate:
+                    return self._send_json(429, {
+                        "error": {"message": "Injected rate limit", "code": 130429}
+                    })
+                if roll < stub.throttle_rate + stub.error_rate:
+                    return self._send_json(500, {
+                        "error": {"message": "Injected failure", "code": 1}
+                    })
+
+                message_id = f"wamid.stub{next(stub._ids)}"
+                with stub._lock:
+                    stub.requests.append({
+                        "path": self.path,
+                        "to": payload.get("to"),
+                        "authorization": self.headers.get("Authorization"),
+                        "received_at": time.time(),
+                    })
+                self._send_json(200, {
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+                    "messages": [{"id": message_id}],
+                })
+
+        return Handler
+
+
+class StubPlacesService:
+    """In-process stand-in for the ``places`` v1 client built by googleapiclient.
+
+    Supports the ``places().searchText(body=...).execute()`` chain used by
+    ``tasks.search_business``. Place IDs are derived from the text query, so
+    repeating a search returns the same places and exercises the update path.
+    """
+
+    def __init__(self, places_per_search=20, latency=0.0):
+        self.places_per_search = places_per_search
+        self.latency = latency
+        self.calls = 0
+        self._body = None
+
+    def places(self):
+        return self
+
+    def searchText(self, body):
+        self._body = body
+        return self
+
+    def execute(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        slug = "-".join(self._body["textQuery"].lower().split())
+        return {
+            "places": [
+                {
+                    "name": f"{self._body['textQuery']} #{i}",
+                    "formattedAddress": f"{i} Stub Street",
+                    "phoneNumber": f"+1555{i:07d}",
+                    "websiteUri": f"https://example.test/{slug}/{i}",
+                    "types": ["establishment", "point_of_interest"],
+                    "googleMapsUri": f"https://maps.google.com/?cid={i}",
+                    "placeId": f"{slug}-{i}",
+                }
+                for i in range(self.places_per_search)
+            ]
+        }
+
+
+class StubPeopleService:
+    """In-process stand-in for the ``people`` v1 client built by googleapiclient.
+
+    Keeps contacts in memory and supports the calls made by the Google
+    Contacts sync: ``connections().list``, ``batchCreateContacts``,
+    ``batchUpdateContacts`` and ``getBatchGet``. Updates with a stale etag
+    fail with a 400 like the real API.
+    """
+
+    def __init__(self, contacts=None, latency=0.0):
+        self.latency = latency
+        self.contacts = {}
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._etags = itertools.count(1)
+        for person in contacts or []:
+            self._store(dict(person))
+
+    def _store(self, person):
+        person.setdefault("resourceName", f"people/c{next(self._ids)}")
+        person["etag"] = f"etag-{next(self._etags)}"
+        self.contacts[person["resourceName"]] = person
+        return person
+
+    def _call(self, name, func):
+        stub = self
+
+        class Request:
+            def execute(self):
+                stub.calls.append(name)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                return func()
+
+        return Request()
+
+    def people(self):
+        return self
+
+    def connections(self):
+        return self
+
+    def list(self, resourceName, personFields, pageSize=100, pageToken=None):
+        def run():
+            people = list(self.contacts.values())
+            start = int(pageToken or 0)
+            page = people[start:start + pageSize]
+            response = {"connections": [dict(person) for person in page]}
+            if start + pageSize < len(people):
+                response["nextPageToken"] = str(start + pageSize)
+            return response
+        return self._call("connections.list", run)
+
+    def batchCreateContacts(self, body):
+        def run():
+            return {
+                "createdPeople": [
+                    {"httpStatusCode": 200, "person": dict(self._store(dict(item["contactPerson"])))}
+                    for item in body["contacts"]
+                ]
+            }
+        return self._call("batchCreateContacts", run)
+
+    def batchUpdateContacts(self, body):
+        def run():
+            from googleapiclient.errors import HttpError
+            from httplib2 import Response
+
+            for resource_name, person in body["contacts"].items():
+                current = self.contacts.get(resource_name)
+                if current is None or current["etag"] != person.get("etag"):
+                    raise HttpError(Response({"status": 400}), b'{"error": {"status": "FAILED_PRECONDITION"}}')
+            result = {}
+            for resource_name, person in body["contacts"].items():
+                updated = self._store({**person, "resourceName": resource_name})
+                result[resource_name] = {"httpStatusCode": 200, "person": dict(updated)}
+            return {"updateResult": result}
+        return self._call("batchUpdateContacts", run)
+
+    def getBatchGet(self, resourceNames, personFields):
+        def run():
+            return {
+                "responses": [
+                    {"requestedResourceName": name, "person": dict(self.contacts[name])}
+                    for name in resourceNames
+                    if name in self.contacts
+                ]
+            }
+        return self._call("getBatchGet", run)
+
+    def touch(self, resource_name):
+        # Simulates an edit made in Google, which changes the etag
+        self._store(self.contacts[resource_name])
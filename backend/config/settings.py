@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
@@ -13,6 +14,20 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
+CELERY_BEAT_SCHEDULE = {
+    "reverify-stale-profiles": {
+        "task": "communications.reverify_stale_profiles",
+        "schedule": 60 * 60,
+    },
+    "archive-communications": {
+        "task": "communications.archive_communications",
+        "schedule": 24 * 60 * 60,
+    },
+    "reap-stuck-messages": {
+        "task": "communications.reap_stuck_messages",
+        "schedule": 60,
+    },
+}
 
 if os.name == "nt":
     CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
@@ -21,6 +36,8 @@ if os.name == "nt":
     CELERY_WORKER_CONCURRENCY = 1
     CELERY_WORKER_MAX_TASKS_PER_CHILD = 1
 
+# Threads publishing tasks for the async views; matches Celery's default broker_pool_limit
+ASYNC_PUBLISH_WORKERS = int(os.getenv("ASYNC_PUBLISH_WORKERS", "10"))
 
 SECRET_KEY = os.getenv(
     "SECRET_KEY", "django-insecure-p$0pad@^(rsf(8c$+o!t-3dy&u1-9p-i5u6njkt6dd@feem58c"
@@ -56,6 +73,7 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "config.urls"
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 TEMPLATES = [
     {
@@ -80,6 +98,26 @@ DATABASES = {
     }
 }
 
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+# Pub/sub behind the live status stream; in-process only (single server) when unset
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL") or REDIS_URL
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Users resolved from JWTs: shared cache TTL, then a per-process LRU whose TTL
+# bounds how stale another process can be after a save or logout
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+AUTH_USER_LOCAL_TTL = int(os.getenv("AUTH_USER_LOCAL_TTL", "5"))
+AUTH_USER_LOCAL_SIZE = int(os.getenv("AUTH_USER_LOCAL_SIZE", "1024"))
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
@@ -90,7 +128,6 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 AUTHENTICATION_BACKENDS = (
     "social_core.backends.facebook.FacebookOAuth2",
     "apps.authentication.backends.EmailBackend",
-    "django.contrib.auth.backends.ModelBackend",
 )
 
 SOCIAL_AUTH_FACEBOOK_KEY = os.getenv("FACEBOOK_APP_ID")
@@ -98,15 +135,59 @@ SOCIAL_AUTH_FACEBOOK_SECRET = os.getenv("FACEBOOK_APP_SECRET")
 SOCIAL_AUTH_FACEBOOK_SCOPE = ["email"]
 SOCIAL_AUTH_FACEBOOK_PROFILE_EXTRA_PARAMS = {"fields": "id,name,email"}
 
-WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL")
 WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN")
+WHATSAPP_GRAPH_URL = os.getenv("WHATSAPP_GRAPH_URL", "https://graph.facebook.com/v21.0")
+
+# Sent/failed communications older than this move to ArchivedCommunication
+COMMUNICATION_ARCHIVE_AFTER_DAYS = int(os.getenv("COMMUNICATION_ARCHIVE_AFTER_DAYS", "90"))
+COMMUNICATION_ARCHIVE_BATCH_SIZE = int(os.getenv("COMMUNICATION_ARCHIVE_BATCH_SIZE", "1000"))
+
+# Claimed queue rows not heartbeated for this long are reaped (worker died)
+MESSAGE_QUEUE_LEASE_SECONDS = int(os.getenv("MESSAGE_QUEUE_LEASE_SECONDS", "300"))
+
+# Queue emails with identical content are sent as one BCC message per this
+# many recipients (one SMTP transaction, many RCPTs); 0 or 1 keeps one per recipient
+EMAIL_BCC_GROUP_SIZE = int(os.getenv("EMAIL_BCC_GROUP_SIZE", "0"))
+
+# AIMD queue batch sizing per SMTP server / WhatsApp account
+# (apps.communications.adaptive); the fixed size is used with no account available
+MESSAGE_QUEUE_BATCH_SIZE = int(os.getenv("MESSAGE_QUEUE_BATCH_SIZE", "50"))
+BATCH_SIZE_INCREASE = int(os.getenv("BATCH_SIZE_INCREASE", "10"))
+BATCH_SIZE_DECREASE_FACTOR = float(os.getenv("BATCH_SIZE_DECREASE_FACTOR", "0.5"))
+BATCH_ERROR_RATE_THRESHOLD = float(os.getenv("BATCH_ERROR_RATE_THRESHOLD", "0.05"))
+BATCH_LATENCY_TARGET_MS = int(os.getenv("BATCH_LATENCY_TARGET_MS", "1000"))
+
+PROFILE_CRAWLER_CONCURRENCY = int(os.getenv("PROFILE_CRAWLER_CONCURRENCY", "20"))
+PROFILE_CRAWLER_PER_DOMAIN = int(os.getenv("PROFILE_CRAWLER_PER_DOMAIN", "2"))
+PROFILE_CRAWLER_CONNECT_TIMEOUT = float(os.getenv("PROFILE_CRAWLER_CONNECT_TIMEOUT", "5"))
+PROFILE_CRAWLER_READ_TIMEOUT = float(os.getenv("PROFILE_CRAWLER_READ_TIMEOUT", "10"))
+PROFILE_CRAWLER_MAX_BYTES = int(os.getenv("PROFILE_CRAWLER_MAX_BYTES", str(512 * 1024)))
+PROFILE_META_OFFLOAD_BYTES = int(os.getenv("PROFILE_META_OFFLOAD_BYTES", str(64 * 1024)))
+PROFILE_META_WORKERS = int(os.getenv("PROFILE_META_WORKERS", "2"))
+PROFILE_REVERIFY_MAX_AGE_HOURS = int(os.getenv("PROFILE_REVERIFY_MAX_AGE_HOURS", "168"))
+PROFILE_REVERIFY_BATCH_SIZE = int(os.getenv("PROFILE_REVERIFY_BATCH_SIZE", "500"))
 
 IP_API_URL = "https://ipapi.co/{}/json/"
+IP_API_TIMEOUT = int(os.getenv("IP_API_TIMEOUT", "3"))
+GEOIP_CACHE_TTL = int(os.getenv("GEOIP_CACHE_TTL", "86400"))
+
+# Login: concurrent password hashes, and failed attempts allowed per account
+# and per IP within each LOGIN_ATTEMPT_WINDOW seconds
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+LOGIN_ATTEMPT_WINDOW = int(os.getenv("LOGIN_ATTEMPT_WINDOW", "900"))
+LOGIN_MAX_ATTEMPTS_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_ACCOUNT", "10"))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "50"))
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0
+# uses REMOTE_ADDR as the client IP
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+
+# Authorized user info (JSON) for the Places and People APIs
+GOOGLE_CREDENTIALS = json.loads(os.getenv("GOOGLE_CREDENTIALS") or "{}")
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.authentication.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -126,8 +207,19 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_REFRESH_SERIALIZER": "apps.authentication.tokens.CachedBlacklistTokenRefreshSerializer",
 }
 
+# Bloom filter of blacklisted refresh token JTIs, kept in sync between
+# processes through Redis; every refresh checks the database when unset
+JWT_BLACKLIST_REDIS_URL = os.getenv("JWT_BLACKLIST_REDIS_URL") or REDIS_URL
+JWT_BLACKLIST_BLOOM_CAPACITY = int(os.getenv("JWT_BLACKLIST_BLOOM_CAPACITY", "100000"))
+JWT_BLACKLIST_BLOOM_ERROR_RATE = float(os.getenv("JWT_BLACKLIST_BLOOM_ERROR_RATE", "0.001"))
+# Redis socket timeout, and how long checks go to the database after a
+# failed filter build before it is tried again
+JWT_BLACKLIST_REDIS_TIMEOUT = float(os.getenv("JWT_BLACKLIST_REDIS_TIMEOUT", "0.5"))
+JWT_BLACKLIST_RETRY_SECONDS = int(os.getenv("JWT_BLACKLIST_RETRY_SECONDS", "30"))
+
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True  # This will allow all origins during testing
 # CORS_ALLOWED_ORIGINS = [
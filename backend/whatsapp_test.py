@@ -6,7 +6,7 @@ load_dotenv()
 
 
 def test_whatsapp_message(message_text=None):
-    api_url = os.getenv("WHATSAPP_API_URL")
+    api_url = os.getenv("WHATSAPP_GRAPH_URL", "https://graph.facebook.com/v21.0")
     phone_number_id = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
     access_token = os.getenv("WHATSAPP_ACCESS_TOKEN")
     test_number = os.getenv("WHATSAPP_TEST_NUMBER")